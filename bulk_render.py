@@ -0,0 +1,183 @@
+"""
+Bulk Prompt Rendering
+Fills one or more task prompts with every row of a CSV or JSONL file of
+<<Placeholder>> values and streams the results out as JSONL, one object per
+(row, task):
+
+    {"row": 1, "task_id": "1", "prompt": "...", "missing": ["Meeting Time"]}
+
+Usage:
+    python bulk_render.py --task 1 --values facilities.csv --out prompts.jsonl
+    python bulk_render.py --task 1 --task 1016 --values rows.jsonl --workers 4
+
+Column names are matched to placeholders the same way the app does
+(case-insensitive, '_' as space). A "task_id" column, when present, limits a
+row to that task. Rows are read lazily and rendered in chunks by a process
+pool with a bounded number of chunks in flight, so memory stays flat however
+large the input is; output order follows the input. Throughput stats go to
+stderr.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from collections import deque
+from multiprocessing import Pool
+
+import catalog_db
+import prompt_templates
+
+VARIANT_COLUMNS = {"default": "prompt_default", "v1": "prompt_v1", "v2": "prompt_v2"}
+
+# --- Input ---
+
+def read_values(path):
+    """
+    Yield one {column: value} dict per CSV row or JSONL line, without loading the file.
+    JSONL lines that are not JSON objects are skipped with a warning on stderr.
+    """
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    values = json.loads(line)
+                except ValueError as e:
+                    print(f"⚠️ Skipping line {line_number}: invalid JSON ({e})", file=sys.stderr)
+                    continue
+                if not isinstance(values, dict):
+                    print(f"⚠️ Skipping line {line_number}: expected an object, got {type(values).__name__}",
+                          file=sys.stderr)
+                    continue
+                yield values
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f)
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# --- Rendering (runs in the worker processes) ---
+
+_templates = {}
+
+def load_templates(task_ids, variant="default", db_path=None):
+    """{task_id: CompiledTemplate} for the requested tasks, read through the app's DB layer"""
+    if db_path:
+        catalog_db.DB_PATH = db_path
+    column = VARIANT_COLUMNS[variant]
+    templates = {}
+    for task_id in task_ids:
+        text = catalog_db.load_task_prompts(task_id).get(column, "")
+        if text:
+            templates[str(task_id)] = prompt_templates.compile_template(text, task_id=str(task_id))
+    return templates
+
+def _init_worker(task_ids, variant, db_path):
+    _templates.update(load_templates(task_ids, variant, db_path))
+
+def render_chunk(chunk):
+    """Render [(row number, values)] against every loaded template; returns JSONL lines"""
+    lines = []
+    for row_number, values in chunk:
+        target = values.get("task_id")
+        for task_id, template in _templates.items():
+            if target not in (None, "") and str(target) != task_id:
+                continue
+            # Cells past the header land under DictReader's None key; they name no placeholder
+            fields = {k: v for k, v in values.items() if isinstance(k, str) and k != "task_id"}
+            lines.append(json.dumps({
+                "row": row_number,
+                "task_id": task_id,
+                "prompt": template.fill(fields),
+                "missing": template.missing(fields),
+            }, ensure_ascii=False))
+    return lines
+
+# --- Driver ---
+
+def render_stream(task_ids, values_path, out, variant="default", workers=None, chunk_size=200, db_path=None):
+    """
+    Render every values row against the tasks and write JSONL to out.
+
+    At most 2 * workers chunks are queued at once. Returns a stats dict.
+    """
+    workers = workers or os.cpu_count() or 1
+    rows = enumerate(read_values(values_path), start=1)
+    chunks = _chunks(rows, chunk_size)
+    stats = {"rows": 0, "prompts": 0, "bytes": 0}
+    started = time.perf_counter()
+
+    def _write(lines, chunk_rows):
+        stats["rows"] += chunk_rows
+        for line in lines:
+            out.write(line + "\n")
+            stats["bytes"] += len(line) + 1
+        stats["prompts"] += len(lines)
+
+    if workers == 1:
+        _init_worker(task_ids, variant, db_path)
+        for chunk in chunks:
+            _write(render_chunk(chunk), len(chunk))
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=(task_ids, variant, db_path)) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append((pool.apply_async(render_chunk, (chunk,)), len(chunk)))
+                if len(pending) >= workers * 2:
+                    result, n = pending.popleft()
+                    _write(result.get(), n)
+            while pending:
+                result, n = pending.popleft()
+                _write(result.get(), n)
+
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+def print_stats(stats, stream=sys.stderr):
+    seconds = max(stats["seconds"], 1e-9)
+    print(f"✅ Rendered {stats['prompts']:,} prompts from {stats['rows']:,} rows in {seconds:.2f}s", file=stream)
+    print(f"   {stats['prompts'] / seconds:,.0f} prompts/s  "
+          f"{stats['bytes'] / seconds / 1e6:.1f} MB/s  ({stats['bytes'] / 1e6:.1f} MB written)", file=stream)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill task prompts from a CSV/JSONL of placeholder values")
+    parser.add_argument("--task", action="append", required=True,
+                        help="task_id to render (repeat or comma-separate for several)")
+    parser.add_argument("--values", required=True, help="CSV or JSONL file, one row of values per prompt")
+    parser.add_argument("--out", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--variant", choices=sorted(VARIANT_COLUMNS), default="default")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="rows per work unit")
+    args = parser.parse_args(argv)
+
+    task_ids = [t.strip() for value in args.task for t in value.split(",") if t.strip()]
+    found = load_templates(task_ids, args.variant)
+    unknown = [t for t in task_ids if t not in found]
+    if unknown:
+        print(f"❌ No {args.variant} prompt for task(s): {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        stats = render_stream(task_ids, args.values, out, variant=args.variant,
+                              workers=args.workers, chunk_size=args.chunk_size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print_stats(stats)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
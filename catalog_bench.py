@@ -0,0 +1,568 @@
+"""
+Synthetic Catalog Generator & Scale Benchmarks
+Creates SharePoint-shaped CSV exports at any size (10k / 100k / 1M tasks, with
+user tasks and favorites following a skewed popularity curve) and measures how
+the catalog code paths scale with them.
+
+Usage:
+    python catalog_bench.py generate --tasks 100000 --out bench_data/100k
+    python catalog_bench.py run --scales 10000 100000 --out bench_results.json
+    python catalog_bench.py compare old_results.json bench_results.json
+    python catalog_bench.py templates
+    python catalog_bench.py llm
+
+Results are written as JSON so runs from two versions can be compared.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+import io
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import catalog_db
+import catalog_snapshot
+import prompt_templates
+import database_setup
+import import_real_data
+
+DIVISIONS = [
+    ("VHA", "Veterans Health Administration"),
+    ("VBA", "Veterans Benefits Administration"),
+    ("NCA", "National Cemetery Administration"),
+]
+CATEGORIES = [
+    "Administrative", "Education", "Finance", "Human Resources", "IT",
+    "Management", "Medical", "Public Affairs", "Quality & Patient Safety", "Service Recovery",
+]
+DIVISION_SETS = ["NCA,VBA,VHA", "VHA", "VBA", "NCA", "VHA,VBA", "VHA,VBA,NCA"]
+
+WORDS = (
+    "meeting minutes policy summary briefing memo report review audit claim appeal "
+    "patient clinic schedule budget training onboarding survey analysis plan update "
+    "request response email letter agenda action tracker incident safety quality "
+    "benefit cemetery burial veteran staffing contract invoice travel leave award"
+).split()
+PLACEHOLDERS = [
+    "Committee Name", "Meeting Date & Time", "Policy Text", "Audience Level", "Summary Format",
+    "Customer Inquiry", "Tone", "Recipient Name", "Facility Name", "Transcript",
+    "Claim Number", "Due Date", "Background", "Action Items", "Attendees",
+]
+
+# Minimal stand-in for the schema line SharePoint writes before the header row
+LIST_SCHEMA_LINE = 'ListSchema={"schemaXmlList":[]}\n'
+
+# --- Generator ---
+
+def _zipf_choice(rng, n_items, size, a=1.3):
+    """Pick indexes in [0, n_items) with a Zipf-like skew: a few items are very popular"""
+    ranks = np.arange(1, n_items + 1, dtype=np.float64)
+    weights = ranks ** -a
+    weights /= weights.sum()
+    return rng.choice(n_items, size=size, p=weights)
+
+def _phrases(rng, n, n_words):
+    """n random space-joined phrases of n_words words each"""
+    idx = rng.integers(0, len(WORDS), size=(n, n_words))
+    words = np.array(WORDS, dtype=object)[idx]
+    return [" ".join(row) for row in words]
+
+def _prompt_pool(rng, size, prompt_chars):
+    """A pool of prompt bodies; real catalogs reuse a handful of prompt skeletons heavily"""
+    pool = []
+    for _ in range(size):
+        fields = rng.choice(len(PLACEHOLDERS), size=4, replace=False)
+        lines = ["You are an expert assistant for VA staff."]
+        while sum(len(line) for line in lines) < prompt_chars:
+            lines.append(" ".join(rng.choice(WORDS, size=12)).capitalize() + ".")
+        for f in fields:
+            lines.append(f"- {PLACEHOLDERS[f]}: <<{PLACEHOLDERS[f]}>>")
+        pool.append("\n".join(lines))
+    return pool
+
+def _sharepoint_id(n):
+    """Format an ID the way SharePoint exports number columns ("1,001")"""
+    return f"{n:,}"
+
+def _write_list(df, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(LIST_SCHEMA_LINE)
+        df.to_csv(f, index=False)
+
+def generate_catalog(out_dir, n_tasks, n_users=None, seed=0, prompt_chars=900):
+    """
+    Write the five SharePoint list exports for a synthetic catalog of n_tasks tasks.
+
+    User tasks are ~5% of the catalog and favorites ~50%, both drawn with Zipf-skewed
+    users and tasks. Returns a dict of row counts per list.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    n_users = n_users or max(10, n_tasks // 20)
+    users = [f"user{i}@va.gov" for i in range(n_users)]
+
+    _write_list(pd.DataFrame({
+        "Title": [d[0] for d in DIVISIONS],
+        "FullTitle": [d[1] for d in DIVISIONS],
+        "DivisionIcon": [f"{d[0]}.png" for d in DIVISIONS],
+        "SortOrder": range(1, len(DIVISIONS) + 1),
+        "IsActive": "True",
+    }), os.path.join(out_dir, "AI_Assistant_Divisions.csv"))
+
+    _write_list(pd.DataFrame({
+        "Title": CATEGORIES,
+        "Division": "NCA,VBA,VHA",
+        "CategoryIcon": [f"{c}.png" for c in CATEGORIES],
+        "SortOrder": range(1, len(CATEGORIES) + 1),
+        "IsActive": "True",
+    }), os.path.join(out_dir, "AI_Assistant_Categories.csv"))
+
+    pool = _prompt_pool(rng, min(500, max(20, n_tasks // 100)), prompt_chars)
+    task_ids = np.arange(1, n_tasks + 1)
+    titles = [t.title() for t in _phrases(rng, n_tasks, 3)]
+    prompt_idx = rng.integers(0, len(pool), size=n_tasks)
+    cat_primary = _zipf_choice(rng, len(CATEGORIES), n_tasks, a=0.8)
+    cat_secondary = rng.integers(0, len(CATEGORIES), size=n_tasks)
+    multi = rng.random(n_tasks) < 0.2
+    categories = [
+        f"{CATEGORIES[a]},{CATEGORIES[b]}" if m and a != b else CATEGORIES[a]
+        for a, b, m in zip(cat_primary, cat_secondary, multi)
+    ]
+    has_v1 = rng.random(n_tasks) < 0.1
+    prompts = [f"Task: {t}\n{pool[i]}" for t, i in zip(titles, prompt_idx)]
+    _write_list(pd.DataFrame({
+        "Title": titles,
+        "TaskID": [_sharepoint_id(int(i)) for i in task_ids],
+        "Task_Description": [d.capitalize() + "." for d in _phrases(rng, n_tasks, 10)],
+        "Division": np.array(DIVISION_SETS, dtype=object)[rng.integers(0, len(DIVISION_SETS), size=n_tasks)],
+        "Category": categories,
+        "IsActive": np.where(rng.random(n_tasks) < 0.97, "True", "False"),
+        "Prompt_Default": prompts,
+        "Prompt_V1": [p if v else "" for p, v in zip(prompts, has_v1)],
+        "Prompt_V2": "",
+        "ConfigJSON": '{"fields": []}',
+    }), os.path.join(out_dir, "AI_Assistant_Tasks.csv"))
+
+    n_user_tasks = max(1, n_tasks // 20)
+    owners = _zipf_choice(rng, n_users, n_user_tasks)
+    start = datetime(2025, 1, 1)
+    _write_list(pd.DataFrame({
+        "Title": [t.title() for t in _phrases(rng, n_user_tasks, 3)],
+        "TaskName": [t.title() for t in _phrases(rng, n_user_tasks, 2)],
+        "Task_Description": [d.capitalize() + "." for d in _phrases(rng, n_user_tasks, 8)],
+        "Division": np.array(DIVISION_SETS, dtype=object)[rng.integers(0, len(DIVISION_SETS), size=n_user_tasks)],
+        "Category": np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), size=n_user_tasks)],
+        "TaskType": "Review",
+        "Role": "Analyst",
+        "Goal": "Summarize",
+        "InputType": "",
+        "Tone": "Professional",
+        "OutputType": "Email",
+        "IsPublic": np.where(rng.random(n_user_tasks) < 0.3, "True", "False"),
+        "IsFavorite": "False",
+        "IsActive": "True",
+        "CreatedDate": [(start + timedelta(minutes=int(m))).strftime("%Y-%m-%dT%H:%M:%SZ")
+                        for m in rng.integers(0, 525600, size=n_user_tasks)],
+        "CreatedBy": [users[u] for u in owners],
+        "PromptText": [pool[i] for i in rng.integers(0, len(pool), size=n_user_tasks)],
+        "Tags": "",
+        "Icon": "",
+        "TaskID": [_sharepoint_id(6000 + i) for i in range(n_user_tasks)],
+    }), os.path.join(out_dir, "AI_Assistant_UserTasks.csv"))
+
+    # Favorites: popular tasks and heavy users dominate; (task, user) pairs are unique
+    n_favorites = max(1, n_tasks // 2)
+    fav = pd.DataFrame({
+        "task": task_ids[_zipf_choice(rng, n_tasks, n_favorites, a=1.1)],
+        "user": _zipf_choice(rng, n_users, n_favorites, a=1.1),
+    }).drop_duplicates()
+    _write_list(pd.DataFrame({
+        "Title": [f"Favorite: {titles[t - 1]}" for t in fav["task"]],
+        "TaskID": [_sharepoint_id(int(t)) for t in fav["task"]],
+        "UserEmail": [users[u] for u in fav["user"]],
+        "DateFavorited": "2025-09-01T04:00:00Z",
+        "IsActive": "True",
+    }), os.path.join(out_dir, "AI_Assistant_UserFavorites.csv"))
+
+    return {
+        "divisions": len(DIVISIONS), "categories": len(CATEGORIES), "tasks": n_tasks,
+        "user_tasks": n_user_tasks, "user_favorites": len(fav),
+    }
+
+# --- Benchmarks ---
+
+FILTER_MATRIX = [
+    {"division": div, "category": cat, "search_term": q}
+    for div in ("All", "VHA", "NCA")
+    for cat in ("All", "Administrative", "Medical")
+    for q in ("", "budget", "zz-no-match")
+]
+
+def _time_call(fn, repeat):
+    """Run fn repeat times; return (result of last call, list of durations in ms)"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    return result, durations
+
+def _record(results, scale, benchmark, durations, **extra):
+    entry = {
+        "scale": scale,
+        "benchmark": benchmark,
+        "median_ms": round(statistics.median(durations), 3),
+        "min_ms": round(min(durations), 3),
+        "max_ms": round(max(durations), 3),
+        "runs": len(durations),
+    }
+    entry.update(extra)
+    results.append(entry)
+    label = f"{benchmark} {extra.get('params', '')}".strip()
+    print(f"   {label:<96} {entry['median_ms']:10.2f} ms")
+    return entry
+
+def bench_render(scale, results, repeat):
+    """Time a full script run of the task catalog page with Streamlit's AppTest harness"""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except Exception:
+        print("   show_main_interface: skipped (streamlit not installed)")
+        results.append({"scale": scale, "benchmark": "show_main_interface", "skipped": True})
+        return
+
+    def _render():
+        at = AppTest.from_file("main.py", default_timeout=600)
+        at.query_params["page"] = "main"
+        at.run()
+        return at
+
+    _at, durations = _time_call(_render, repeat)
+    _record(results, scale, "show_main_interface", durations)
+
+TEMPLATE_SIZES = [1000, 4000, 16000, 64000, 256000]
+
+def _template_prompt(chars, n_placeholders=10):
+    """Prompt of about `chars` characters with n_placeholders markers spread through it"""
+    filler = (" ".join(WORDS) + ". ") * (chars // (len(" ".join(WORDS)) + 2) + 1)
+    step = max(1, chars // n_placeholders)
+    pieces = []
+    for i in range(n_placeholders):
+        pieces.append(filler[i * step:(i + 1) * step])
+        pieces.append(f"<<{PLACEHOLDERS[i % len(PLACEHOLDERS)]}>>")
+    return "".join(pieces)
+
+def bench_templates(results, repeat=5, batch=1000):
+    """
+    Fill cost of a compiled template vs re-scanning the prompt with a regex on every render.
+
+    Each prompt has the same ten placeholders at every size, so a compiled fill should
+    stay flat while the regex substitution grows with the prompt text.
+    """
+    print("\n🧩 Prompt template fill (per fill)")
+    values = {name: f"value for {name}" for name in PLACEHOLDERS}
+    lookup = {prompt_templates.canonical_name(k): v for k, v in values.items()}
+
+    def _regex_fill(text):
+        return prompt_templates.PLACEHOLDER_RE.sub(
+            lambda m: lookup.get(prompt_templates.canonical_name(m.group(1)), m.group(0)), text)
+
+    for chars in TEMPLATE_SIZES:
+        text = _template_prompt(chars)
+        prompt_templates.clear_cache()
+        _t, durations = _time_call(lambda: prompt_templates.CompiledTemplate(text), repeat)
+        _record(results, 0, "template_compile", durations, params={"prompt_chars": chars})
+        digest = prompt_templates.content_hash(text)
+        template = prompt_templates.compile_template(text, task_id="bench", digest=digest)
+        assert template.fill(values) == _regex_fill(text)
+
+        for name, fn in (("template_fill_compiled", lambda: template.fill(values)),
+                         ("template_fill_cached_by_digest",
+                          lambda: prompt_templates.compile_template(text, "bench", digest).fill(values)),
+                         ("template_fill_cached_hashing",
+                          lambda: prompt_templates.compile_template(text, "bench").fill(values)),
+                         ("template_fill_regex", lambda: _regex_fill(text))):
+            def _batch():
+                for _ in range(batch):
+                    fn()
+            _r, durations = _time_call(_batch, repeat)
+            _record(results, 0, name, [d / batch for d in durations], params={"prompt_chars": chars})
+
+def bench_scale(scale, repeat=3, workdir=None, render=True, keep=False):
+    """Generate a catalog of `scale` tasks, import it and time the catalog paths against it"""
+    results = []
+    root = workdir or tempfile.mkdtemp(prefix="catalog_bench_")
+    data_dir = os.path.join(root, f"data_{scale}")
+    db_path = os.path.join(root, f"catalog_{scale}.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    print(f"\n📦 Scale {scale:,} tasks")
+    started = time.perf_counter()
+    counts = generate_catalog(data_dir, scale)
+    _record(results, scale, "generate", [(time.perf_counter() - started) * 1000], rows=counts)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        database_setup.setup_database(db_path)
+
+    def _import(incremental):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return import_real_data.run_import_pipeline(
+                incremental=incremental, db_path=db_path, data_dirs=[data_dir])
+
+    _summary, durations = _time_call(lambda: _import(False), 1)
+    _record(results, scale, "import_full", durations)
+    # A full import stores every row hash, so the incremental run right after it changes nothing
+    _summary, durations = _time_call(lambda: _import(True), 1)
+    _record(results, scale, "import_incremental_noop", durations)
+
+    results.append({"scale": scale, "benchmark": "db_size", "bytes": os.path.getsize(db_path)})
+    print(f"   {'db_size':<96} {os.path.getsize(db_path) / 1e6:10.2f} MB")
+
+    previous_db = catalog_db.DB_PATH
+    previous_env = os.environ.get("AI_ASSISTANT_DB")
+    catalog_db.DB_PATH = db_path
+    os.environ["AI_ASSISTANT_DB"] = db_path
+    try:
+        for params in FILTER_MATRIX:
+            df, durations = _time_call(lambda: catalog_db.load_tasks(**params), repeat)
+            _record(results, scale, "load_tasks", durations, params=params, rows=len(df))
+
+        df, durations = _time_call(lambda: catalog_db.load_tasks(projection="export"), repeat)
+        _record(results, scale, "load_tasks_export", durations, rows=len(df))
+
+        all_tasks, durations = _time_call(lambda: catalog_db.load_tasks(), repeat)
+        _record(results, scale, "cold_start_sqlite", durations, rows=len(all_tasks))
+        _counts, durations = _time_call(lambda: catalog_db.facet_counts(all_tasks), repeat)
+        _record(results, scale, "facet_counts", durations)
+
+        generation = f"bench{scale}"
+        catalog_snapshot.write_snapshot(db_path, generation, root=os.path.join(root, f"snapshots_{scale}"))
+        snapshot_dir = os.path.join(root, f"snapshots_{scale}", generation)
+        snap, durations = _time_call(lambda: catalog_snapshot.CatalogSnapshot(snapshot_dir), repeat)
+        _record(results, scale, "cold_start_snapshot", durations, rows=snap.rows)
+        _counts, durations = _time_call(snap.facet_counts, repeat)
+        _record(results, scale, "facet_counts_snapshot", durations)
+        frame, durations = _time_call(lambda: catalog_snapshot.CatalogSnapshot(snapshot_dir).frame(), repeat)
+        _record(results, scale, "cold_start_snapshot_frame", durations, rows=len(frame))
+        snap.frame()
+        for params in FILTER_MATRIX:
+            df, durations = _time_call(lambda: snap.tasks(**params), repeat)
+            _record(results, scale, "tasks_snapshot", durations, params=params, rows=len(df))
+
+        if render:
+            bench_render(scale, results, repeat)
+    finally:
+        catalog_db.DB_PATH = previous_db
+        if previous_env is None:
+            os.environ.pop("AI_ASSISTANT_DB", None)
+        else:
+            os.environ["AI_ASSISTANT_DB"] = previous_env
+        if not keep and workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+def bench_llm(results, calls=20, users=6, per_user=3):
+    """
+    Execution backend against the bundled mock provider (mock_llm_server), offline.
+
+    Measures time to first token for live calls and for replayed cache hits, the
+    semantic tier lookup latency, the limiter queue delay under a burst from several users, and checks that injected
+    429s surface as LLMError with Retry-After.
+    """
+    import threading
+    import llm_backend
+    import llm_limiter
+    import response_cache
+    import mock_llm_server
+
+    print("\n🤖 LLM backend (mock provider)")
+    config = mock_llm_server.MockConfig(first_token_ms=40, latency="lognormal", jitter=0.3,
+                                        tokens_per_second=400, response_tokens=80, seed=0)
+    with mock_llm_server.running_server(config) as server, tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "response_cache.db")
+        provider = llm_backend.Provider("mock", server.base_url, "mock-1", max_connections=users)
+
+        def _stream(prompt, gate=None):
+            stream = response_cache.CachedStream(provider, prompt, path=cache_path, gate=gate)
+            try:
+                for _delta in stream:
+                    pass
+            finally:
+                stream.close()
+            return stream
+
+        prompts = [f"Summarize meeting {i} for the facilities team." for i in range(calls)]
+        for label, status in (("llm_first_token_live", "miss"), ("llm_first_token_cache_hit", "hit")):
+            streams = [_stream(prompt) for prompt in prompts]
+            assert all(s.cache_status == status for s in streams)
+            first = [s.first_token_seconds * 1000 for s in streams]
+            _record(results, 0, label, first, params={"calls": calls}, p95_ms=_percentile(first, 95),
+                    median_total_ms=round(statistics.median(s.total_seconds * 1000 for s in streams), 3))
+
+        # Semantic tier: reworded inputs miss the exact cache but match these; other dates never do
+        def _semantic(topic, day, wording="review"):
+            text = f"Meeting date: 2024-03-{day:02d}\nTopic: {topic} {wording}"
+            stream = response_cache.CachedStream(provider, f"Summarize:\n{text}", task_id="bench", path=cache_path,
+                                                 semantic_text=text, semantic_scope="bench")
+            for _delta in stream:
+                pass
+            stream.close()
+            return stream
+
+        topics = sorted(set(WORDS))[:calls]
+        live = [_semantic(topic, 1) for topic in topics]
+        similar = [_semantic(topic, 1, "Review.") for topic in topics]
+        assert all(s.cache_status == "miss" for s in live) and all(s.cache_status == "semantic" for s in similar)
+        assert all(_semantic(topic, 8).cache_status == "miss" for topic in topics[:3])
+        lookups = [s.lookup_seconds * 1000 for s in similar]
+        _record(results, 0, "llm_semantic_lookup", lookups, params={"calls": len(topics)}, p95_ms=_percentile(lookups, 95))
+
+        # Burst: every user submits at once; the bucket and concurrency cap decide who waits
+        limiter = llm_limiter.FairLimiter(llm_limiter.TokenBucket(rate=10, burst=4), max_concurrent=3,
+                                          max_queued_per_user=per_user)
+        waits = []
+        lock = threading.Lock()
+
+        def _user(u):
+            for i in range(per_user):
+                stream = _stream(f"Burst prompt {u}-{i}", gate=lambda: limiter.slot(f"user{u}"))
+                with lock:
+                    waits.append(stream.queue_seconds * 1000)
+
+        threads = [threading.Thread(target=_user, args=(u,)) for u in range(users)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        _record(results, 0, "llm_limiter_queue_wait", waits, params={"users": users, "per_user": per_user},
+                p95_ms=_percentile(waits, 95))
+
+        server.config.rate_limit_rate = 1.0
+        try:
+            provider.chat("rate limited?")
+            raise AssertionError("mock 429 was not raised")
+        except llm_backend.LLMError as e:
+            assert e.status == 429 and e.retry_after is not None
+        finally:
+            server.config.rate_limit_rate = 0.0
+        provider.close()
+        print(f"   mock server: {server.stats.snapshot()}")
+    return results
+
+def _run_metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+def run_benchmarks(scales, out_path, repeat=3, workdir=None, render=True, keep=False):
+    """Run every benchmark at every scale and write the machine-readable results to out_path"""
+    print("⏱️  Catalog scale benchmarks")
+    print("=" * 50)
+    results = []
+    for scale in scales:
+        results.extend(bench_scale(scale, repeat=repeat, workdir=workdir, render=render, keep=keep))
+    bench_templates(results)
+    report = {"meta": _run_metadata(), "results": results}
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {out_path}")
+    return report
+
+def _result_key(entry):
+    return (entry["scale"], entry["benchmark"], json.dumps(entry.get("params"), sort_keys=True))
+
+def compare_results(baseline_path, current_path):
+    """Print median timings of two result files side by side with the speedup ratio"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {_result_key(e): e for e in json.load(f)["results"]}
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)["results"]
+    print(f"{'scale':>9}  {'benchmark':<60} {'before':>10} {'after':>10} {'speedup':>8}")
+    for entry in current:
+        before = baseline.get(_result_key(entry))
+        if not before or "median_ms" not in entry or "median_ms" not in before:
+            continue
+        label = entry["benchmark"] + (f" {entry['params']}" if entry.get("params") else "")
+        ratio = before["median_ms"] / entry["median_ms"] if entry["median_ms"] else float("inf")
+        print(f"{entry['scale']:>9}  {label[:60]:<60} {before['median_ms']:10.2f} {entry['median_ms']:10.2f} {ratio:7.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic catalog generator and scale benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="write synthetic SharePoint CSV exports")
+    gen.add_argument("--tasks", type=int, default=10000)
+    gen.add_argument("--users", type=int, default=None)
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--out", default="bench_data")
+
+    run = sub.add_parser("run", help="generate, import and benchmark at each scale")
+    run.add_argument("--scales", type=int, nargs="+", default=[10000, 100000])
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--out", default="bench_results.json")
+    run.add_argument("--workdir", default=None, help="keep generated data and databases here")
+    run.add_argument("--no-render", action="store_true", help="skip the Streamlit page render benchmark")
+
+    tmpl = sub.add_parser("templates", help="only run the prompt template fill benchmark")
+    tmpl.add_argument("--out", default=None)
+
+    llm = sub.add_parser("llm", help="benchmark the LLM backend, cache and limiter against the mock provider")
+    llm.add_argument("--calls", type=int, default=20)
+    llm.add_argument("--users", type=int, default=6)
+    llm.add_argument("--out", default=None)
+
+    cmp_ = sub.add_parser("compare", help="compare two result files")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        counts = generate_catalog(args.out, args.tasks, n_users=args.users, seed=args.seed)
+        print(f"✅ Wrote synthetic exports to {args.out}: {counts}")
+    elif args.command == "run":
+        run_benchmarks(args.scales, args.out, repeat=args.repeat, workdir=args.workdir,
+                       render=not args.no_render, keep=args.workdir is not None)
+    elif args.command == "templates":
+        results = []
+        bench_templates(results)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"meta": _run_metadata(), "results": results}, f, indent=2)
+    elif args.command == "llm":
+        results = []
+        bench_llm(results, calls=args.calls, users=args.users)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"meta": _run_metadata(), "results": results}, f, indent=2)
+    else:
+        compare_results(args.baseline, args.current)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Catalog Data Access
+Database connection and load_* helpers shared by the Streamlit app (main.py),
+the import utility and the command line tools, so none of them need a running
+Streamlit session to query the catalog.
+
+Set the AI_ASSISTANT_DB environment variable to point everything at another
+database file (used by the benchmark suite).
+"""
+
+import os
+import sqlite3
+import pandas as pd
+
+import prompt_blobs
+from prompt_templates import canonical_name
+
+DB_PATH = os.environ.get("AI_ASSISTANT_DB", "ai_assistant/database/ai_assistant.db")
+
+def current_generation(db_path=None):
+    """
+    Catalog generation written by the importer after each swap ("0" if never imported).
+
+    Connections are opened per call, so they always see the newest file; cached frames
+    include the generation in their key so they are rebuilt after an import.
+    """
+    try:
+        with open((db_path or DB_PATH) + ".generation", "r", encoding="utf-8") as f:
+            return f.read().strip() or "0"
+    except OSError:
+        return "0"
+
+def get_database_connection(db_path=None):
+    """Connect to the SQLite database; returns None if the connection fails"""
+    try:
+        return sqlite3.connect(db_path or DB_PATH)
+    except Exception as e:
+        print(f"❌ Database connection error: {e}")
+        return None
+
+def load_divisions():
+    """Load divisions from database"""
+    conn = get_database_connection()
+    if conn:
+        df = pd.read_sql_query("SELECT * FROM divisions WHERE is_active = 1 ORDER BY sort_order", conn)
+        conn.close()
+        return df
+    return pd.DataFrame()
+
+def load_categories(division=None):
+    """Load categories from database"""
+    conn = get_database_connection()
+    if conn:
+        if division and division != "All":
+            df = pd.read_sql_query(
+                "SELECT * FROM categories WHERE is_active = 1 AND division LIKE ? ORDER BY sort_order",
+                conn, params=["%{}%".format(division)]
+            )
+        else:
+            df = pd.read_sql_query("SELECT * FROM categories WHERE is_active = 1 ORDER BY sort_order", conn)
+        conn.close()
+        return df
+    return pd.DataFrame()
+
+# Named column sets for the task queries. The card grid is the hottest path and reads only
+# what a card renders; prompt bodies are resolved from prompt_blobs only where needed.
+CARD_COLUMNS = ["task_id", "title", "task_description", "division", "category", "duplicate_group"]
+PROJECTIONS = {
+    "card": CARD_COLUMNS,
+    "detail": CARD_COLUMNS + ["is_active", "config_json", "prompt_default_hash", "prompt_v1_hash", "prompt_v2_hash"],
+    "edit": None,    # every column, prompts resolved
+    "export": None,  # every column, prompts resolved
+}
+RESOLVE_PROMPTS = {"edit", "export"}
+
+# Covers the card query: filters, ORDER BY title and the selected columns come from the index
+CARD_INDEX = "idx_tasks_card"
+CARD_INDEX_COLUMNS = ["is_active", "title", "task_id", "task_description", "division", "category", "duplicate_group"]
+
+def ensure_card_index(conn):
+    """Create the covering card index, rebuilding it when CARD_INDEX_COLUMNS has changed"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    columns = [c for c in CARD_INDEX_COLUMNS if c in existing]
+    indexed = [row[2] for row in conn.execute(f"PRAGMA index_info({CARD_INDEX})")]
+    if indexed == columns:
+        return
+    conn.execute(f"DROP INDEX IF EXISTS {CARD_INDEX}")
+    conn.execute(f"CREATE INDEX {CARD_INDEX} ON tasks ({', '.join(columns)})")
+
+def _projection_sql(conn, projection):
+    """SELECT list for a projection, limited to the columns this database actually has"""
+    columns = PROJECTIONS[projection]
+    if columns is None:
+        return "*"
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    return ", ".join(c for c in columns if c in existing) or "*"
+
+def load_tasks(task_id=None, division=None, category=None, search_term="", show_favorites=False, show_user_tasks=False,
+               placeholder=None, projection=None):
+    """
+    Load tasks from database with filters. If task_id is provided, return that task.
+
+    placeholder keeps only tasks whose prompts ask for a matching input (e.g. "transcript").
+    projection is one of PROJECTIONS; defaults to "detail" for a single task and "card" otherwise.
+    """
+    projection = projection or ("detail" if task_id is not None else "card")
+    conn = get_database_connection()
+    if conn:
+        try:
+            select = _projection_sql(conn, projection)
+            if task_id is not None:
+                df = pd.read_sql_query(
+                    f"SELECT {select} FROM tasks WHERE task_id = ? AND is_active = 1",
+                    conn, params=[task_id]
+                )
+            else:
+                query = f"SELECT {select} FROM tasks WHERE is_active = 1"
+                params = []
+
+                if division and division != "All":
+                    query += " AND division LIKE ?"
+                    params.append("%{}%".format(division))
+
+                if category and category != "All":
+                    query += " AND category LIKE ?"
+                    params.append("%{}%".format(category))
+
+                if search_term:
+                    query += " AND (title LIKE ? OR task_description LIKE ?)"
+                    params.extend(["%{}%".format(search_term), "%{}%".format(search_term)])
+
+                if placeholder:
+                    query += " AND task_id IN (SELECT task_id FROM task_placeholders WHERE name LIKE ?)"
+                    params.append("%{}%".format(canonical_name(placeholder)))
+
+                query += " ORDER BY title"
+
+                df = pd.read_sql_query(query, conn, params=params)
+            if projection in RESOLVE_PROMPTS:
+                df = prompt_blobs.attach_prompts(df, conn)
+            return df
+        finally:
+            conn.close()
+    return pd.DataFrame()
+
+def load_task_prompts(task_id):
+    """{prompt_default, prompt_v1, prompt_v2} text for one task, read only when a page shows it"""
+    conn = get_database_connection()
+    if conn:
+        try:
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+            columns = [c for p in prompt_blobs.PROMPT_COLUMNS["tasks"] for c in (p, p + "_hash") if c in existing]
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(columns)} FROM tasks WHERE task_id = ?", conn, params=[str(task_id)]
+            )
+            df = prompt_blobs.attach_prompts(df, conn)
+        finally:
+            conn.close()
+        if not df.empty:
+            row = df.iloc[0]
+            return {c: (row[c] if isinstance(row.get(c), str) else "") for c in prompt_blobs.PROMPT_COLUMNS["tasks"]}
+    return {c: "" for c in prompt_blobs.PROMPT_COLUMNS["tasks"]}
+
+def load_related_tasks(task_id, limit=5):
+    """Precomputed similar tasks (related_tasks table), best first; empty when not built"""
+    conn = get_database_connection()
+    if conn:
+        try:
+            return pd.read_sql_query(
+                """SELECT t.task_id, t.title, t.category, r.score
+                   FROM related_tasks r JOIN tasks t ON t.task_id = r.related_task_id AND t.is_active = 1
+                   WHERE r.task_id = ? ORDER BY r.rank LIMIT ?""",
+                conn, params=[str(task_id), limit]
+            )
+        except Exception:
+            return pd.DataFrame()
+        finally:
+            conn.close()
+    return pd.DataFrame()
+
+def load_task_placeholders(task_id, variant=None):
+    """Placeholders of one task in first-seen order: [{name, display_name, variants}]"""
+    conn = get_database_connection()
+    if conn:
+        try:
+            rows = conn.execute(
+                "SELECT name, display_name, variants FROM task_placeholders WHERE task_id = ? ORDER BY position",
+                (str(task_id),)
+            ).fetchall()
+        except sqlite3.Error:
+            return []
+        finally:
+            conn.close()
+        return [
+            {"name": name, "display_name": display, "variants": variants.split(",")}
+            for name, display, variants in rows
+            if variant is None or variant in variants.split(",")
+        ]
+    return []
+
+def load_placeholder_names(min_tasks=1):
+    """Distinct placeholder names across active tasks with how many tasks need each, most common first"""
+    conn = get_database_connection()
+    if conn:
+        try:
+            return pd.read_sql_query(
+                """SELECT p.name, MIN(p.display_name) AS display_name, COUNT(*) AS tasks
+                   FROM task_placeholders p JOIN tasks t ON t.task_id = p.task_id
+                   WHERE t.is_active = 1
+                   GROUP BY p.name HAVING COUNT(*) >= ?
+                   ORDER BY tasks DESC, p.name""",
+                conn, params=[min_tasks]
+            )
+        except Exception:
+            return pd.DataFrame()
+        finally:
+            conn.close()
+    return pd.DataFrame()
+
+def facet_counts(tasks_df):
+    """
+    Return (division_counts, category_counts) dicts for the filter rail badges.
+
+    Division and category hold comma-separated lists, so a task counts once for
+    every label it belongs to (the same membership the LIKE filters select).
+    """
+    div_counts = {}
+    cat_counts = {}
+    if isinstance(tasks_df, pd.DataFrame) and not tasks_df.empty:
+        for column, counts in (('division', div_counts), ('category', cat_counts)):
+            if column in tasks_df.columns:
+                labels = tasks_df[column].fillna('Unknown').astype(str).str.split(',').explode().str.strip()
+                counts.update(labels[labels != ''].value_counts().to_dict())
+    return div_counts, cat_counts
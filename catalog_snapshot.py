@@ -0,0 +1,197 @@
+"""
+Columnar Catalog Snapshot
+The importer writes the task summary columns and the division/category facet
+membership as memory-mappable NumPy files, one directory per catalog
+generation:
+
+    ai_assistant/database/snapshots/<generation>/
+        manifest.json                 row count, columns, facet labels
+        <column>.data.npy             UTF-8 bytes of every value, concatenated
+        <column>.offsets.npy          int64 start offsets (n + 1 entries)
+        division_membership.npy       uint8 [n_tasks x n_divisions]
+        category_membership.npy       uint8 [n_tasks x n_categories]
+
+Processes map these files read-only, so every Streamlit worker shares the same
+page-cache pages and a cold start does not rebuild DataFrames from SQLite: the
+card grid's task list (tasks()) and the rail counts (facet_counts()) are both
+served from the mapped columns and membership matrices.
+"""
+
+import os
+import json
+import shutil
+import sqlite3
+import numpy as np
+import pandas as pd
+
+import catalog_db
+
+# What a card renders (catalog_db.CARD_COLUMNS); duplicate_group is stored as text ("" = none)
+SUMMARY_COLUMNS = list(catalog_db.CARD_COLUMNS)
+KEEP_SNAPSHOTS = 2
+
+def snapshot_root(db_path=None):
+    return os.path.join(os.path.dirname(db_path or catalog_db.DB_PATH), "snapshots")
+
+def split_facets(value):
+    """Comma-separated SharePoint multi-choice value -> list of trimmed labels"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return [part.strip() for part in str(value).split(",") if part.strip()]
+
+def _write_string_column(out_dir, name, values):
+    encoded = [("" if v is None else str(v)).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    np.save(os.path.join(out_dir, f"{name}.data.npy"), data)
+    np.save(os.path.join(out_dir, f"{name}.offsets.npy"), offsets)
+
+def _membership(values, labels):
+    index = {label: i for i, label in enumerate(labels)}
+    matrix = np.zeros((len(values), len(labels)), dtype=np.uint8)
+    for row, value in enumerate(values):
+        for label in split_facets(value):
+            matrix[row, index[label]] = 1
+    return matrix
+
+def write_snapshot(db_path, generation, root=None):
+    """Build the snapshot for a database file under root/<generation>; returns its directory"""
+    root = root or snapshot_root(db_path)
+    final_dir = os.path.join(root, generation)
+    tmp_dir = final_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+        select = ", ".join(c if c in existing else "NULL" for c in SUMMARY_COLUMNS)
+        rows = conn.execute(f"SELECT {select} FROM tasks WHERE is_active = 1 ORDER BY title").fetchall()
+    finally:
+        conn.close()
+
+    columns = list(zip(*rows)) if rows else [[] for _ in SUMMARY_COLUMNS]
+    for name, values in zip(SUMMARY_COLUMNS, columns):
+        _write_string_column(tmp_dir, name, values)
+
+    by_name = dict(zip(SUMMARY_COLUMNS, columns))
+    division_labels = sorted({label for v in by_name["division"] for label in split_facets(v)})
+    category_labels = sorted({label for v in by_name["category"] for label in split_facets(v)})
+    np.save(os.path.join(tmp_dir, "division_membership.npy"), _membership(by_name["division"], division_labels))
+    np.save(os.path.join(tmp_dir, "category_membership.npy"), _membership(by_name["category"], category_labels))
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "generation": generation,
+            "rows": len(rows),
+            "columns": SUMMARY_COLUMNS,
+            "divisions": division_labels,
+            "categories": category_labels,
+        }, f, indent=2)
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+    return final_dir
+
+def prune_snapshots(root, keep=KEEP_SNAPSHOTS):
+    """Delete all but the newest `keep` generations (open maps keep working on POSIX)"""
+    if not os.path.isdir(root):
+        return
+    generations = sorted(d for d in os.listdir(root) if not d.endswith(".tmp"))
+    for old in generations[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+class CatalogSnapshot:
+    """Read-only, memory-mapped view of one snapshot generation"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.rows = self.manifest["rows"]
+        self.divisions = self.manifest["divisions"]
+        self.categories = self.manifest["categories"]
+        self._columns = {
+            name: (
+                np.load(os.path.join(directory, f"{name}.data.npy"), mmap_mode="r"),
+                np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r"),
+            )
+            for name in self.manifest["columns"]
+        }
+        self.division_membership = np.load(os.path.join(directory, "division_membership.npy"), mmap_mode="r")
+        self.category_membership = np.load(os.path.join(directory, "category_membership.npy"), mmap_mode="r")
+        self._frame = None
+
+    def column(self, column, rows=None):
+        """Decode a string column (optionally only the given row indexes)"""
+        data, offsets = self._columns[column]
+        raw = memoryview(data) if data.size else memoryview(b"")
+        # Plain ints: indexing the mapped array per value costs more than the decode itself
+        bounds = offsets.tolist()
+        if rows is None:
+            return [str(raw[start:end], "utf-8") for start, end in zip(bounds, bounds[1:])]
+        return [str(raw[bounds[i]:bounds[i + 1]], "utf-8") for i in rows]
+
+    def to_frame(self, columns=None, rows=None):
+        columns = columns or self.manifest["columns"]
+        df = pd.DataFrame({name: self.column(name, rows) for name in columns})
+        if "duplicate_group" in df.columns:
+            df["duplicate_group"] = pd.to_numeric(df["duplicate_group"], errors="coerce").astype("Int64")
+        return df
+
+    def frame(self):
+        """Every active task as the card DataFrame (title order), decoded once per process"""
+        if self._frame is None:
+            self._frame = self.to_frame()
+        return self._frame
+
+    def tasks(self, division=None, category=None, search_term=""):
+        """Card rows for the grid filters, like catalog_db.load_tasks() but without SQLite"""
+        df = self.frame()
+        mask = self.facet_mask(division, category)
+        if search_term:
+            mask = mask & (df["title"].str.contains(search_term, case=False, regex=False)
+                           | df["task_description"].str.contains(search_term, case=False, regex=False)).to_numpy()
+        return df[mask].reset_index(drop=True)
+
+    def facet_counts(self):
+        """(division_counts, category_counts) straight from the membership matrices"""
+        div_totals = np.asarray(self.division_membership).sum(axis=0) if self.rows else []
+        cat_totals = np.asarray(self.category_membership).sum(axis=0) if self.rows else []
+        return (
+            {label: int(n) for label, n in zip(self.divisions, div_totals)},
+            {label: int(n) for label, n in zip(self.categories, cat_totals)},
+        )
+
+    def facet_mask(self, division=None, category=None):
+        """Boolean row mask for a division/category filter ("All" or None = no filter)"""
+        mask = np.ones(self.rows, dtype=bool)
+        if division and division != "All":
+            if division not in self.divisions:
+                return np.zeros(self.rows, dtype=bool)
+            mask &= np.asarray(self.division_membership[:, self.divisions.index(division)], dtype=bool)
+        if category and category != "All":
+            if category not in self.categories:
+                return np.zeros(self.rows, dtype=bool)
+            mask &= np.asarray(self.category_membership[:, self.categories.index(category)], dtype=bool)
+        return mask
+
+# One mapped snapshot per process, replaced when the generation changes
+_loaded = {}
+
+def get_snapshot(generation=None, db_path=None):
+    """Return the mapped snapshot for the current generation, or None if it was not built"""
+    generation = generation or catalog_db.current_generation(db_path)
+    directory = os.path.join(snapshot_root(db_path), generation)
+    cached = _loaded.get("current")
+    if cached is not None and cached.directory == directory:
+        return cached
+    if not os.path.exists(os.path.join(directory, "manifest.json")):
+        return None
+    try:
+        snapshot = CatalogSnapshot(directory)
+    except (OSError, ValueError, KeyError):
+        return None
+    _loaded["current"] = snapshot
+    return snapshot
@@ -7,14 +7,16 @@ import sqlite3
 import pandas as pd
 import os
 
-def setup_database():
+import catalog_db
+import prompt_blobs
+import prompt_dedup
+import prompt_templates
+
+def setup_database(db_path="ai_assistant/database/ai_assistant.db"):
     """Creates the SQLite database and imports CSV data"""
     
-    # Create database connection
-    db_path = "ai_assistant/database/ai_assistant.db"
-    
     # Make sure the directory exists
-    os.makedirs("ai_assistant/database", exist_ok=True)
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
     
     conn = sqlite3.connect(db_path)
     
@@ -159,6 +161,18 @@ def setup_database():
             )
         ''')
         
+        # 6. PROMPT BLOBS (prompt text stored once by SHA-256)
+        print("🗜️  Moving prompts into prompt_blobs...")
+        prompt_blobs.move_prompts_to_blobs(conn)
+
+        # Near-duplicate group (filled by the importer) and the covering index for the task card grid
+        prompt_dedup.ensure_duplicate_columns(conn)
+        catalog_db.ensure_card_index(conn)
+
+        # 7. TASK PLACEHOLDERS (extracted from the task prompts)
+        print("🧩 Indexing task placeholders...")
+        prompt_templates.rebuild_placeholder_index(conn)
+
         # Commit all changes
         conn.commit()
         print("✅ Database setup completed successfully!")
@@ -0,0 +1,183 @@
+"""
+Multi-Provider Fan-Out
+Sends one rendered prompt to several configured providers at once and
+streams every answer back as it arrives, so teams can compare ChatGPT,
+Claude, Gemini, ... side by side and see which is fastest for a task.
+
+An asyncio loop in the calling thread merges the streams into one event
+sequence of (provider, kind, payload) tuples, where kind is "delta" (a text
+piece), "done" (a FanoutResult) or "error" (a FanoutResult with .error). The
+HTTP calls themselves run in worker threads on each provider's pooled
+requests.Session (llm_backend), through the response cache and the
+provider's limiter; only the loop thread ever calls on_event, so callers may
+update the page from it.
+
+Per provider, time-to-first-token, total latency and output size are stored
+in the provider_runs table of llm_runs.db next to the catalog, and
+comparison_summary() reports medians per task.
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import llm_backend
+import llm_metering
+import response_cache
+
+RUNS_PATH = llm_metering.RUNS_PATH
+
+@dataclass
+class FanoutResult:
+    provider: str
+    model: str = ""
+    text: str = ""
+    first_token_seconds: float = None
+    total_seconds: float = None
+    output_chars: int = 0
+    output_tokens: int = 0
+    cache_status: str = ""
+    similarity: float = None
+    error: str = None
+
+def _result(name, stream):
+    usage = stream.usage or {}
+    return FanoutResult(
+        provider=name,
+        model=stream.model,
+        text=stream.text,
+        first_token_seconds=stream.first_token_seconds,
+        total_seconds=stream.total_seconds,
+        output_chars=len(stream.text),
+        output_tokens=usage.get("completion_tokens") or llm_backend.estimate_tokens(stream.text),
+        cache_status=stream.cache_status,
+        similarity=stream.similarity,
+    )
+
+async def fan_out(prompt, provider_names, task_id=None, gate=None, semantic_text=None, semantic_scope=None,
+                  meter=None):
+    """
+    Async generator of (provider, kind, payload) events for one prompt sent to every provider.
+
+    gate(provider) may return a context manager factory (e.g. a limiter slot) used on cache misses.
+    semantic_text / semantic_scope enable the semantic cache tier and meter usage metering (see response_cache).
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def _work(name):
+        started = time.perf_counter()
+        stream = None
+        try:
+            provider = llm_backend.get_provider(name)
+            stream = response_cache.cached_stream(provider, prompt, task_id=task_id,
+                                                  gate=gate(provider) if gate else None,
+                                                  semantic_text=semantic_text, semantic_scope=semantic_scope,
+                                                  meter=meter)
+            for delta in stream:
+                loop.call_soon_threadsafe(queue.put_nowait, (name, "delta", delta))
+            return _result(name, stream)
+        except Exception as e:
+            return FanoutResult(provider=name, total_seconds=time.perf_counter() - started, error=str(e))
+        finally:
+            if stream is not None:
+                stream.close()
+
+    async def _pump(name, executor):
+        result = await loop.run_in_executor(executor, _work, name)
+        await queue.put((name, "error" if result.error else "done", result))
+
+    with ThreadPoolExecutor(max_workers=max(1, len(provider_names)), thread_name_prefix="fanout") as executor:
+        tasks = [asyncio.ensure_future(_pump(name, executor)) for name in provider_names]
+        finished = 0
+        while finished < len(tasks):
+            event = await queue.get()
+            if event[1] != "delta":
+                finished += 1
+            yield event
+        await asyncio.gather(*tasks)
+
+def run_fanout(prompt, provider_names, task_id=None, gate=None, on_event=None, record=True,
+               semantic_text=None, semantic_scope=None, meter=None):
+    """Run fan_out to completion from synchronous code; returns {provider: FanoutResult}"""
+    async def _main():
+        results = {}
+        async for name, kind, payload in fan_out(prompt, provider_names, task_id=task_id, gate=gate,
+                                                 semantic_text=semantic_text, semantic_scope=semantic_scope,
+                                                 meter=meter):
+            if on_event is not None:
+                on_event(name, kind, payload)
+            if kind != "delta":
+                results[name] = payload
+        return results
+
+    results = asyncio.run(_main())
+    if record:
+        record_results(task_id, results.values())
+    return results
+
+# --- Recorded comparisons ---
+
+def _connect(path=None):
+    path = path or RUNS_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS provider_runs (
+            run_at REAL NOT NULL,
+            task_id TEXT,
+            provider TEXT NOT NULL,
+            model TEXT,
+            first_token_seconds REAL,
+            total_seconds REAL,
+            output_chars INTEGER,
+            output_tokens INTEGER,
+            cache_status TEXT,
+            error TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_provider_runs_task ON provider_runs (task_id, provider)")
+    return conn
+
+def record_results(task_id, results, path=None):
+    conn = _connect(path)
+    try:
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO provider_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(now, None if task_id is None else str(task_id), r.provider, r.model, r.first_token_seconds,
+              r.total_seconds, r.output_chars, r.output_tokens, r.cache_status, r.error) for r in results],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def comparison_summary(task_id=None, path=None):
+    """Median latency and output size per provider (live calls only; cache hits would flatter)"""
+    conn = _connect(path)
+    try:
+        df = pd.read_sql_query(
+            "SELECT provider, model, first_token_seconds, total_seconds, output_chars, output_tokens, error "
+            "FROM provider_runs WHERE cache_status NOT IN ('hit', 'semantic') AND (? IS NULL OR task_id = ?)",
+            conn, params=[task_id, None if task_id is None else str(task_id)],
+        )
+    finally:
+        conn.close()
+    if df.empty:
+        return df
+    df["failed"] = df["error"].notna()
+    keys = ["provider", "model"]
+    counts = df.groupby(keys, dropna=False).agg(runs=("failed", "size"), failures=("failed", "sum"))
+    # Latency medians over successful calls only; a fast failure is not a fast provider
+    medians = df[~df["failed"]].groupby(keys, dropna=False).agg(
+        median_first_token_s=("first_token_seconds", "median"),
+        median_total_s=("total_seconds", "median"),
+        median_output_tokens=("output_tokens", "median"),
+    )
+    summary = counts.join(medians).reset_index()
+    return summary.sort_values("median_total_s", na_position="last").round(3)
@@ -0,0 +1,224 @@
+"""
+Icon Store
+Resolves the SharePoint image attachment names used by the Divisions,
+Categories and AppIcons lists (Reserved_ImageAttachment_[...].png) to image
+files, stores each image once under its SHA-256 content hash with pre-sized
+variants, and records the (kind, label) -> hash mapping in the `icons` table.
+
+    ai_assistant/images/store/<sha256>.<ext>        original
+    ai_assistant/images/store/<sha256>_<size>.png   pre-sized variants
+
+Attachment files exported from SharePoint go in
+ai_assistant/data/sharepoint/attachments/; when an attachment is missing the
+bundled ai_assistant/images/<Title>.png artwork is used instead.
+
+Run after an import (the importer calls it): python icon_store.py
+"""
+
+import os
+import io
+import re
+import csv
+import json
+import base64
+import hashlib
+import sqlite3
+
+import catalog_db
+
+ATTACHMENT_DIRS = ["ai_assistant/data/sharepoint/attachments", "ai_assistant/data/sharepoint"]
+IMAGES_DIR = "ai_assistant/images"
+STORE_DIR = os.path.join(IMAGES_DIR, "store")
+APP_ICONS_CSV = "ai_assistant/data/sharepoint/AppIcons.csv"
+VARIANT_SIZES = (32, 64)
+RAIL_ICON_SIZE = 64
+
+# Bundled artwork whose file name differs from the list title
+LABEL_ALIASES = {
+    "Quality & Patient Safety": "QPS",
+    "Information Technology": "IT",
+    "VA Seal": "VA Seal",
+}
+
+_ATTACHMENT_GUID = re.compile(r"\[([0-9a-f]{32})\]")
+
+# --- Resolution ---
+
+def _attachment_index():
+    """{file name: path} and {attachment guid: path} for every exported attachment file"""
+    by_name, by_guid = {}, {}
+    for directory in ATTACHMENT_DIRS:
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            if not entry.is_file() or entry.name.lower().endswith(".csv"):
+                continue
+            by_name.setdefault(entry.name, entry.path)
+            match = _ATTACHMENT_GUID.search(entry.name)
+            if match:
+                by_guid.setdefault(match.group(1), entry.path)
+    return by_name, by_guid
+
+def resolve_icon(label, attachment_name, index=None):
+    """Path of the image for a list row: exported attachment first, bundled artwork second"""
+    by_name, by_guid = index or _attachment_index()
+    if attachment_name:
+        if attachment_name in by_name:
+            return by_name[attachment_name]
+        match = _ATTACHMENT_GUID.search(attachment_name)
+        if match and match.group(1) in by_guid:
+            return by_guid[match.group(1)]
+    for name in (label, LABEL_ALIASES.get(label)):
+        if not name:
+            continue
+        for ext in (".png", ".svg"):
+            path = os.path.join(IMAGES_DIR, name + ext)
+            if os.path.exists(path):
+                return path
+    return None
+
+# --- Content-addressed store ---
+
+def store_image(path, store_dir=STORE_DIR, sizes=VARIANT_SIZES):
+    """Copy an image into the store under its content hash and write resized variants; returns the hash"""
+    with open(path, "rb") as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    ext = os.path.splitext(path)[1].lower() or ".png"
+    os.makedirs(store_dir, exist_ok=True)
+    original = os.path.join(store_dir, digest + ext)
+    if not os.path.exists(original):
+        with open(original + ".tmp", "wb") as f:
+            f.write(content)
+        os.replace(original + ".tmp", original)
+    if ext != ".svg":
+        _write_variants(content, digest, store_dir, sizes)
+    return digest
+
+def _write_variants(content, digest, store_dir, sizes):
+    try:
+        from PIL import Image
+    except ImportError:
+        return
+    for size in sizes:
+        target = os.path.join(store_dir, f"{digest}_{size}.png")
+        if os.path.exists(target):
+            continue
+        with Image.open(io.BytesIO(content)) as img:
+            img = img.convert("RGBA")
+            img.thumbnail((size, size), Image.LANCZOS)
+            img.save(target + ".tmp", format="PNG", optimize=True)
+        os.replace(target + ".tmp", target)
+
+def _app_icon_rows(csv_path=APP_ICONS_CSV):
+    """(kind, label, attachment) rows from the AppIcons export"""
+    if not os.path.exists(csv_path):
+        return []
+    rows = []
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        first = f.readline()
+        if not first.startswith("ListSchema="):
+            f.seek(0)
+        for row in csv.DictReader(f):
+            if str(row.get("IsActive", "True")).strip().lower() != "true":
+                continue
+            try:
+                kinds = json.loads(row.get("IconType") or "[]")
+            except ValueError:
+                kinds = [row.get("IconType")]
+            for kind in kinds or ["General"]:
+                rows.append((str(kind).lower(), row.get("Title", ""), row.get("IconImage", "")))
+    return rows
+
+def build_icon_store(db_path=None):
+    """
+    Resolve every division/category/AppIcons attachment, store it and rewrite the icons table.
+
+    List rows win over AppIcons rows for the same (kind, label). Returns the number of
+    icons mapped.
+    """
+    conn = sqlite3.connect(db_path or catalog_db.DB_PATH)
+    try:
+        rows = _app_icon_rows()
+        for table, kind, column in (("divisions", "division", "division_icon"),
+                                    ("categories", "category", "category_icon")):
+            try:
+                rows += [(kind, title, icon) for title, icon in
+                         conn.execute(f"SELECT title, {column} FROM {table} WHERE is_active = 1")]
+            except sqlite3.Error:
+                pass
+
+        index = _attachment_index()
+        mapping = {}
+        for kind, label, attachment in rows:
+            path = resolve_icon(label, attachment, index)
+            if path:
+                mapping[(kind, label)] = (attachment or "", store_image(path), os.path.splitext(path)[1].lower())
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS icons (
+                kind TEXT NOT NULL,
+                label TEXT NOT NULL,
+                attachment_name TEXT,
+                content_hash TEXT NOT NULL,
+                ext TEXT,
+                PRIMARY KEY (kind, label)
+            )
+        ''')
+        conn.execute("DELETE FROM icons")
+        conn.executemany(
+            "INSERT INTO icons (kind, label, attachment_name, content_hash, ext) VALUES (?, ?, ?, ?, ?)",
+            [(kind, label, a, h, e) for (kind, label), (a, h, e) in mapping.items()]
+        )
+        conn.commit()
+        return len(mapping)
+    finally:
+        conn.close()
+
+# --- App side ---
+
+def _data_uri(path):
+    mime = "image/svg+xml" if path.endswith(".svg") else "image/png"
+    with open(path, "rb") as f:
+        return f"data:{mime};base64," + base64.b64encode(f.read()).decode()
+
+# {generation: {(kind, label): data URI}}; one entry per process
+_icon_maps = {}
+
+def get_icon_map(generation=None, size=RAIL_ICON_SIZE, db_path=None):
+    """
+    {(kind, label): data URI} for every mapped icon, using the pre-sized variant when present.
+
+    Built once per process and catalog generation. Returns {} when the icons table has
+    not been built yet, so callers keep their bundled fallbacks.
+    """
+    generation = generation or catalog_db.current_generation(db_path)
+    key = (generation, size)
+    if key in _icon_maps:
+        return _icon_maps[key]
+    icon_map = {}
+    conn = catalog_db.get_database_connection(db_path)
+    if conn:
+        try:
+            for kind, label, digest, ext in conn.execute("SELECT kind, label, content_hash, ext FROM icons"):
+                for candidate in (f"{digest}_{size}.png", f"{digest}{ext}"):
+                    path = os.path.join(STORE_DIR, candidate)
+                    if os.path.exists(path):
+                        icon_map[(kind, label)] = _data_uri(path)
+                        break
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+    _icon_maps.clear()
+    _icon_maps[key] = icon_map
+    return icon_map
+
+def icon_style(icon_map, kind, label):
+    """Inline background-image style for a .btn-icon element ('' when no icon is mapped)"""
+    uri = icon_map.get((kind, label))
+    return f"background-image:url({uri});" if uri else ""
+
+if __name__ == "__main__":
+    count = build_icon_store()
+    print(f"✅ Mapped {count} icons into {STORE_DIR}")
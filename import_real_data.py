@@ -5,14 +5,47 @@ into your Python application database.
 
 Instructions:
 1. Export your SharePoint lists to CSV files
-2. Place them in the ai_assistant/data/ folder
+2. Place them in the ai_assistant/data/sharepoint/ folder
 3. Run this script: python import_real_data.py
+
+Use `python import_real_data.py --incremental` for nightly syncs: each
+normalized row is hashed and only inserts, updates and soft-deletes are
+applied to the database.
+
+The five lists are parsed in parallel worker processes and written by a
+single connection in one transaction, so an import either applies fully
+or leaves the database untouched.
+
+By default the import is built into a shadow copy of the database, checked
+(integrity, row counts, ANALYZE) and then swapped in atomically, so the
+running app never sees half-loaded tables. A generation marker next to the
+database tells the app to drop its cached catalog, and a memory-mapped
+columnar snapshot of the catalog (catalog_snapshot.py) is written for each
+generation so app processes start without re-reading the tasks table. An
+incremental import that changes no rows discards its shadow and keeps the
+current generation, so running sessions keep their caches.
 """
 
 import pandas as pd
 import sqlite3
 import os
+import json
+import hashlib
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from catalog_db import DB_PATH, ensure_card_index
+import catalog_snapshot
+import icon_store
+import prompt_templates
+import prompt_blobs
+import prompt_dedup
+import task_config
+import related_tasks
+
+# SharePoint exports live in data/sharepoint/; data/ is kept for older setups
+DATA_DIRS = ["ai_assistant/data/sharepoint", "ai_assistant/data"]
 
 def clean_column_names(df):
     """Clean column names to match our database schema"""
@@ -20,268 +53,675 @@ def clean_column_names(df):
     df.columns = df.columns.str.lower().str.replace(' ', '_').str.replace('[^a-zA-Z0-9_]', '', regex=True)
     return df
 
-def import_divisions_data():
-    """Import divisions data from CSV"""
-    print("📁 Importing Divisions data...")
-    
-    csv_path = "ai_assistant/data/AI_Assistant_Divisions.csv"
-    if not os.path.exists(csv_path):
-        print(f"❌ File not found: {csv_path}")
-        print("   Please make sure you've exported and placed your Divisions CSV file in ai_assistant/data/")
-        return False
-    
+def find_csv_path(file_name, data_dirs=None):
+    """Return the first existing location of an exported list CSV, or None"""
+    for data_dir in data_dirs or DATA_DIRS:
+        csv_path = os.path.join(data_dir, file_name)
+        if os.path.exists(csv_path):
+            return csv_path
+    return None
+
+def read_list_csv(csv_path):
+    """Read a SharePoint list export, skipping the ListSchema= header line if present"""
+    with open(csv_path, "r", encoding="utf-8-sig") as f:
+        first_line = f.readline()
+    skip = 1 if first_line.startswith("ListSchema=") else 0
+    df = pd.read_csv(csv_path, skiprows=skip, encoding="utf-8-sig")
+    return clean_column_names(df)
+
+def _bool_column(df, column, default):
+    """SharePoint booleans arrive as 'True'/'False' text or are already parsed as bool by pandas"""
+    if column not in df.columns:
+        return pd.Series([default] * len(df), index=df.index)
+    return df[column].astype(str).str.strip().str.lower() == 'true'
+
+def _task_id_column(df, column='taskid'):
+    """Task IDs are exported with thousands separators ("1,001"); return them as plain digit strings"""
+    if column not in df.columns:
+        return pd.Series([''] * len(df), index=df.index)
+    ids = df[column].astype(str).str.replace(',', '', regex=False).str.strip()
+    ids = ids.str.replace(r'\.0$', '', regex=True)
+    return ids.where(df[column].notna(), '')
+
+def _fill_text(df_mapped):
+    """Empty SharePoint cells become '' so NOT NULL text columns and row hashes stay stable"""
+    for column in df_mapped.columns:
+        if not pd.api.types.is_numeric_dtype(df_mapped[column]) and not pd.api.types.is_bool_dtype(df_mapped[column]):
+            df_mapped[column] = df_mapped[column].fillna('')
+    return df_mapped
+
+# --- Per-list normalization (CSV columns -> database schema) ---
+
+def normalize_divisions(df):
+    """Map a Divisions export to the divisions table schema"""
+    return pd.DataFrame({
+        'title': df.get('title', ''),
+        'full_title': df.get('fulltitle', ''),
+        'division_icon': df.get('divisionicon', ''),
+        'sort_order': pd.to_numeric(df.get('sortorder', 0), errors='coerce').fillna(0).astype(int),
+        'is_active': _bool_column(df, 'isactive', True)
+    })
+
+def normalize_categories(df):
+    """Map a Categories export to the categories table schema"""
+    return pd.DataFrame({
+        'title': df.get('title', ''),
+        'division': df.get('division', ''),
+        'category_icon': df.get('categoryicon', ''),
+        'sort_order': pd.to_numeric(df.get('sortorder', 0), errors='coerce').fillna(0).astype(int),
+        'is_active': _bool_column(df, 'isactive', True)
+    })
+
+def normalize_tasks(df):
+    """Map a Tasks export to the tasks table schema"""
+    df_mapped = pd.DataFrame({
+        'task_id': _task_id_column(df),
+        'title': df.get('title', ''),
+        'task_description': df.get('task_description', ''),
+        'division': df.get('division', ''),
+        'category': df.get('category', ''),
+        'is_active': _bool_column(df, 'isactive', True),
+        'prompt_default': df.get('prompt_default', ''),
+        'prompt_v1': df.get('prompt_v1', ''),
+        'prompt_v2': df.get('prompt_v2', ''),
+        'config_json': df.get('configjson', '{}')
+    })
+    # Rows without a TaskID cannot be addressed by the app
+    df_mapped = df_mapped[df_mapped['task_id'] != ''].copy()
+    # Validate each config once here; the app only ever reads canonical, valid JSON
+    checked = [task_config.canonical_json(text) for text in df_mapped['config_json']]
+    df_mapped['config_json'] = [canonical for canonical, _error in checked]
+    for task_id, (_canonical, error) in zip(df_mapped['task_id'], checked):
+        if error:
+            print(f"⚠️  Task {task_id}: invalid config_json ({error}); stored as {{}}")
+    return df_mapped
+
+def normalize_user_tasks(df):
+    """Map a UserTasks export to the user_tasks table schema"""
+    return pd.DataFrame({
+        'title': df.get('title', ''),
+        'task_name': df.get('taskname', ''),
+        'division': df.get('division', ''),
+        'category': df.get('category', ''),
+        'task_type': df.get('tasktype', ''),
+        'role': df.get('role', ''),
+        'goal': df.get('goal', ''),
+        'input_type': df.get('inputtype', ''),
+        'tone': df.get('tone', ''),
+        'output_type': df.get('outputtype', ''),
+        'task_description': df.get('task_description', ''),
+        'is_public': _bool_column(df, 'ispublic', False),
+        'is_favorite': _bool_column(df, 'isfavorite', False),
+        'is_active': _bool_column(df, 'isactive', True),
+        'created_date': df.get('createddate', ''),
+        'created_by': df.get('createdby', ''),
+        'prompt_text': df.get('prompttext', ''),
+        'tags': df.get('tags', ''),
+        'icon': df.get('icon', ''),
+        'task_id': pd.to_numeric(_task_id_column(df), errors='coerce').fillna(0).astype(int)
+    })
+
+def normalize_favorites(df):
+    """Map a UserFavorites export to the user_favorites table schema"""
+    return pd.DataFrame({
+        'title': df.get('title', ''),
+        'task_id': pd.to_numeric(_task_id_column(df), errors='coerce').fillna(0).astype(int),
+        'user_email': df.get('useremail', ''),
+        'date_favorited': df.get('datefavorited', ''),
+        'is_active': _bool_column(df, 'isactive', True)
+    })
+
+# Every exported list: (table, CSV file, normalizer, natural key columns, label)
+# The key columns identify a row across exports for incremental imports.
+IMPORT_LISTS = [
+    ('divisions', 'AI_Assistant_Divisions.csv', normalize_divisions, ['title'], 'divisions'),
+    ('categories', 'AI_Assistant_Categories.csv', normalize_categories, ['title'], 'categories'),
+    ('tasks', 'AI_Assistant_Tasks.csv', normalize_tasks, ['task_id'], 'tasks'),
+    ('user_tasks', 'AI_Assistant_UserTasks.csv', normalize_user_tasks, ['task_id'], 'user tasks'),
+    ('user_favorites', 'AI_Assistant_UserFavorites.csv', normalize_favorites, ['task_id', 'user_email'], 'user favorites'),
+]
+
+def load_list(table, data_dirs=None):
+    """Read and normalize the CSV export for a table; returns None when the file is missing"""
+    for list_table, file_name, normalizer, _keys, _label in IMPORT_LISTS:
+        if list_table == table:
+            csv_path = find_csv_path(file_name, data_dirs)
+            if csv_path is None:
+                print(f"❌ File not found: {file_name}")
+                print(f"   Please place your exported CSV file in {(data_dirs or DATA_DIRS)[0]}/")
+                return None
+            return _fill_text(normalizer(read_list_csv(csv_path)))
+    raise KeyError(f"Unknown list: {table}")
+
+# --- Incremental import (content hashing) ---
+
+def ensure_hash_table(conn):
+    """Create the table that remembers the content hash of every imported row"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS import_row_hashes (
+            list_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            row_hash TEXT NOT NULL,
+            is_deleted BOOLEAN DEFAULT 0,
+            updated_at TEXT,
+            PRIMARY KEY (list_name, row_key)
+        )
+    ''')
+
+def _plain_value(value):
+    """Convert pandas/numpy scalars into plain Python values that SQLite and JSON accept"""
+    if value is None:
+        return None
     try:
-        # Read CSV
-        df = pd.read_csv(csv_path)
-        df = clean_column_names(df)
-        
-        # Map to our database schema
-        df_mapped = pd.DataFrame({
-            'title': df.get('title', ''),
-            'full_title': df.get('fulltitle', ''),
-            'division_icon': df.get('divisionicon', ''),
-            'sort_order': pd.to_numeric(df.get('sortorder', 0), errors='coerce').fillna(0),
-            'is_active': df.get('isactive', 'True').str.lower() == 'true'
-        })
-        
-        # Connect to database and insert
-        conn = sqlite3.connect('ai_assistant/database/ai_assistant.db')
-        df_mapped.to_sql('divisions', conn, if_exists='replace', index=False)
-        conn.close()
-        
-        print(f"✅ Imported {len(df_mapped)} divisions")
-        return True
-        
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def row_hash(values):
+    """Stable SHA-256 of a normalized row (list of plain values in column order)"""
+    payload = json.dumps(values, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def keyed_rows(df_mapped, key_columns):
+    """(row key, key values, plain values, hash) per row, one per natural key (the last one wins)"""
+    columns = list(df_mapped.columns)
+    key_idx = [columns.index(c) for c in key_columns]
+    for raw in df_mapped.drop_duplicates(subset=key_columns, keep='last').itertuples(index=False, name=None):
+        values = [_plain_value(v) for v in raw]
+        key_values = [values[i] for i in key_idx]
+        yield json.dumps(key_values, ensure_ascii=False, default=str), key_values, values, row_hash(values)
+
+def incremental_import_table(conn, table, df_mapped, key_columns):
+    """
+    Apply only the changes between a normalized export and what was last imported.
+
+    Rows are matched on their natural key columns. New keys are inserted, keys whose
+    hash changed are updated, and keys missing from the export are soft-deleted by
+    setting is_active = 0. Returns a summary dict of the counts. Does not commit.
+    """
+    ensure_hash_table(conn)
+    # Every upsert and soft-delete looks rows up by their natural key
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_import_key ON {table} ({', '.join(key_columns)})")
+    columns = list(df_mapped.columns)
+
+    stored = {
+        key: (stored_hash, bool(deleted))
+        for key, stored_hash, deleted in conn.execute(
+            "SELECT row_key, row_hash, is_deleted FROM import_row_hashes WHERE list_name = ?", (table,)
+        )
+    }
+
+    key_where = " AND ".join(f"{c} = ?" for c in key_columns)
+    set_clause = ", ".join(f"{c} = ?" for c in columns)
+    update_sql = f"UPDATE {table} SET {set_clause} WHERE {key_where}"
+    insert_sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    now = datetime.now().isoformat(timespec='seconds')
+
+    summary = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    hash_updates = []
+    seen = set()
+
+    for key, key_values, values, digest in keyed_rows(df_mapped, key_columns):
+        seen.add(key)
+        previous = stored.get(key)
+        if previous is not None and previous[0] == digest and not previous[1]:
+            summary['unchanged'] += 1
+            continue
+
+        # Upsert: the row may already exist from a full import without stored hashes
+        cur = conn.execute(update_sql, values + key_values)
+        if cur.rowcount == 0:
+            conn.execute(insert_sql, values)
+            summary['inserted'] += 1
+        elif previous is None:
+            summary['inserted'] += 1
+        else:
+            summary['updated'] += 1
+        hash_updates.append((table, key, digest, 0, now))
+
+    for key, (stored_digest, deleted) in stored.items():
+        if key in seen or deleted:
+            continue
+        conn.execute(f"UPDATE {table} SET is_active = 0 WHERE {key_where}", json.loads(key))
+        hash_updates.append((table, key, stored_digest, 1, now))
+        summary['deleted'] += 1
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO import_row_hashes (list_name, row_key, row_hash, is_deleted, updated_at) VALUES (?, ?, ?, ?, ?)",
+        hash_updates
+    )
+    return summary
+
+# --- Parallel import pipeline (worker processes parse, one writer commits) ---
+
+def parse_list_worker(table, data_dirs=None):
+    """
+    Worker-process entry point: read and normalize one export.
+
+    Returns (table, df_mapped or None, error message or None, seconds). Errors are
+    returned instead of raised so the writer can report every failed list at once.
+    """
+    started = time.perf_counter()
+    try:
+        df_mapped = load_list(table, data_dirs)
+        error = None if df_mapped is not None else "file not found"
     except Exception as e:
-        print(f"❌ Error importing divisions: {e}")
-        return False
-
-def import_categories_data():
-    """Import categories data from CSV"""
-    print("📂 Importing Categories data...")
-    
-    csv_path = "ai_assistant/data/AI_Assistant_Categories.csv"
-    if not os.path.exists(csv_path):
-        print(f"❌ File not found: {csv_path}")
-        return False
-    
+        df_mapped, error = None, str(e)
+    return table, df_mapped, error, time.perf_counter() - started
+
+def parse_lists(workers=None, data_dirs=None):
+    """Parse all five exports, in parallel worker processes unless workers == 1"""
+    tables = [entry[0] for entry in IMPORT_LISTS]
+    if workers is None:
+        workers = min(len(tables), os.cpu_count() or 1)
+    if workers <= 1:
+        return {table: parse_list_worker(table, data_dirs) for table in tables}
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_list_worker, table, data_dirs) for table in tables]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result[0]] = result
+    return results
+
+def replace_table_rows(conn, table, df_mapped, key_columns):
+    """
+    Replace every row of a table inside the caller's transaction, keeping its schema and indexes.
+    The row hashes are rewritten too, so the next incremental run only sees real changes.
+    """
+    columns = list(df_mapped.columns)
+    conn.execute(f"DELETE FROM {table}")
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        ([_plain_value(v) for v in row] for row in df_mapped.itertuples(index=False, name=None))
+    )
+    ensure_hash_table(conn)
+    conn.execute("DELETE FROM import_row_hashes WHERE list_name = ?", (table,))
+    now = datetime.now().isoformat(timespec='seconds')
+    conn.executemany(
+        "INSERT INTO import_row_hashes (list_name, row_key, row_hash, is_deleted, updated_at) VALUES (?, ?, ?, 0, ?)",
+        ((table, key, digest, now) for key, _key_values, _values, digest in keyed_rows(df_mapped, key_columns))
+    )
+    return {'inserted': len(df_mapped), 'updated': 0, 'deleted': 0, 'unchanged': 0}
+
+def _has_placeholder_index(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_placeholders'"
+    ).fetchone() is not None
+
+def write_lists(conn, frames, incremental=False):
+    """Single writer: apply every parsed list in one transaction; returns per-table summaries and timings"""
+    summaries, timings = {}, {}
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        df = pd.read_csv(csv_path)
-        df = clean_column_names(df)
-        
-        df_mapped = pd.DataFrame({
-            'title': df.get('title', ''),
-            'division': df.get('division', ''),
-            'category_icon': df.get('categoryicon', ''),
-            'sort_order': pd.to_numeric(df.get('sortorder', 0), errors='coerce').fillna(0),
-            'is_active': df.get('isactive', 'True').str.lower() == 'true'
-        })
-        
-        conn = sqlite3.connect('ai_assistant/database/ai_assistant.db')
-        df_mapped.to_sql('categories', conn, if_exists='replace', index=False)
-        conn.close()
-        
-        print(f"✅ Imported {len(df_mapped)} categories")
-        return True
-        
+        prompt_dedup.ensure_duplicate_columns(conn)
+        for table, _file_name, _normalizer, key_columns, _label in IMPORT_LISTS:
+            started = time.perf_counter()
+            # Prompt bodies are stored once by content hash; rows keep only the reference
+            frame = prompt_blobs.frame_to_blob_refs(conn, table, frames[table])
+            if incremental:
+                summaries[table] = incremental_import_table(conn, table, frame, key_columns)
+            else:
+                summaries[table] = replace_table_rows(conn, table, frame, key_columns)
+            timings[table] = time.perf_counter() - started
+        ensure_card_index(conn)
+        started = time.perf_counter()
+        # Rows written before blobs existed, then blobs nothing points at any more
+        prompt_blobs.move_prompts_to_blobs(conn)
+        prompt_blobs.collect_garbage(conn)
+        timings['prompt_blobs'] = time.perf_counter() - started
+        # Placeholders are extracted here so requests never scan prompt text
+        started = time.perf_counter()
+        tasks_changed = summaries['tasks']['inserted'] + summaries['tasks']['updated'] + summaries['tasks']['deleted']
+        if not incremental or tasks_changed or not _has_placeholder_index(conn):
+            prompt_templates.rebuild_placeholder_index(conn)
+        timings['placeholders'] = time.perf_counter() - started
+        started = time.perf_counter()
+        conn.execute("COMMIT")
+        timings['commit'] = time.perf_counter() - started
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return summaries, timings
+
+def run_import_pipeline(incremental=False, workers=None, db_path=None, data_dirs=None, report_path=None):
+    """
+    Parse the five exports in parallel and commit them atomically through one writer.
+
+    Either every list is applied or, if any export fails to parse or write, nothing is.
+    Near-duplicate prompts are grouped before the write and reported to report_path
+    (default: next to db_path). Returns the per-table change summaries, or None when
+    the import was aborted.
+    """
+    db_path = db_path or DB_PATH
+    report_path = report_path or duplicate_report_path(db_path)
+    total_started = time.perf_counter()
+    mode = "incremental" if incremental else "full"
+    print(f"⚙️  Parsing exports ({mode} import)...")
+
+    started = time.perf_counter()
+    results = parse_lists(workers, data_dirs)
+    parse_wall = time.perf_counter() - started
+
+    failed = [(table, error) for table, (_t, _df, error, _s) in results.items() if error]
+    if failed:
+        for table, error in failed:
+            print(f"❌ Could not parse {table}: {error}")
+        print("❌ Import aborted; the database was not changed.")
+        return None
+
+    frames = {table: df for table, (_t, df, _e, _s) in results.items()}
+    started = time.perf_counter()
+    duplicates = prompt_dedup.assign_duplicate_groups(frames)
+    dedup_time = time.perf_counter() - started
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        summaries, write_timings = write_lists(conn, frames, incremental=incremental)
     except Exception as e:
-        print(f"❌ Error importing categories: {e}")
-        return False
-
-def import_tasks_data():
-    """Import tasks data from CSV"""
-    print("📋 Importing Tasks data...")
-    
-    csv_path = "ai_assistant/data/AI_Assistant_Tasks.csv"
-    if not os.path.exists(csv_path):
-        print(f"❌ File not found: {csv_path}")
-        return False
-    
+        print(f"❌ Import failed, no changes were written: {e}")
+        return None
+    finally:
+        conn.close()
+    prompt_dedup.write_report(duplicates, report_path)
+
+    print("\n⏱️  Stage timings:")
+    for table, _file_name, _normalizer, _keys, _label in IMPORT_LISTS:
+        print(f"   parse {table:<15} {results[table][3] * 1000:8.1f} ms  ({len(frames[table])} rows)")
+    print(f"   parse wall clock      {parse_wall * 1000:8.1f} ms")
+    print(f"   near-duplicates       {dedup_time * 1000:8.1f} ms")
+    for table, _file_name, _normalizer, _keys, _label in IMPORT_LISTS:
+        print(f"   write {table:<15} {write_timings[table] * 1000:8.1f} ms")
+    print(f"   prompt blobs          {write_timings['prompt_blobs'] * 1000:8.1f} ms")
+    print(f"   placeholder index     {write_timings['placeholders'] * 1000:8.1f} ms")
+    print(f"   commit                {write_timings['commit'] * 1000:8.1f} ms")
+    print(f"   total                 {(time.perf_counter() - total_started) * 1000:8.1f} ms")
+    print()
+    print(f"🧬 {duplicates['duplicate_rows']} near-duplicate prompts in {len(duplicates['clusters'])} groups "
+          f"(report: {report_path})")
+    print_change_summary(summaries)
+    return summaries
+
+# --- Shadow database import (build aside, verify, swap in) ---
+
+def shadow_path_for(db_path):
+    """Location of the shadow database built next to the live one"""
+    return db_path + ".shadow"
+
+def duplicate_report_path(db_path):
+    """Near-duplicate prompt report written next to the database"""
+    return db_path + ".duplicates.json"
+
+def build_shadow_database(live_path, shadow_path):
+    """Start the shadow as a consistent copy of the live DB (schema, hashes and all) via the backup API"""
+    for path in (shadow_path, shadow_path + "-journal"):
+        if os.path.exists(path):
+            os.remove(path)
+    source = sqlite3.connect(live_path)
+    target = sqlite3.connect(shadow_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def verify_shadow_database(shadow_path, summaries, live_path=None, min_task_ratio=0.5):
+    """
+    Integrity and row-count checks on the shadow before it may replace the live DB.
+
+    Returns a list of problems (empty when the shadow is good). Runs ANALYZE so the
+    swapped-in file ships with fresh planner statistics, and VACUUM when a quarter
+    of its pages are free.
+    """
+    problems = []
+    conn = sqlite3.connect(shadow_path)
     try:
-        df = pd.read_csv(csv_path)
-        df = clean_column_names(df)
-        
-        df_mapped = pd.DataFrame({
-            'task_id': df.get('taskid', ''),
-            'title': df.get('title', ''),
-            'task_description': df.get('task_description', ''),
-            'division': df.get('division', ''),
-            'category': df.get('category', ''),
-            'is_active': df.get('isactive', 'True').str.lower() == 'true',
-            'prompt_default': df.get('prompt_default', ''),
-            'prompt_v1': df.get('prompt_v1', ''),
-            'prompt_v2': df.get('prompt_v2', ''),
-            'config_json': df.get('configjson', '{}')
-        })
-        
-        conn = sqlite3.connect('ai_assistant/database/ai_assistant.db')
-        df_mapped.to_sql('tasks', conn, if_exists='replace', index=False)
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            problems.append(f"integrity_check: {result}")
+        for table, s in summaries.items():
+            expected = s['inserted'] + s['updated'] + s['unchanged']
+            active = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE is_active = 1").fetchone()[0]
+            if expected and not active:
+                problems.append(f"{table}: export has {expected} rows but no active rows were written")
+        new_tasks = conn.execute("SELECT COUNT(*) FROM tasks WHERE is_active = 1").fetchone()[0]
+        conn.execute("ANALYZE")
+        conn.commit()
+        # Nobody reads the shadow yet, so reclaim the pages freed by moving prompts into blobs
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free_pages > conn.execute("PRAGMA page_count").fetchone()[0] * 0.25:
+            conn.execute("VACUUM")
+    finally:
         conn.close()
-        
-        print(f"✅ Imported {len(df_mapped)} tasks")
-        return True
-        
+
+    # Guard against swapping in a truncated export
+    if live_path and os.path.exists(live_path):
+        live = sqlite3.connect(live_path)
+        try:
+            old_tasks = live.execute("SELECT COUNT(*) FROM tasks WHERE is_active = 1").fetchone()[0]
+        except sqlite3.Error:
+            old_tasks = 0
+        finally:
+            live.close()
+        if old_tasks and new_tasks < old_tasks * min_task_ratio:
+            problems.append(f"tasks: active count would drop from {old_tasks} to {new_tasks}")
+    return problems
+
+def swap_in_shadow(shadow_path, live_path, method=None, generation=None):
+    """
+    Make the shadow the live database.
+
+    'rename' atomically replaces the file; readers holding the old file finish on it and
+    new connections open the new one, so nobody waits on a lock. 'backup' copies pages
+    into the live file under one short write transaction, which is needed on Windows
+    where an open file cannot be replaced.
+    """
+    method = method or ("backup" if os.name == "nt" else "rename")
+    if method == "rename":
+        os.replace(shadow_path, live_path)
+    else:
+        source = sqlite3.connect(shadow_path)
+        target = sqlite3.connect(live_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        os.remove(shadow_path)
+    return bump_generation(live_path, generation)
+
+def new_generation():
+    """Generation ids sort by creation time"""
+    return datetime.now().strftime("%Y%m%d%H%M%S%f")
+
+def write_catalog_snapshot(db_path, generation, live_path=None):
+    """Emit the columnar snapshot for a generation; a failure only costs the app its fast path"""
+    try:
+        root = catalog_snapshot.snapshot_root(live_path or db_path)
+        directory = catalog_snapshot.write_snapshot(db_path, generation, root=root)
+        catalog_snapshot.prune_snapshots(root)
+        print(f"🗂️  Wrote catalog snapshot {directory}")
     except Exception as e:
-        print(f"❌ Error importing tasks: {e}")
-        return False
-
-def import_user_tasks_data():
-    """Import user tasks data from CSV"""
-    print("👤 Importing User Tasks data...")
-    
-    csv_path = "ai_assistant/data/AI_Assistant_UserTasks.csv"
-    if not os.path.exists(csv_path):
-        print(f"❌ File not found: {csv_path}")
-        return False
-    
+        print(f"⚠️  Could not write catalog snapshot: {e}")
+
+def write_icon_store(db_path):
+    """Resolve and store the division/category icons; a failure leaves the app on its bundled artwork"""
     try:
-        df = pd.read_csv(csv_path)
-        df = clean_column_names(df)
-        
-        df_mapped = pd.DataFrame({
-            'title': df.get('title', ''),
-            'task_name': df.get('taskname', ''),
-            'division': df.get('division', ''),
-            'category': df.get('category', ''),
-            'task_type': df.get('tasktype', ''),
-            'role': df.get('role', ''),
-            'goal': df.get('goal', ''),
-            'input_type': df.get('inputtype', ''),
-            'tone': df.get('tone', ''),
-            'output_type': df.get('outputtype', ''),
-            'task_description': df.get('task_description', ''),
-            'is_public': df.get('ispublic', 'False').str.lower() == 'true',
-            'is_favorite': df.get('isfavorite', 'False').str.lower() == 'true',
-            'is_active': df.get('isactive', 'True').str.lower() == 'true',
-            'created_date': df.get('createddate', ''),
-            'created_by': df.get('createdby', ''),
-            'prompt_text': df.get('prompttext', ''),
-            'tags': df.get('tags', ''),
-            'icon': df.get('icon', ''),
-            'task_id': pd.to_numeric(df.get('taskid', 0), errors='coerce').fillna(0)
-        })
-        
-        conn = sqlite3.connect('ai_assistant/database/ai_assistant.db')
-        df_mapped.to_sql('user_tasks', conn, if_exists='replace', index=False)
-        conn.close()
-        
-        print(f"✅ Imported {len(df_mapped)} user tasks")
-        return True
-        
+        count = icon_store.build_icon_store(db_path)
+        print(f"🖼️  Mapped {count} icons into {icon_store.STORE_DIR}")
     except Exception as e:
-        print(f"❌ Error importing user tasks: {e}")
-        return False
-
-def import_favorites_data():
-    """Import user favorites data from CSV"""
-    print("⭐ Importing User Favorites data...")
-    
-    csv_path = "ai_assistant/data/AI_Assistant_UserFavorites.csv"
-    if not os.path.exists(csv_path):
-        print(f"❌ File not found: {csv_path}")
-        return False
-    
+        print(f"⚠️  Could not build icon store: {e}")
+
+def write_related_tasks(db_path, summaries):
+    """Recompute similar tasks when the task list changed; a failure only hides the recommendations"""
+    s = summaries.get('tasks', {})
+    conn = sqlite3.connect(db_path)
     try:
-        df = pd.read_csv(csv_path)
-        df = clean_column_names(df)
-        
-        df_mapped = pd.DataFrame({
-            'title': df.get('title', ''),
-            'task_id': pd.to_numeric(df.get('taskid', 0), errors='coerce').fillna(0),
-            'user_email': df.get('useremail', ''),
-            'date_favorited': df.get('datefavorited', ''),
-            'is_active': df.get('isactive', 'True').str.lower() == 'true'
-        })
-        
-        conn = sqlite3.connect('ai_assistant/database/ai_assistant.db')
-        df_mapped.to_sql('user_favorites', conn, if_exists='replace', index=False)
+        built = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'related_tasks'"
+        ).fetchone() is not None
+    finally:
         conn.close()
-        
-        print(f"✅ Imported {len(df_mapped)} user favorites")
-        return True
-        
+    if built and not (s.get('inserted') or s.get('updated') or s.get('deleted')):
+        return
+    try:
+        started = time.perf_counter()
+        written = related_tasks.build_related_tasks(db_path)
+        print(f"🔗 Stored {written} related-task links in {(time.perf_counter() - started) * 1000:.0f} ms")
     except Exception as e:
-        print(f"❌ Error importing user favorites: {e}")
-        return False
+        print(f"⚠️  Could not build related tasks: {e}")
+
+def bump_generation(db_path, generation=None):
+    """Write a new catalog generation marker; the app reloads cached data when it changes"""
+    generation = generation or new_generation()
+    marker = db_path + ".generation"
+    with open(marker + ".tmp", "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(marker + ".tmp", marker)
+    return generation
+
+def run_shadow_import(incremental=False, workers=None, db_path=None, data_dirs=None,
+                      swap_method=None, min_task_ratio=0.5):
+    """Run the import pipeline against a shadow copy and swap it in only if it passes the checks"""
+    live_path = db_path or DB_PATH
+    shadow_path = shadow_path_for(live_path)
+    print(f"🪞 Building shadow database {shadow_path}")
+    build_shadow_database(live_path, shadow_path)
+
+    summaries = run_import_pipeline(incremental=incremental, workers=workers, db_path=shadow_path,
+                                    data_dirs=data_dirs, report_path=duplicate_report_path(live_path))
+    if summaries is None:
+        os.remove(shadow_path)
+        return None
+
+    if incremental and rows_changed(summaries) == 0:
+        # Nothing to publish: swapping would only bump the generation and make every session drop its caches
+        os.remove(shadow_path)
+        print(f"⏭️  No changes; {live_path} and its generation left as they are.")
+        return summaries
+
+    problems = verify_shadow_database(shadow_path, summaries, live_path, min_task_ratio)
+    if problems:
+        for problem in problems:
+            print(f"❌ Shadow check failed: {problem}")
+        print("❌ Live database left untouched; shadow discarded.")
+        os.remove(shadow_path)
+        return None
+
+    # The snapshot and icons must exist before the generation marker points at them
+    write_icon_store(shadow_path)
+    write_related_tasks(shadow_path, summaries)
+    generation = new_generation()
+    write_catalog_snapshot(shadow_path, generation, live_path)
+    swap_in_shadow(shadow_path, live_path, swap_method, generation)
+    print(f"🔀 Swapped shadow into {live_path} (generation {generation})")
+    return summaries
+
+def rows_changed(summaries):
+    """Inserted + updated + deleted rows across every list"""
+    return sum(s['inserted'] + s['updated'] + s['deleted'] for s in summaries.values())
+
+def print_change_summary(summaries):
+    """Print the per-list change counts of an incremental import"""
+    print("📝 Change summary:")
+    for table, s in summaries.items():
+        print(f"   {table:<15} +{s['inserted']} inserted  ~{s['updated']} updated  "
+              f"-{s['deleted']} deleted  ={s['unchanged']} unchanged")
+    print(f"   {rows_changed(summaries)} rows changed in total")
 
 def verify_data_import():
     """Verify that data was imported correctly"""
     print("\n🔍 Verifying imported data...")
-    
+
     try:
-        conn = sqlite3.connect('ai_assistant/database/ai_assistant.db')
-        
+        conn = sqlite3.connect(DB_PATH)
+
         # Count records in each table
         tables = ['divisions', 'categories', 'tasks', 'user_tasks', 'user_favorites']
-        
+
         for table in tables:
             cursor = conn.cursor()
             cursor.execute(f"SELECT COUNT(*) FROM {table}")
             count = cursor.fetchone()[0]
             print(f"   📊 {table}: {count} records")
-        
+
         conn.close()
-        
+
         print("\n✅ Data verification completed!")
-        
+
     except Exception as e:
         print(f"❌ Error verifying data: {e}")
 
-def main():
+def main(argv=None):
     """Main import function"""
+    parser = argparse.ArgumentParser(description="Import SharePoint list exports into the AI Assistant database")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only apply rows whose content changed since the last import")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parser processes (default: one per list, up to the CPU count; 1 = no pool)")
+    parser.add_argument("--in-place", action="store_true",
+                        help="write straight into the live database instead of building and swapping a shadow copy")
+    parser.add_argument("--swap", choices=["rename", "backup"], default=None,
+                        help="how the shadow replaces the live DB (default: rename, backup on Windows)")
+    parser.add_argument("--min-task-ratio", type=float, default=0.5,
+                        help="refuse to swap if active tasks drop below this fraction of the live count")
+    args = parser.parse_args(argv)
+
     print("🚀 AI Assistant Data Import Utility")
     print("=" * 50)
-    
+
     # Check if data directory exists
-    if not os.path.exists("ai_assistant/data"):
+    if not any(os.path.exists(d) for d in DATA_DIRS):
         print("❌ Data directory not found!")
-        print("   Please create the 'ai_assistant/data' folder and place your CSV files there.")
+        print(f"   Please create the '{DATA_DIRS[0]}' folder and place your CSV files there.")
         print("\n📁 Expected files:")
         print("   • AI_Assistant_Divisions.csv")
-        print("   • AI_Assistant_Categories.csv") 
+        print("   • AI_Assistant_Categories.csv")
         print("   • AI_Assistant_Tasks.csv")
         print("   • AI_Assistant_UserTasks.csv")
         print("   • AI_Assistant_UserFavorites.csv")
         return
-    
+
     # Check if database exists
-    if not os.path.exists("ai_assistant/database/ai_assistant.db"):
+    if not os.path.exists(DB_PATH):
         print("❌ Database not found!")
         print("   Please run 'python database_setup.py' first to create the database.")
         return
-    
+
     print("📥 Starting data import process...")
     print()
-    
-    # Import each data type
-    success_count = 0
-    
-    if import_divisions_data():
-        success_count += 1
-    
-    if import_categories_data():
-        success_count += 1
-    
-    if import_tasks_data():
-        success_count += 1
-    
-    if import_user_tasks_data():
-        success_count += 1
-    
-    if import_favorites_data():
-        success_count += 1
-    
+
+    if args.in_place:
+        summaries = run_import_pipeline(incremental=args.incremental, workers=args.workers)
+        if summaries is not None and args.incremental and rows_changed(summaries) == 0:
+            print(f"⏭️  No changes; generation of {DB_PATH} left as it is.")
+        elif summaries is not None:
+            write_icon_store(DB_PATH)
+            write_related_tasks(DB_PATH, summaries)
+            generation = new_generation()
+            write_catalog_snapshot(DB_PATH, generation)
+            bump_generation(DB_PATH, generation)
+    else:
+        summaries = run_shadow_import(incremental=args.incremental, workers=args.workers,
+                                      swap_method=args.swap, min_task_ratio=args.min_task_ratio)
+    if summaries is None:
+        print("\n⚠️  Check the error messages above and ensure your CSV files are properly formatted.")
+        return
+
     # Verify the import
     verify_data_import()
-    
-    print(f"\n🎉 Import completed! {success_count}/5 data sources imported successfully.")
-    
-    if success_count == 5:
-        print("\n✅ All data imported successfully!")
-        print("   You can now run your application: streamlit run main.py")
-    else:
-        print(f"\n⚠️  {5 - success_count} data sources had issues.")
-        print("   Check the error messages above and ensure your CSV files are properly formatted.")
+
+    print("\n✅ All data imported successfully!")
+    print("   You can now run your application: streamlit run main.py")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,496 @@
+"""
+LLM Execution Backend
+Runs rendered prompts against providers that speak the OpenAI-compatible
+chat completions API (OpenAI, Azure/OpenAI gateways, vLLM, Ollama, LiteLLM,
+the local mock server, ...) and streams the answer back token by token.
+
+Providers come from ai_assistant/config/llm_providers.json (path overridable
+with AI_ASSISTANT_LLM_CONFIG):
+
+    {"default": "local",
+     "providers": {
+        "local":  {"base_url": "http://127.0.0.1:8400/v1", "model": "mock-1"},
+        "openai": {"base_url": "https://api.openai.com/v1", "model": "gpt-4o-mini",
+                   "api_key_env": "OPENAI_API_KEY", "timeout": 60, "max_connections": 8}}}
+
+Without that file, OPENAI_API_KEY enables an "openai" provider and
+AI_ASSISTANT_LLM_BASE_URL (+ AI_ASSISTANT_LLM_MODEL) a "local" one.
+
+Each provider keeps one requests.Session for the life of the process, so
+every Streamlit session reuses the same pool of keep-alive connections
+instead of paying a TCP/TLS handshake per run.
+
+Every call runs under the provider's llm_resilience policy: a deadline for
+the whole call, jittered retries before the first token, optional hedging and
+a circuit breaker (CircuitOpen is raised at once while it is open). Hedged
+requests take a slot of the provider's llm_limiter, like every other call.
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import llm_limiter
+import llm_resilience
+
+CONFIG_PATH = os.environ.get("AI_ASSISTANT_LLM_CONFIG", "ai_assistant/config/llm_providers.json")
+DEFAULT_TIMEOUT = 60.0
+CONNECT_TIMEOUT = 5.0
+DEFAULT_MAX_CONNECTIONS = 8
+
+def estimate_tokens(text):
+    """Fast local token estimate for when a provider does not report usage (~4 chars or 3/4 word per token)"""
+    if not text:
+        return 0
+    return max(len(text) // 4, (len(text.split()) * 4) // 3)
+
+class LLMError(RuntimeError):
+    """A provider call that failed (connection error, HTTP error or malformed stream)"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class CircuitOpen(LLMError):
+    """The provider's circuit breaker is open; the call was not attempted"""
+
+class DeadlineExceeded(LLMError):
+    """The call did not finish within its deadline"""
+
+def _retryable(error):
+    if isinstance(error, (CircuitOpen, DeadlineExceeded)):
+        return False
+    return error.status is None or error.status == 429 or error.status >= 500
+
+def _parse_chunk(payload):
+    """A stream chunk as a dict whose choices, deltas and usage have the expected shapes, or None"""
+    try:
+        chunk = json.loads(payload)
+    except ValueError:
+        return None
+    if not isinstance(chunk, dict) or not isinstance(chunk.get("usage") or {}, dict):
+        return None
+    choices = chunk.get("choices") or []
+    if not isinstance(choices, list):
+        return None
+    for choice in choices:
+        if not isinstance(choice, dict) or not isinstance(choice.get("delta") or {}, dict):
+            return None
+        if not isinstance((choice.get("delta") or {}).get("content") or "", str):
+            return None
+    return chunk
+
+class ChatStream:
+    """
+    Iterator over the text deltas of one streamed completion.
+
+    Timing and usage are filled in while it is consumed: first_token_seconds is
+    what the user waits before text appears, total_seconds the full completion.
+    The HTTP response goes back to the connection pool when iteration ends.
+    Past deadline_at (perf_counter time) the stream raises DeadlineExceeded.
+    """
+
+    def __init__(self, response, provider, model, started, deadline_at=None, on_error=None):
+        self._response = response
+        self.provider = provider
+        self.model = model
+        self.started = started
+        self.first_token_seconds = None
+        self.total_seconds = None
+        self.usage = None
+        self.finish_reason = None
+        self.parts = []
+        self._deadline_at = deadline_at
+        self._on_error = on_error
+        self._ahead = []
+        self._deltas = self._read()
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def _read(self):
+        try:
+            for line in self._response.iter_lines():
+                if self._deadline_at is not None and time.perf_counter() > self._deadline_at:
+                    raise DeadlineExceeded(f"{self.provider}: call exceeded its deadline")
+                if not line.startswith(b"data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == b"[DONE]":
+                    break
+                chunk = _parse_chunk(payload)
+                if chunk is None:
+                    raise LLMError(f"{self.provider}: malformed stream chunk {payload[:80]!r}")
+                if chunk.get("usage"):
+                    self.usage = chunk["usage"]
+                for choice in chunk.get("choices") or ():
+                    delta = (choice.get("delta") or {}).get("content")
+                    if choice.get("finish_reason"):
+                        self.finish_reason = choice["finish_reason"]
+                    if delta:
+                        if self.first_token_seconds is None:
+                            self.first_token_seconds = time.perf_counter() - self.started
+                        yield delta
+        except requests.RequestException as e:
+            raise LLMError(f"{self.provider}: stream interrupted: {e}") from None
+
+    def prime(self):
+        """Read ahead to the first text delta, so a stalled or failing call fails before it is handed out"""
+        try:
+            for delta in self._deltas:
+                self._ahead.append(delta)
+                break
+        except BaseException:
+            self.close()
+            raise
+
+    def __iter__(self):
+        try:
+            while self._ahead:
+                delta = self._ahead.pop(0)
+                self.parts.append(delta)
+                yield delta
+            for delta in self._deltas:
+                self.parts.append(delta)
+                yield delta
+        except LLMError as e:
+            if self._on_error is not None:
+                self._on_error(e)
+            raise
+        finally:
+            self.total_seconds = time.perf_counter() - self.started
+            self._response.close()
+
+    def close(self):
+        self._response.close()
+
+class Provider:
+    """One OpenAI-compatible endpoint with its own pooled keep-alive session"""
+
+    def __init__(self, name, base_url, model, api_key=None, timeout=DEFAULT_TIMEOUT,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, headers=None, limits=None, resilience=None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.headers = dict(headers or {})
+        # Rate/concurrency settings for this provider's llm_limiter.FairLimiter
+        self.limits = dict(limits or {})
+        # Deadline, retry, hedging and circuit breaker settings (llm_resilience.Policy)
+        self.resilience = llm_resilience.Resilience(resilience)
+        self._session = None
+        self._hedge_pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # Retries are the caller's decision; the adapter only pools connections
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections,
+                                          max_retries=0, pool_block=True)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    session.headers.update({"Content-Type": "application/json", **self.headers})
+                    if self.api_key:
+                        session.headers["Authorization"] = f"Bearer {self.api_key}"
+                    self._session = session
+        return self._session
+
+    def _payload(self, prompt, model, system, stream, params):
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        payload = {"model": model or self.model, "messages": messages, "stream": stream, **params}
+        if stream:
+            payload.setdefault("stream_options", {"include_usage": True})
+        return payload
+
+    def _post(self, payload, stream, timeout=None):
+        try:
+            response = self.session.post(
+                f"{self.base_url}/chat/completions", json=payload, stream=stream,
+                timeout=(CONNECT_TIMEOUT, timeout or self.timeout),
+            )
+        except requests.RequestException as e:
+            raise LLMError(f"{self.name}: {e}") from None
+        if response.status_code >= 400:
+            detail = response.text[:300]
+            response.close()
+            raise LLMError(f"{self.name}: HTTP {response.status_code}: {detail}", status=response.status_code,
+                           retry_after=_retry_after(response))
+        return response
+
+    def _open(self, payload, started, deadline_at, timeout):
+        """One request, read up to its first token"""
+        opened = time.perf_counter()
+        remaining = deadline_at - opened
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{self.name}: call exceeded its deadline")
+        try:
+            # A blocked read can overrun the deadline by at most this read timeout
+            response = self._post(payload, stream=True, timeout=min(timeout or self.timeout, remaining))
+            stream = ChatStream(response, self.name, payload["model"], started, deadline_at, on_error=self._failed)
+            stream.prime()
+        except LLMError as e:
+            if e.status is None and not isinstance(e, DeadlineExceeded) and time.perf_counter() >= deadline_at:
+                raise DeadlineExceeded(f"{self.name}: call exceeded its deadline ({e})") from None
+            raise
+        if stream.first_token_seconds is not None:
+            # Per request, not per call: backoff sleeps must not inflate the hedging p95
+            self.resilience.first_token.add(time.perf_counter() - opened)
+        return stream
+
+    def _hedge_executor(self):
+        if self._hedge_pool is None:
+            with self._lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=self.max_connections,
+                                                          thread_name_prefix=f"hedge-{self.name}")
+        return self._hedge_pool
+
+    def _attempt(self, payload, started, deadline_at, timeout):
+        """_open, plus a second request when the first token is later than the observed p95"""
+        hedge_after = self.resilience.hedge_after()
+        if hedge_after is None:
+            return self._open(payload, started, deadline_at, timeout)
+        pool = self._hedge_executor()
+        primary = pool.submit(self._open, payload, started, deadline_at, timeout)
+        pending = {primary}
+        hedge_slot = None
+        done, _ = wait(pending, timeout=max(0.0, min(hedge_after, deadline_at - time.perf_counter())))
+        if not done:
+            # The duplicate is one more request in flight: it needs its own limiter slot, without queueing
+            limiter = llm_limiter.get_limiter(self.name, self.limits)
+            if limiter.try_acquire():
+                hedge_slot = limiter
+                self.resilience.count("hedges")
+                pending.add(pool.submit(self._open, payload, started, deadline_at, timeout))
+            else:
+                self.resilience.count("hedges_skipped")
+        error = None
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline_at - time.perf_counter()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                winners = []
+                for future in done:
+                    try:
+                        winners.append((future, future.result()))
+                    except LLMError as e:
+                        error = e
+                if winners:
+                    (future, stream), extra = winners[0], winners[1:]
+                    for _future, other in extra:
+                        other.close()
+                    if future is not primary:
+                        self.resilience.count("hedge_wins")
+                    return stream
+            raise error or DeadlineExceeded(f"{self.name}: call exceeded its deadline")
+        finally:
+            # Requests still running are abandoned: each response is closed whenever it arrives, and the
+            # hedge slot is given back once only the returned stream (covered by the caller's slot) is left
+            _abandon(pending, hedge_slot)
+
+    def _failed(self, error):
+        """Count a failed call; only unreachable, timed-out and 5xx providers count against the breaker"""
+        resilience = self.resilience
+        resilience.count("failures")
+        if isinstance(error, DeadlineExceeded):
+            resilience.count("deadline_exceeded")
+        if isinstance(error, CircuitOpen):
+            return
+        if error.status is None or error.status >= 500:
+            resilience.breaker.failure()
+        else:
+            # The provider answered (4xx, 429): it is up, whatever was wrong with the request
+            resilience.breaker.success()
+
+    def chat_stream(self, prompt, model=None, system=None, timeout=None, deadline=None, **params):
+        """
+        Start a streamed completion; returns a ChatStream to iterate over.
+
+        The whole call, retries and stream included, must finish within deadline seconds
+        (default: the provider's resilience policy). Failures before the first token are
+        retried with jittered backoff; while the circuit is open CircuitOpen is raised at once.
+        """
+        resilience = self.resilience
+        policy = resilience.policy
+        started = time.perf_counter()
+        deadline_at = started + (deadline or policy.deadline)
+        payload = self._payload(prompt, model, system, True, params)
+        attempt = 0
+        while True:
+            if not resilience.breaker.allow():
+                resilience.count("short_circuited")
+                retry_in = resilience.breaker.retry_in()
+                raise CircuitOpen(f"{self.name}: provider is failing, calls paused for {retry_in:.0f}s",
+                                  retry_after=retry_in)
+            resilience.count("attempts")
+            try:
+                stream = self._attempt(payload, started, deadline_at, timeout)
+            except BaseException as e:
+                if not isinstance(e, LLMError):
+                    # Interrupted (or a bug), not a verdict on the provider: let the next call probe
+                    resilience.breaker.release_probe()
+                    raise
+                self._failed(e)
+                delay = llm_resilience.backoff_delay(attempt, policy.backoff_base, policy.backoff_max, e.retry_after)
+                if not _retryable(e) or attempt >= policy.max_retries or time.perf_counter() + delay >= deadline_at:
+                    raise
+                resilience.count("retries")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            resilience.breaker.success()
+            return stream
+
+    def chat(self, prompt, model=None, system=None, timeout=None, **params):
+        """Full completion text (streamed underneath, so timeouts apply between chunks)"""
+        stream = self.chat_stream(prompt, model=model, system=system, timeout=timeout, **params)
+        for _delta in stream:
+            pass
+        return stream.text
+
+    def close(self):
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+def _close_result(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+def _abandon(futures, limiter=None):
+    """Close the streams of abandoned requests as they arrive, then release limiter's slot (if any)"""
+    if not futures:
+        if limiter is not None:
+            limiter.release()
+        return
+    left = [len(futures)]
+    lock = threading.Lock()
+
+    def _done(future):
+        _close_result(future)
+        with lock:
+            left[0] -= 1
+            last = left[0] == 0
+        if last and limiter is not None:
+            limiter.release()
+
+    for future in futures:
+        future.add_done_callback(_done)
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+# --- Provider registry (process-wide, shared by every session thread) ---
+
+_providers = {}
+_default_name = None
+_registry_lock = threading.Lock()
+
+def load_provider_configs(path=None):
+    """(default provider name, {name: settings}) from the config file or the environment"""
+    path = path or CONFIG_PATH
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        providers = data.get("providers", {})
+        return data.get("default") or next(iter(providers), None), providers
+    providers = {}
+    if os.environ.get("AI_ASSISTANT_LLM_BASE_URL"):
+        providers["local"] = {
+            "base_url": os.environ["AI_ASSISTANT_LLM_BASE_URL"],
+            "model": os.environ.get("AI_ASSISTANT_LLM_MODEL", "mock-1"),
+            "api_key_env": "AI_ASSISTANT_LLM_API_KEY",
+        }
+    if os.environ.get("OPENAI_API_KEY"):
+        providers["openai"] = {
+            "base_url": "https://api.openai.com/v1",
+            "model": os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
+            "api_key_env": "OPENAI_API_KEY",
+        }
+    return next(iter(providers), None), providers
+
+def _build_provider(name, settings):
+    return Provider(
+        name,
+        base_url=settings["base_url"],
+        model=settings.get("model", ""),
+        api_key=os.environ.get(settings["api_key_env"]) if settings.get("api_key_env") else settings.get("api_key"),
+        timeout=float(settings.get("timeout", DEFAULT_TIMEOUT)),
+        max_connections=int(settings.get("max_connections", DEFAULT_MAX_CONNECTIONS)),
+        headers=settings.get("headers"),
+        limits=settings.get("limits"),
+        resilience=settings.get("resilience"),
+    )
+
+def _ensure_registry():
+    global _default_name
+    if _providers or _default_name is not None:
+        return
+    with _registry_lock:
+        if _providers or _default_name is not None:
+            return
+        default, configs = load_provider_configs()
+        for name, settings in configs.items():
+            _providers[name] = _build_provider(name, settings)
+        _default_name = default or ""
+
+def available_providers():
+    """Configured provider names, default first"""
+    _ensure_registry()
+    return sorted(_providers, key=lambda name: (name != _default_name, name))
+
+def get_provider(name=None):
+    """The shared Provider for name (default provider when None); raises LLMError if unknown"""
+    _ensure_registry()
+    name = name or _default_name
+    provider = _providers.get(name)
+    if provider is None:
+        raise LLMError(f"No LLM provider named {name!r} is configured")
+    return provider
+
+def health_snapshots():
+    """Circuit breaker state and call counters per provider, for the admin page"""
+    return {name: provider.resilience.snapshot() for name, provider in list(_providers.items())}
+
+def register_provider(provider, default=False):
+    """Add or replace a provider at runtime (tests, benchmarks, the mock server)"""
+    global _default_name
+    _ensure_registry()
+    with _registry_lock:
+        old = _providers.get(provider.name)
+        if old is not None and old is not provider:
+            old.close()
+        _providers[provider.name] = provider
+        if default or not _default_name:
+            _default_name = provider.name
+
+def reset_providers():
+    """Close every session and re-read the configuration on next use"""
+    global _default_name
+    with _registry_lock:
+        for provider in _providers.values():
+            provider.close()
+        _providers.clear()
+        _default_name = None
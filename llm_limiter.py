@@ -0,0 +1,325 @@
+"""
+LLM Call Limiter
+Every Streamlit session runs its script in its own thread, so a burst of
+"Run prompt" clicks would otherwise hit a provider all at once. Each provider
+gets one process-wide FairLimiter that combines:
+
+- a token bucket (rate requests/s, up to burst at once), optionally shared
+  across processes through a small SQLite table (SQLiteTokenBucket); tokens
+  are taken with the limiter's lock released, so a busy limiter.db delays
+  only the thread taking the token;
+- a cap on requests in flight (max_concurrent), held for a whole stream;
+- per-user FIFO queues served round-robin, so one user clicking Run ten
+  times cannot starve everyone else.
+
+Waiting is bounded: a user may queue at most MAX_QUEUED_PER_USER calls and
+a call waits at most timeout seconds (QueueFull / QueueTimeout otherwise).
+Callers can pass on_wait to show the user their queue position.
+
+    with llm_limiter.get_limiter("openai").slot(user, on_wait=show_position):
+        ... call the provider ...
+
+Limits come from the provider's "limits" settings in llm_providers.json:
+    "limits": {"rate": 2, "burst": 5, "max_concurrent": 4, "shared_db": "ai_assistant/database/limiter.db"}
+"""
+
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 5
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_TIMEOUT = 60.0
+MAX_QUEUED_PER_USER = 3
+
+class QueueFull(RuntimeError):
+    """The user already has MAX_QUEUED_PER_USER calls waiting"""
+
+class QueueTimeout(RuntimeError):
+    """A queued call was not admitted within its timeout"""
+
+class TokenBucket:
+    """In-process token bucket; take() returns 0 when a token was taken, else seconds until one is due"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def take(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+class SQLiteTokenBucket:
+    """
+    Token bucket shared by every process that opens the same SQLite file.
+
+    The refill-and-take is one BEGIN IMMEDIATE transaction, so processes never
+    hand out the same token twice. Wall-clock time is used because monotonic
+    clocks are not comparable across processes.
+    """
+
+    def __init__(self, path, name, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.path = path
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS token_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def take(self, now=None):
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)).fetchone()
+            tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute("INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                         (self.name, tokens, now))
+            conn.execute("COMMIT")
+            return wait
+        finally:
+            conn.close()
+
+class _Ticket:
+    __slots__ = ("user", "granted", "enqueued")
+
+    def __init__(self, user):
+        self.user = user
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+class FairLimiter:
+    """Token bucket + concurrency cap with per-user round-robin queues (thread-safe)"""
+
+    def __init__(self, bucket=None, max_concurrent=DEFAULT_MAX_CONCURRENT, max_queued_per_user=MAX_QUEUED_PER_USER):
+        self.bucket = bucket or TokenBucket()
+        self.max_concurrent = max_concurrent
+        self.max_queued_per_user = max_queued_per_user
+        self.in_flight = 0
+        self._queues = OrderedDict()  # user -> deque of tickets; order is the round-robin rotation
+        self._cond = threading.Condition()
+        self._retry_at = 0.0
+        # Bucket tokens are taken with the lock released (a shared bucket is a SQLite transaction):
+        # _spare holds tokens already taken but not yet granted, _refilling marks a take in progress
+        self._spare = 0
+        self._refilling = False
+        self.admitted = 0
+        self.rejected = 0
+        self.max_wait_seconds = 0.0
+
+    def _dispatch(self):
+        """Grant queued tickets while a slot and a taken token are free. Caller holds the lock."""
+        while self._queues and self.in_flight < self.max_concurrent and self._spare > 0:
+            now = time.monotonic()
+            self._spare -= 1
+            user, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            # The served user moves to the back of the rotation
+            del self._queues[user]
+            if queue:
+                self._queues[user] = queue
+            ticket.granted = True
+            self.in_flight += 1
+            self.admitted += 1
+            self.max_wait_seconds = max(self.max_wait_seconds, now - ticket.enqueued)
+            self._cond.notify_all()
+
+    def _refill(self):
+        """Take one bucket token with the lock released, then dispatch. Caller holds the lock."""
+        self._refilling = True
+        self._cond.release()
+        try:
+            try:
+                wait = self.bucket.take()
+            except sqlite3.Error as e:
+                # A locked or unreadable shared bucket: back off briefly instead of failing every caller
+                print(f"⚠️ Token bucket unavailable: {e}")
+                wait = 1.0
+        finally:
+            self._cond.acquire()
+            self._refilling = False
+        if wait > 0:
+            self._retry_at = max(self._retry_at, time.monotonic() + wait)
+        else:
+            self._spare += 1
+        self._dispatch()
+        self._cond.notify_all()
+
+    def _pump(self):
+        """Dispatch, taking tokens off-lock while queued tickets could use them. Caller holds the lock."""
+        self._dispatch()
+        while (self._queues and self.in_flight < self.max_concurrent and not self._spare and not self._refilling
+               and time.monotonic() >= self._retry_at):
+            self._refill()
+
+    def position(self, ticket):
+        """1-based place in line under round-robin service (0 once admitted)"""
+        if ticket.granted:
+            return 0
+        queue = self._queues.get(ticket.user)
+        if queue is None:
+            return 0
+        index = queue.index(ticket)
+        ahead = index
+        after_me = False
+        for user, other in self._queues.items():
+            if user == ticket.user:
+                after_me = True
+                continue
+            # Users earlier in the rotation are served once more before my turn than users after me
+            ahead += min(len(other), index if after_me else index + 1)
+        return ahead + 1
+
+    def acquire(self, user, timeout=DEFAULT_TIMEOUT, on_wait=None):
+        """Wait for a slot; on_wait(position) is called whenever the queue position changes"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            queue = self._queues.get(user)
+            if queue is not None and len(queue) >= self.max_queued_per_user:
+                self.rejected += 1
+                raise QueueFull(f"{user} already has {len(queue)} prompt runs waiting")
+            ticket = _Ticket(user)
+            self._queues.setdefault(user, deque()).append(ticket)
+            last_position = None
+            try:
+                self._pump()
+                while not ticket.granted:
+                    now = time.monotonic()
+                    if now >= deadline:
+                        self.rejected += 1
+                        raise QueueTimeout(f"No capacity within {timeout:.0f}s; please try again")
+                    position = self.position(ticket)
+                    if on_wait is not None and position != last_position:
+                        last_position = position
+                        # Never call back into the page while holding the lock
+                        self._cond.release()
+                        try:
+                            on_wait(position)
+                        finally:
+                            self._cond.acquire()
+                        self._pump()
+                        continue
+                    sleep = deadline - now
+                    if self._retry_at > now:
+                        sleep = min(sleep, self._retry_at - now)
+                    self._cond.wait(sleep)
+                    self._pump()
+            except BaseException:
+                # Timeout, or on_wait raised (e.g. a Streamlit rerun): never leave the ticket behind
+                self._abandon(ticket)
+                raise
+        return ticket
+
+    def _abandon(self, ticket):
+        """Withdraw a ticket whose caller gave up; a granted one gives its slot back. Caller holds the lock."""
+        if ticket.granted:
+            self.in_flight -= 1
+            self._cond.notify_all()
+            self._pump()
+            return
+        queue = self._queues.get(ticket.user)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.user]
+
+    def _idle(self):
+        return (not self._queues and self.in_flight < self.max_concurrent and not self._refilling
+                and time.monotonic() >= self._retry_at)
+
+    def try_acquire(self):
+        """Take a slot without queueing: only when nobody is queued and a slot and a token are free"""
+        with self._cond:
+            if not self._idle():
+                return False
+            if not self._spare:
+                self._refill()
+                # Queued callers that arrived meanwhile come first
+                if not self._spare or self._queues or self.in_flight >= self.max_concurrent:
+                    return False
+            self._spare -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+            self._pump()
+
+    @contextmanager
+    def slot(self, user, timeout=DEFAULT_TIMEOUT, on_wait=None):
+        self.acquire(user, timeout=timeout, on_wait=on_wait)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self):
+        """Current load for the admin page"""
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queued": sum(len(q) for q in self._queues.values()),
+                "queued_users": len(self._queues),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "max_wait_seconds": round(self.max_wait_seconds, 3),
+            }
+
+# --- One limiter per provider, shared by every session thread ---
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def build_limiter(name, limits=None):
+    limits = limits or {}
+    rate = limits.get("rate", DEFAULT_RATE)
+    burst = limits.get("burst", DEFAULT_BURST)
+    if limits.get("shared_db"):
+        bucket = SQLiteTokenBucket(limits["shared_db"], name, rate, burst)
+    else:
+        bucket = TokenBucket(rate, burst)
+    return FairLimiter(bucket, max_concurrent=limits.get("max_concurrent", DEFAULT_MAX_CONCURRENT),
+                       max_queued_per_user=limits.get("max_queued_per_user", MAX_QUEUED_PER_USER))
+
+def get_limiter(name, limits=None):
+    """The process-wide limiter for a provider, created from limits on first use"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = _limiters[name] = build_limiter(name, limits)
+    return limiter
+
+def snapshots():
+    return {name: limiter.snapshot() for name, limiter in _limiters.items()}
@@ -0,0 +1,299 @@
+"""
+LLM Usage Metering
+Records every prompt execution (prompt and completion tokens, time to first
+token, total latency, cache status, error) with who ran it and for which
+task, division and category, so leadership can see which tasks cost the most
+and run slowest.
+
+Streams hand their record to a process-wide MetricsWriter: a bounded queue
+drained by one background thread that writes batches of up to BATCH_SIZE rows
+(or whatever arrived within FLUSH_SECONDS) in a single transaction, so a
+page never waits on SQLite. Each batch is appended to llm_metrics (insert
+only) and folded into llm_metrics_daily, a rollup keyed by day, user,
+task_id, division, category and provider that usage_report() reads directly.
+
+Token counts come from the provider's usage report when it sends one and from
+llm_backend.estimate_tokens otherwise (estimated = 1). In the rollup, tokens
+and latency are summed over live calls only: cache hits cost nothing and
+would make slow tasks look fast. Calls refused before reaching the provider
+(limiter queue full or timed out, circuit open; cache_status "rejected") are
+counted as rejected runs.
+
+    stream = response_cache.cached_stream(provider, prompt, task_id="1016",
+                                          meter={"user": "jdoe", "division": "VHA", "category": "Medical"})
+"""
+
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+from datetime import date
+
+import pandas as pd
+
+import catalog_db
+from llm_backend import estimate_tokens
+
+RUNS_PATH = os.environ.get(
+    "AI_ASSISTANT_LLM_RUNS",
+    os.path.join(os.path.dirname(catalog_db.DB_PATH) or ".", "llm_runs.db"),
+)
+BATCH_SIZE = 200
+FLUSH_SECONDS = 2.0
+# Records beyond this many unwritten ones are dropped (and counted) rather than blocking a page
+MAX_PENDING = 10000
+DIMENSIONS = ("user", "task_id", "division", "category", "provider")
+# cache_status values of answers that did not come from the provider
+CACHED_STATUSES = ("hit", "semantic")
+
+_schema_ready = set()
+
+def _connect(path=None):
+    path = path or RUNS_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    if path not in _schema_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_metrics (
+                run_at REAL NOT NULL,
+                day TEXT NOT NULL,
+                user TEXT,
+                task_id TEXT,
+                division TEXT,
+                category TEXT,
+                provider TEXT,
+                model TEXT,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                estimated INTEGER NOT NULL DEFAULT 0,
+                first_token_seconds REAL,
+                total_seconds REAL,
+                cache_status TEXT,
+                error TEXT
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_metrics_day ON llm_metrics (day)")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_metrics_daily (
+                day TEXT NOT NULL,
+                user TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                division TEXT NOT NULL,
+                category TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                runs INTEGER NOT NULL DEFAULT 0,
+                cached_runs INTEGER NOT NULL DEFAULT 0,
+                errors INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                live_runs INTEGER NOT NULL DEFAULT 0,
+                live_seconds REAL NOT NULL DEFAULT 0,
+                first_token_seconds REAL NOT NULL DEFAULT 0,
+                max_seconds REAL NOT NULL DEFAULT 0,
+                rejected_runs INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, user, task_id, division, category, provider)
+            ) WITHOUT ROWID
+        ''')
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(llm_metrics_daily)")}
+        if "rejected_runs" not in existing:
+            conn.execute("ALTER TABLE llm_metrics_daily ADD COLUMN rejected_runs INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+        _schema_ready.add(path)
+    return conn
+
+def _label(value):
+    return "" if value is None else str(value)
+
+def metric_row(stream, prompt, meter=None, error=None, now=None):
+    """llm_metrics row for a finished (or failed) stream; tokens are estimated when usage is missing"""
+    meter = meter or {}
+    now = now or time.time()
+    usage = getattr(stream, "usage", None) or {}
+    prompt_tokens = usage.get("prompt_tokens")
+    completion_tokens = usage.get("completion_tokens")
+    estimated = prompt_tokens is None or completion_tokens is None
+    if prompt_tokens is None:
+        prompt_tokens = estimate_tokens(prompt)
+    if completion_tokens is None:
+        completion_tokens = estimate_tokens(getattr(stream, "text", ""))
+    task_id = getattr(stream, "task_id", None)
+    return (
+        now, date.fromtimestamp(now).isoformat(), _label(meter.get("user")),
+        _label(task_id if task_id is not None else meter.get("task_id")),
+        _label(meter.get("division")), _label(meter.get("category")),
+        stream.provider, stream.model, int(prompt_tokens), int(completion_tokens), int(estimated),
+        stream.first_token_seconds, stream.total_seconds, stream.cache_status, error,
+    )
+
+def write_batch(rows, path=None):
+    """Append rows to llm_metrics and fold them into the daily rollup, in one transaction"""
+    if not rows:
+        return
+    rollup = {}
+    for (_run_at, day, user, task_id, division, category, provider, _model, prompt_tokens, completion_tokens,
+         _estimated, first_token, total, cache_status, error) in rows:
+        key = (day, user, task_id, division, category, _label(provider))
+        agg = rollup.setdefault(key, [0, 0, 0, 0, 0, 0, 0.0, 0.0, 0.0, 0])
+        agg[0] += 1
+        live = cache_status == "miss"
+        if cache_status in CACHED_STATUSES:
+            agg[1] += 1
+        elif cache_status == "rejected":
+            agg[9] += 1
+        if error is not None:
+            agg[2] += 1
+        if live:
+            agg[3] += prompt_tokens
+            agg[4] += completion_tokens
+            if error is None:
+                agg[5] += 1
+                agg[6] += total or 0.0
+                agg[7] += first_token or 0.0
+                agg[8] = max(agg[8], total or 0.0)
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.executemany("INSERT INTO llm_metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany(
+                "INSERT INTO llm_metrics_daily (day, user, task_id, division, category, provider, runs, "
+                "cached_runs, errors, prompt_tokens, completion_tokens, live_runs, live_seconds, "
+                "first_token_seconds, max_seconds, rejected_runs) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (day, user, task_id, division, category, provider) DO UPDATE SET "
+                "runs = runs + excluded.runs, cached_runs = cached_runs + excluded.cached_runs, "
+                "errors = errors + excluded.errors, prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "live_runs = live_runs + excluded.live_runs, live_seconds = live_seconds + excluded.live_seconds, "
+                "first_token_seconds = first_token_seconds + excluded.first_token_seconds, "
+                "max_seconds = MAX(max_seconds, excluded.max_seconds), "
+                "rejected_runs = rejected_runs + excluded.rejected_runs",
+                [key + tuple(agg) for key, agg in rollup.items()],
+            )
+    finally:
+        conn.close()
+
+class MetricsWriter:
+    """Background thread that writes queued metric rows in batches"""
+
+    def __init__(self, path=None, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS, max_pending=MAX_PENDING):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="llm-metrics", daemon=True)
+                    self._thread.start()
+
+    def submit(self, row):
+        """Queue one row; never blocks (the row is dropped when MAX_PENDING are already waiting)"""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch, waiters = [], []
+            try:
+                item = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_seconds
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for event in waiters:
+                event.set()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            write_batch(batch, self.path)
+            self.written += len(batch)
+        except sqlite3.Error as e:
+            # Metering must never break prompt runs; the batch is lost and counted
+            self.failed_batches += 1
+            print(f"⚠️ Could not write {len(batch)} LLM metric rows: {e}")
+
+    def flush(self, timeout=10.0):
+        """Wait until everything submitted so far is written; True when it was in time"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def snapshot(self):
+        return {"pending": self._queue.qsize(), "written": self.written, "dropped": self.dropped,
+                "failed_batches": self.failed_batches}
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """The process-wide writer, flushed at interpreter exit"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = MetricsWriter()
+                atexit.register(_writer.flush, 5.0)
+    return _writer
+
+def record(stream, prompt, meter=None, error=None):
+    """Queue the metrics of one execution for the background writer"""
+    get_writer().submit(metric_row(stream, prompt, meter, error))
+
+def usage_report(by="task_id", days=30, path=None):
+    """
+    Runs, live tokens and latency per user, task_id, division, category or provider
+    over the last days, from the daily rollup; most tokens first.
+    """
+    if by not in DIMENSIONS:
+        raise ValueError(f"by must be one of {', '.join(DIMENSIONS)}")
+    since = date.fromordinal(date.today().toordinal() - days + 1).isoformat()
+    conn = _connect(path)
+    try:
+        df = pd.read_sql_query(
+            f"SELECT {by}, SUM(runs) AS runs, SUM(cached_runs) AS cached_runs, SUM(rejected_runs) AS rejected_runs, "
+            f"SUM(errors) AS errors, "
+            f"SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens, "
+            f"SUM(live_runs) AS live_runs, SUM(live_seconds) AS live_seconds, "
+            f"SUM(first_token_seconds) AS first_token_seconds, MAX(max_seconds) AS max_seconds "
+            f"FROM llm_metrics_daily WHERE day >= ? GROUP BY {by}",
+            conn, params=[since],
+        )
+    finally:
+        conn.close()
+    live = df["live_runs"].where(df["live_runs"] > 0)
+    df["total_tokens"] = df["prompt_tokens"] + df["completion_tokens"]
+    df["avg_seconds"] = (df["live_seconds"] / live).round(3)
+    df["avg_first_token_s"] = (df["first_token_seconds"] / live).round(3)
+    df["max_seconds"] = df["max_seconds"].round(3)
+    df = df.drop(columns=["live_seconds", "first_token_seconds"])
+    return df.sort_values(["total_tokens", "avg_seconds"], ascending=False, na_position="last")
@@ -0,0 +1,173 @@
+"""
+LLM Call Resilience
+Building blocks that keep a slow or failing provider from tying up Streamlit
+script threads. llm_backend.Provider uses one Resilience per provider:
+
+- a per-call deadline covering connection, retries and the whole stream;
+- retries with exponential backoff and full jitter (Retry-After honoured) for
+  connection errors, timeouts, 429 and 5xx, before the first token only;
+- optional hedging: when the first token has not arrived after the provider's
+  observed p95 time to first token, a second identical request is sent (if
+  the provider's llm_limiter has a free slot and token, which it holds until
+  the race is decided) and whichever answers first is used;
+- a circuit breaker that opens after FAILURE_THRESHOLD consecutive failures,
+  fails calls fast for COOLDOWN seconds, then lets one probe call through.
+
+Settings come from the provider's "resilience" entry in llm_providers.json:
+    "resilience": {"deadline": 120, "max_retries": 2, "backoff_base": 0.5, "backoff_max": 8,
+                   "hedge": true, "failure_threshold": 5, "cooldown": 30}
+
+snapshot() exposes the breaker state and call counters for the admin page.
+"""
+
+import time
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+DEFAULT_DEADLINE = 120.0
+DEFAULT_MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+FAILURE_THRESHOLD = 5
+COOLDOWN = 30.0
+# Hedging waits for this many observed first tokens before trusting the p95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+@dataclass
+class Policy:
+    deadline: float = DEFAULT_DEADLINE
+    max_retries: int = DEFAULT_MAX_RETRIES
+    backoff_base: float = BACKOFF_BASE
+    backoff_max: float = BACKOFF_MAX
+    hedge: bool = False
+    failure_threshold: int = FAILURE_THRESHOLD
+    cooldown: float = COOLDOWN
+
+    @classmethod
+    def from_settings(cls, settings=None):
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (settings or {}).items() if k in known})
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX, retry_after=None, rng=random):
+    """Full-jitter exponential backoff for retry number attempt (0-based), at least retry_after"""
+    delay = rng.uniform(0, min(cap, base * (2 ** attempt)))
+    return max(delay, retry_after or 0.0)
+
+class LatencyWindow:
+    """Recent first-token latencies of one provider"""
+
+    def __init__(self, size=LATENCY_WINDOW, min_samples=HEDGE_MIN_SAMPLES):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.min_samples = min_samples
+
+    def add(self, seconds):
+        with self._lock:
+            self._values.append(seconds)
+
+    def percentile(self, q):
+        """q-th percentile in seconds, or None until min_samples were observed"""
+        with self._lock:
+            if len(self._values) < self.min_samples:
+                return None
+            return float(np.percentile(self._values, q))
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open (fail fast) -> half open (one probe) -> closed"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self, now=None):
+        """True when a call may go to the provider now"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def retry_in(self, now=None):
+        """Seconds until an open breaker lets a probe through"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.opened_at + self.cooldown - now)
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def failure(self, now=None):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED
+                                           and self.consecutive_failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic() if now is None else now
+                self.times_opened += 1
+            self._probing = False
+
+    def release_probe(self):
+        """Give up a probe that ended without a verdict (interrupted), so the next call can probe"""
+        with self._lock:
+            self._probing = False
+
+class Resilience:
+    """Policy, breaker, latency window and counters of one provider"""
+
+    COUNTERS = ("attempts", "failures", "retries", "hedges", "hedge_wins", "hedges_skipped", "short_circuited",
+                "deadline_exceeded")
+
+    def __init__(self, settings=None):
+        self.policy = Policy.from_settings(settings)
+        self.breaker = CircuitBreaker(self.policy.failure_threshold, self.policy.cooldown)
+        self.first_token = LatencyWindow()
+        self._counts = dict.fromkeys(self.COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counts[name] += n
+
+    def hedge_after(self):
+        """Seconds to wait for a first token before hedging, or None when hedging is off or untrained"""
+        if not self.policy.hedge:
+            return None
+        return self.first_token.percentile(95)
+
+    def snapshot(self):
+        """Breaker state and counters for the admin page"""
+        p95 = self.first_token.percentile(95)
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "times_opened": self.breaker.times_opened,
+            **counts,
+            "p95_first_token_s": None if p95 is None else round(p95, 3),
+            "hedging": self.policy.hedge,
+        }
@@ -11,9 +11,24 @@ import base64
 from datetime import datetime
 from PIL import Image
 import os
+import hmac
 import textwrap
+import zipfile
 import streamlit.components.v1 as components
 from urllib.parse import urlencode
+import catalog_db
+import catalog_snapshot
+import icon_store
+import fanout
+import llm_backend
+import llm_limiter
+import llm_metering
+import map_reduce
+import response_cache
+import prompt_templates
+import task_config
+import transcript_ingest
+from catalog_db import load_divisions, load_categories, load_tasks, facet_counts
 
 # Configure page
 _page_icon_path = "ai_assistant/images/VA Seal.png"
@@ -27,7 +42,8 @@ st.set_page_config(
 
 # DEBUG banner removed — normal startup proceeds
 
-# Helper function to load and encode images
+# Helper function to load and encode images (cached per process, not per rerun)
+@st.cache_resource(show_spinner=False)
 def get_image_as_base64(image_path):
     """Convert image to base64 for embedding in HTML"""
     try:
@@ -47,34 +63,67 @@ def get_image_as_base64(image_path):
 
 # Load VA images - prioritize SVG seal
 va_seal_b64 = get_image_as_base64("ai_assistant/images/Seal_of_the_U.S._Department_of_Veterans_Affairs.svg")
-vha_icon_b64 = get_image_as_base64("ai_assistant/images/VHA.png")
-vba_icon_b64 = get_image_as_base64("ai_assistant/images/VBA.png")
-nca_icon_b64 = get_image_as_base64("ai_assistant/images/NCA.png")
-admin_icon_b64 = get_image_as_base64("ai_assistant/images/Administrative.png")
-edu_icon_b64 = get_image_as_base64("ai_assistant/images/Education.png")
-finance_icon_b64 = get_image_as_base64("ai_assistant/images/Finance.png")
-hr_icon_b64 = get_image_as_base64("ai_assistant/images/Human Resources.png")
-it_icon_b64 = get_image_as_base64("ai_assistant/images/IT.png")
-mgmt_icon_b64 = get_image_as_base64("ai_assistant/images/Management.png")
-medical_icon_b64 = get_image_as_base64("ai_assistant/images/Medical.png")
-qps_icon_b64 = get_image_as_base64("ai_assistant/images/QPS.png")
 
 # Build optional background rules (safe strings)
 va_logo_bg = ("background-image: url(data:image/svg+xml;base64," + va_seal_b64 + ");") if va_seal_b64 else ""
 va_seal_bg = va_logo_bg
 header_logo_icon_bg = va_logo_bg
 
-vha_icon_rule = ("background-image: url(data:image/png;base64," + vha_icon_b64 + ");") if vha_icon_b64 else ""
-vba_icon_rule = ("background-image: url(data:image/png;base64," + vba_icon_b64 + ");") if vba_icon_b64 else ""
-nca_icon_rule = ("background-image: url(data:image/png;base64," + nca_icon_b64 + ");") if nca_icon_b64 else ""
-admin_icon_rule = ("background-image: url(data:image/png;base64," + admin_icon_b64 + ");") if admin_icon_b64 else ""
-edu_icon_rule = ("background-image: url(data:image/png;base64," + edu_icon_b64 + ");") if edu_icon_b64 else ""
-finance_icon_rule = ("background-image: url(data:image/png;base64," + finance_icon_b64 + ");") if finance_icon_b64 else ""
-hr_icon_rule = ("background-image: url(data:image/png;base64," + hr_icon_b64 + ");") if hr_icon_b64 else ""
-it_icon_rule = ("background-image: url(data:image/png;base64," + it_icon_b64 + ");") if it_icon_b64 else ""
-mgmt_icon_rule = ("background-image: url(data:image/png;base64," + mgmt_icon_b64 + ");") if mgmt_icon_b64 else ""
-medical_icon_rule = ("background-image: url(data:image/png;base64," + medical_icon_b64 + ");") if medical_icon_b64 else ""
-qps_icon_rule = ("background-image: url(data:image/png;base64," + qps_icon_b64 + ");") if qps_icon_b64 else ""
+# Rail icons come from the importer's icon store (pre-sized, mapped per division/category),
+# built once per process and catalog generation; bundled artwork covers an empty store
+_icon_map = icon_store.get_icon_map(catalog_db.current_generation())
+
+def _icon_rule(kind, label, fallback_path):
+    """background-image rule for a rail icon class"""
+    style = icon_store.icon_style(_icon_map, kind, label)
+    if style:
+        return style
+    b64 = get_image_as_base64(fallback_path)
+    return ("background-image: url(data:image/png;base64," + b64 + ");") if b64 else ""
+
+vha_icon_rule = _icon_rule("division", "VHA", "ai_assistant/images/VHA.png")
+vba_icon_rule = _icon_rule("division", "VBA", "ai_assistant/images/VBA.png")
+nca_icon_rule = _icon_rule("division", "NCA", "ai_assistant/images/NCA.png")
+admin_icon_rule = _icon_rule("category", "Administrative", "ai_assistant/images/Administrative.png")
+edu_icon_rule = _icon_rule("category", "Education", "ai_assistant/images/Education.png")
+finance_icon_rule = _icon_rule("category", "Finance", "ai_assistant/images/Finance.png")
+hr_icon_rule = _icon_rule("category", "Human Resources", "ai_assistant/images/Human Resources.png")
+it_icon_rule = _icon_rule("category", "IT", "ai_assistant/images/IT.png")
+mgmt_icon_rule = _icon_rule("category", "Management", "ai_assistant/images/Management.png")
+medical_icon_rule = _icon_rule("category", "Medical", "ai_assistant/images/Medical.png")
+qps_icon_rule = _icon_rule("category", "Quality & Patient Safety", "ai_assistant/images/QPS.png")
+
+# Icon classes for the bundled rail labels; other labels use their stored icon inline
+DIVISION_ICON_CLASSES = {"VHA": "vha-icon", "VBA": "vba-icon", "NCA": "nca-icon"}
+CATEGORY_ICON_CLASSES = {
+    "Administrative": "administrative-icon",
+    "Education": "education-icon",
+    "Finance": "finance-icon",
+    "Human Resources": "hr-icon",
+    "IT": "it-icon",
+    "Management": "management-icon",
+    "Medical": "medical-icon",
+    "Quality & Patient Safety": "qps-icon",
+}
+
+def _rail_icon(kind, label, classes):
+    """<div class='btn-icon'> for a rail button: bundled class when known, stored icon inline otherwise"""
+    icon_cls = classes.get(label)
+    if icon_cls:
+        return f"<div class='btn-icon {icon_cls}'></div>"
+    style = icon_store.icon_style(_icon_map, kind, label)
+    return f"<div class='btn-icon' style=\"{style}\"></div>" if style else "<div class='btn-icon'></div>"
+
+def _rail_labels(df, default_list):
+    """Active titles from a divisions/categories frame in sort order, "All" first"""
+    try:
+        if isinstance(df, pd.DataFrame) and 'title' in df.columns and not df.empty:
+            labels = [t for t in dict.fromkeys(df['title'].dropna().astype(str)) if t and t != 'All']
+            if labels:
+                return ["All"] + labels
+    except Exception:
+        pass
+    return ["All"] + default_list
 
 # CSS template uses doubled braces for literal CSS braces and single braces for placeholders.
 css_template = """
@@ -625,6 +674,15 @@ css_template = """
         letter-spacing: 0.3px;
     }}
 
+    .task-duplicates {{
+        color: var(--va-gray);
+        font-size: 0.75rem;
+        font-weight: 600;
+        text-decoration: none;
+        margin-left: auto;
+        margin-right: 0.75rem;
+    }}
+
     .task-arrow {{
         color: var(--va-blue);
         font-size: 1.5rem;
@@ -1323,72 +1381,12 @@ def components_html_with_css(inner_html: str, height: int = 600, scrolling: bool
 def get_database_connection():
     """Connect to the SQLite database"""
     try:
-        conn = sqlite3.connect('ai_assistant/database/ai_assistant.db')
+        conn = sqlite3.connect(catalog_db.DB_PATH)
         return conn
     except Exception as e:
         st.error(f"Database connection error: {e}")
         return None
 
-def load_divisions():
-    """Load divisions from database"""
-    conn = get_database_connection()
-    if conn:
-        df = pd.read_sql_query("SELECT * FROM divisions WHERE is_active = 1 ORDER BY sort_order", conn)
-        conn.close()
-        return df
-    return pd.DataFrame()
-
-def load_categories(division=None):
-    """Load categories from database"""
-    conn = get_database_connection()
-    if conn:
-        if division and division != "All":
-            df = pd.read_sql_query(
-                "SELECT * FROM categories WHERE is_active = 1 AND division LIKE ? ORDER BY sort_order",
-                conn, params=["%{}%".format(division)]
-            )
-        else:
-            df = pd.read_sql_query("SELECT * FROM categories WHERE is_active = 1 ORDER BY sort_order", conn)
-        conn.close()
-        return df
-    return pd.DataFrame()
-
-def load_tasks(task_id=None, division=None, category=None, search_term="", show_favorites=False, show_user_tasks=False):
-    """Load tasks from database with filters. If task_id is provided, return that task."""
-    conn = get_database_connection()
-    if conn:
-        try:
-            if task_id is not None:
-                df = pd.read_sql_query(
-                    "SELECT * FROM tasks WHERE task_id = ? AND is_active = 1",
-                    conn, params=[task_id]
-                )
-                conn.close()
-                return df
-
-            query = "SELECT * FROM tasks WHERE is_active = 1"
-            params = []
-
-            if division and division != "All":
-                query += " AND division LIKE ?"
-                params.append("%{}%".format(division))
-
-            if category and category != "All":
-                query += " AND category LIKE ?"
-                params.append("%{}%".format(category))
-
-            if search_term:
-                query += " AND (title LIKE ? OR task_description LIKE ?)"
-                params.extend(["%{}%".format(search_term), "%{}%".format(search_term)])
-
-            query += " ORDER BY title"
-
-            df = pd.read_sql_query(query, conn, params=params)
-            return df
-        finally:
-            conn.close()
-    return pd.DataFrame()
-
 # Ensure parent window listens for navigation requests from iframes (install once)
 st.markdown("""
 <script>
@@ -1433,11 +1431,55 @@ try:
 except Exception:
     qp = {}
 requested_page = _get_qp(qp, "page") if qp else None
+
+# Who is using the app: current_user when something set it, else the email of a Streamlit login
+# (st.user, when [auth] is configured in secrets.toml), else None
+def _signed_in_user():
+    if st.session_state.get('current_user'):
+        return str(st.session_state['current_user'])
+    try:
+        user = getattr(st, "user", None) or getattr(st, "experimental_user", None)
+        email = user.get("email") if user is not None else None
+    except Exception:
+        email = None
+    return str(email) if email else None
+
+# The admin page opens with ?page=admin&admin_token=<AI_ASSISTANT_ADMIN_TOKEN or secrets admin_token>
+# (remembered for the browser session), or for signed-in users listed in AI_ASSISTANT_ADMINS
+ADMIN_USERS = {u.strip() for u in os.environ.get("AI_ASSISTANT_ADMINS", "").split(",") if u.strip()}
+
+def _admin_token():
+    token = os.environ.get("AI_ASSISTANT_ADMIN_TOKEN")
+    if not token:
+        try:
+            token = st.secrets.get("admin_token")
+        except Exception:
+            token = None
+    return str(token) if token else None
+
+def _is_admin():
+    if st.session_state.get('is_admin'):
+        return True
+    token = _admin_token()
+    supplied = _get_qp(qp, "admin_token") if qp else None
+    if token and supplied and hmac.compare_digest(str(supplied).encode("utf-8"), token.encode("utf-8")):
+        st.session_state['is_admin'] = True
+        try:
+            # Keep the token out of the address bar and browser history
+            del st.query_params["admin_token"]
+        except Exception:
+            pass
+        return True
+    user = _signed_in_user()
+    return user is not None and user in ADMIN_USERS
+
 _allowed_pages = {"title", "notice", "welcome", "main", "edit_task", "help", "task"}
+if _is_admin():
+    _allowed_pages.add("admin")
 if requested_page in _allowed_pages:
     # Always allow query-param driven navigation to override session_state on reloads
     st.session_state.current_page = requested_page
-elif "current_page" not in st.session_state:
+elif "current_page" not in st.session_state or st.session_state.current_page not in _allowed_pages:
     st.session_state.current_page = "title"
 
 def show_title_page():
@@ -2515,9 +2557,12 @@ def show_main_interface():
     """Tasks UI modeled after scrTasks.png; resilient if DB is empty/missing columns."""
     # Cached loader for all active tasks (unfiltered) to avoid repeated DB hits for counts
     @st.cache_data(show_spinner=False, ttl=120)
-    def _cached_all_tasks():
+    def _cached_all_tasks(generation):
+        # generation is part of the cache key so a swapped-in import is picked up immediately
         try:
-            return load_tasks() or pd.DataFrame()
+            snapshot = catalog_snapshot.get_snapshot(generation)
+            df = snapshot.frame() if snapshot is not None else load_tasks()
+            return df if isinstance(df, pd.DataFrame) else pd.DataFrame()
         except Exception:
             return pd.DataFrame()
 
@@ -2531,6 +2576,10 @@ def show_main_interface():
     qp_q = _get_qp(_qp, "q") or ""
     qp_fav = _get_qp(_qp, "fav") or "0"
     qp_mine = _get_qp(_qp, "mine") or "0"
+    # Optional "needs an input" filter, e.g. needs=transcript (matched against task_placeholders)
+    qp_needs = _get_qp(_qp, "needs") or ""
+    # dups=1 lists every member of a near-duplicate prompt group instead of one card per group
+    qp_dups = _get_qp(_qp, "dups") or "0"
     qp_sort = _get_qp(_qp, "sort") or "title_asc"
     try:
         qp_page = int(_get_qp(_qp, "p") or "1")
@@ -2732,26 +2781,26 @@ def show_main_interface():
     rail, main = st.columns([1, 4])
     with rail:
         st.markdown('<nav class="filter-rail" aria-label="Task Filters" role="navigation">', unsafe_allow_html=True)
-        # Compute counts per division/category from tasks (lightweight; uses load_tasks without filters)
-        try:
-            _all_tasks_df = _cached_all_tasks()
-        except Exception:
-            _all_tasks_df = pd.DataFrame()
+        # Compute counts per division/category: memory-mapped snapshot when the importer built one,
+        # otherwise from the cached unfiltered task list
+        _generation = catalog_db.current_generation()
         div_counts = {}
         cat_counts = {}
-        try:
-            if isinstance(_all_tasks_df, pd.DataFrame) and not _all_tasks_df.empty:
-                if 'division' in _all_tasks_df.columns:
-                    div_counts = _all_tasks_df['division'].fillna('Unknown').value_counts().to_dict()
-                if 'category' in _all_tasks_df.columns:
-                    cat_counts = _all_tasks_df['category'].fillna('Unknown').value_counts().to_dict()
-        except Exception:
-            pass
         total_tasks_count = 0
-        try:
-            total_tasks_count = int(sum(div_counts.values())) if div_counts else int(len(_all_tasks_df))
-        except Exception:
-            pass
+        _snapshot = catalog_snapshot.get_snapshot(_generation)
+        if _snapshot is not None:
+            div_counts, cat_counts = _snapshot.facet_counts()
+            total_tasks_count = _snapshot.rows
+        else:
+            try:
+                _all_tasks_df = _cached_all_tasks(_generation)
+            except Exception:
+                _all_tasks_df = pd.DataFrame()
+            try:
+                div_counts, cat_counts = facet_counts(_all_tasks_df)
+                total_tasks_count = int(len(_all_tasks_df))
+            except Exception:
+                pass
 
         st.markdown('<div style="display:flex;align-items:center;justify-content:space-between;margin-bottom:4px;">\n'
                     '<h3 style="margin:0;font-size:1.05rem;">Division</h3>'
@@ -2762,17 +2811,11 @@ def show_main_interface():
         # Inline division filter
         st.markdown('<input id="div-filter-input" type="text" placeholder="Filter divisions..." title="Type to filter divisions" aria-label="Filter divisions" '
                     'style="width:100%;padding:6px 10px;margin:4px 0 10px;border:1px solid var(--va-gray-lighter);border-radius:8px;font-size:12px;" />', unsafe_allow_html=True)
-        items = [
-            ("All", ""),
-            ("VHA", "vha-icon"),
-            ("VBA", "vba-icon"),
-            ("NCA", "nca-icon"),
-        ]
         div_html = []
-        for label, icon_cls in items:
+        for label in _rail_labels(divisions_df, ["VHA", "VBA", "NCA"]):
             active = " active" if (qp_div == label) else ""
             href = f"?page=main&div={label}&cat={qp_cat}"
-            icon = f"<div class='btn-icon {icon_cls}'></div>" if icon_cls else "<div class='btn-icon'></div>"
+            icon = _rail_icon("division", label, DIVISION_ICON_CLASSES)
             if label == 'All':
                 cval = total_tasks_count
             else:
@@ -2793,24 +2836,14 @@ def show_main_interface():
         # Inline search input for client-side filtering
         st.markdown('<input id="cat-filter-input" type="text" placeholder="Filter categories..." title="Type to filter categories" aria-label="Filter categories" '
                     'style="width:100%;padding:6px 10px;margin:4px 0 10px;border:1px solid var(--va-gray-lighter);border-radius:8px;font-size:12px;" />', unsafe_allow_html=True)
-        cat_map = [
-            ("All", ""),
-            ("Administrative", "administrative-icon"),
-            ("Education", "education-icon"),
-            ("Finance", "finance-icon"),
-            ("Human Resources", "hr-icon"),
-            ("IT", "it-icon"),
-            ("Management", "management-icon"),
-            ("Medical", "medical-icon"),
-            ("Public Affairs", ""),
-            ("Quality & Patient Safety", "qps-icon"),
-            ("Service Recovery", ""),
-        ]
         cat_html = []
-        for label, icon_cls in cat_map:
+        for label in _rail_labels(categories_df, [
+            "Administrative", "Education", "Finance", "Human Resources", "IT",
+            "Management", "Medical", "Public Affairs", "Quality & Patient Safety", "Service Recovery",
+        ]):
             active = " active" if (qp_cat == label) else ""
             href = f"?page=main&div={qp_div}&cat={label}"
-            icon = f"<div class='btn-icon {icon_cls}'></div>" if icon_cls else "<div class='btn-icon'></div>"
+            icon = _rail_icon("category", label, CATEGORY_ICON_CLASSES)
             if label == 'All':
                 cval = total_tasks_count
             else:
@@ -2976,12 +3009,20 @@ def show_main_interface():
                 "mine": "1" if my_tasks else "0",
                 "sort": qp_sort,
                 "p": str(qp_page),
+                **({"needs": qp_needs} if qp_needs else {}),
+                **({"dups": "1"} if qp_dups == "1" else {}),
             })
         except Exception:
             pass
 
-        # Fetch tasks safely
-        tasks = load_tasks(division=qp_div, category=qp_cat, search_term=search_term, show_favorites=show_favorites)
+        # Fetch tasks safely: from the memory-mapped snapshot when there is one (the placeholder
+        # filter needs task_placeholders, so it still goes to SQLite)
+        _grid_snapshot = None if qp_needs else catalog_snapshot.get_snapshot(catalog_db.current_generation())
+        if _grid_snapshot is not None:
+            tasks = _grid_snapshot.tasks(division=qp_div, category=qp_cat, search_term=search_term)
+        else:
+            tasks = load_tasks(division=qp_div, category=qp_cat, search_term=search_term,
+                               show_favorites=show_favorites, placeholder=qp_needs or None)
         # Apply sort preference
         try:
             if isinstance(tasks, pd.DataFrame) and not tasks.empty:
@@ -3019,6 +3060,15 @@ def show_main_interface():
                         break
         except Exception:
             pass
+        # Collapse near-duplicate prompts (duplicate_group from the importer) to their first card
+        try:
+            if qp_dups != "1" and isinstance(tasks, pd.DataFrame) and 'duplicate_group' in tasks.columns:
+                grouped = tasks['duplicate_group'].notna()
+                group_sizes = tasks.loc[grouped, 'duplicate_group'].value_counts()
+                tasks = tasks[~grouped | ~tasks['duplicate_group'].duplicated(keep='first')].copy()
+                tasks['duplicate_count'] = tasks['duplicate_group'].map(group_sizes).fillna(1).astype(int) - 1
+        except Exception:
+            pass
         
         # Check if empty after all filters
         display_empty_state = False
@@ -3056,6 +3106,7 @@ def show_main_interface():
             "mine": "1" if my_tasks else "0",
             "sort": qp_sort,
             "p": str(qp_page),
+            **({"dups": "1"} if qp_dups == "1" else {}),
         }
 
         if display_empty_state:
@@ -3128,6 +3179,12 @@ def show_main_interface():
                     fav_class = 'favorite-star favorited' if is_fav else 'favorite-star'
                     fav_href = "?" + urlencode(dict(base_params, favt=tid))
                     details_href = "?" + urlencode(dict(base_params, page="task", task=tid))
+                    dup_count = int(task.get('duplicate_count', 0) or 0)
+                    dup_html = (
+                        f"<a class='task-duplicates' href='?{urlencode(dict(base_params, dups='1'))}' "
+                        f"target='_self' title='Tasks with nearly the same prompt'>+{dup_count} similar</a>"
+                        if dup_count else ""
+                    )
                     html = f"""
                     <div class='task-card' role='article' aria-label='{task.get('title','Untitled')}' tabindex='0'>
                       <div class='task-header'>
@@ -3139,6 +3196,7 @@ def show_main_interface():
                       <div class='task-description'>{task.get('task_description','')}</div>
                       <div class='task-footer'>
                         <span class='task-category'>{task.get('category','')}</span>
+                        {dup_html}
                         <span class='task-arrow'><a href='{details_href}' target='_self' style='text-decoration:none;color:inherit;'>›</a></span>
                       </div>
                     </div>
@@ -3248,6 +3306,13 @@ def show_main_interface():
             if not detail_df.empty:
                 row = detail_df.iloc[0]
                 close_href = "?" + urlencode(base_params)
+                related = catalog_db.load_related_tasks(row.get('task_id'), limit=3)
+                related_html = "".join(
+                    f"<a class='va-related' href='?{urlencode(dict(base_params, task=r.task_id))}' target='_parent'>{r.title}</a>"
+                    for r in related.itertuples()
+                )
+                if related_html:
+                    related_html = f"<div class='related'><b>Similar tasks:</b> {related_html}</div>"
                 modal_html = f"""
                 <style>
                   .va-modal-backdrop{{position:fixed;inset:0;background:rgba(0,0,0,0.35);z-index:1000;}}
@@ -3260,6 +3325,8 @@ def show_main_interface():
                   .va-modal .actions{{margin-top:16px;display:flex;gap:12px;justify-content:flex-end;}}
                   .va-btn{{padding:10px 16px;border-radius:10px;text-decoration:none;border:1px solid var(--va-gray-lighter);}}
                   .va-btn.primary{{background:var(--va-navy);color:#fff;border:none;}}
+                  .va-modal .related{{margin-top:12px;color:var(--va-gray);font-size:0.9rem;}}
+                  .va-modal .va-related{{margin-left:8px;color:var(--va-blue);text-decoration:none;}}
                 </style>
                 <a class='va-modal-backdrop' href='{close_href}'></a>
                 <div class='va-modal'>
@@ -3271,13 +3338,14 @@ def show_main_interface():
                     <div><b>Due:</b> {row.get('due_date','')}</div>
                     <div style='grid-column:1 / -1'><b>Tags:</b> {row.get('tags','')}</div>
                   </div>
+                  {related_html}
                   <div class='actions'>
                     <a class='va-btn' href='{close_href}'>Close</a>
                     <a class='va-btn primary' href='?page=edit_task&task_id={row.get('task_id','')}' target='_self'>Edit Task</a>
                   </div>
                 </div>
                 """
-                components_html_with_css(modal_html, height=200, scrolling=False)
+                components_html_with_css(modal_html, height=240 if related_html else 200, scrolling=False)
 
     # Back to top button
     back_to_top_html = """
@@ -3308,6 +3376,174 @@ def show_main_interface():
     """
     st.markdown(back_to_top_html, unsafe_allow_html=True)
 
+def _current_user_key():
+    """Who the limiter queues (and metering counts) a run under: the signed-in user, else this browser session"""
+    user = _signed_in_user()
+    if user:
+        return user
+    if 'anon_user_key' not in st.session_state:
+        import uuid
+        st.session_state['anon_user_key'] = f"session-{uuid.uuid4().hex[:12]}"
+    return st.session_state['anon_user_key']
+
+def _transcript_upload(name, key):
+    """Optional transcript file for a field; only the stored transcript's id is kept in session state"""
+    upload = st.file_uploader(f"…or upload the {name.lower()} (.vtt, .srt, .docx, .txt)",
+                              type=list(transcript_ingest.FORMATS), key=key)
+    if upload is None:
+        return None
+    transcript_ingest.cleanup_if_due()
+    stored = st.session_state.get(key + "_stored")
+    file_id = getattr(upload, "file_id", None) or f"{upload.name}:{upload.size}"
+    if stored and stored[0] == file_id:
+        transcript = transcript_ingest.load_transcript(stored[1])
+        if transcript is not None:
+            return transcript
+    try:
+        transcript = transcript_ingest.ingest(upload, upload.name)
+    except (ValueError, OSError, zipfile.BadZipFile, KeyError) as e:
+        st.error(f"❌ Could not read {upload.name}: {e}")
+        return None
+    st.session_state[key + "_stored"] = (file_id, transcript.transcript_id)
+    return transcript
+
+def _run_prompt_panel(task_id, template, values, transcripts=None, meter=None):
+    """"Run prompt" against a configured LLM provider, streaming the answer into the page"""
+    providers = llm_backend.available_providers()
+    if not providers:
+        return
+    cols = st.columns([1, 2])
+    with cols[0]:
+        run = st.button("▶ Run prompt", key=f"run_{task_id}")
+    with cols[1]:
+        provider_name = st.selectbox("Provider", providers, key=f"provider_{task_id}",
+                                     label_visibility="collapsed") if len(providers) > 1 else providers[0]
+    if not run:
+        return
+    output = st.empty()
+    stream = None
+    try:
+        provider = llm_backend.get_provider(provider_name)
+        limiter = llm_limiter.get_limiter(provider.name, provider.limits)
+
+        def _show_position(position):
+            output.info(f"⏳ Waiting for capacity: you are #{position} in line")
+
+        user = _current_user_key()
+        gate = lambda: limiter.slot(user, on_wait=_show_position)
+        notes = ""
+        long_input = None
+        if transcripts:
+            # An uploaded transcript stays on disk; it is only read whole when it fits in one call
+            field, transcript = next(iter(transcripts.items()))
+            values = dict(values)
+            values[field] = ""
+            if map_reduce.needs_map_reduce(provider, template, values, extra_tokens=transcript.tokens):
+                long_input = (field, transcript)
+            else:
+                values[field] = transcript.read()
+        if long_input or map_reduce.needs_map_reduce(provider, template, values):
+            # Too long for one call: chunk results are cached, so a re-run after a small edit
+            # only re-processes the chunks that changed. Chunk workers never touch the page.
+            stream, stats = map_reduce.map_reduce_stream(
+                provider, template, values, task_id=task_id,
+                gate=lambda: limiter.slot(user), reduce_gate=gate,
+                parallelism=limiter.max_queued_per_user, long_input=long_input, meter=meter,
+                on_progress=lambda done: output.info(f"⏳ Processed part {done}..."),
+            )
+            notes = f" · {stats['chunks']} parts ({stats['cached_chunks']} cached)"
+        else:
+            # Identical prompt + provider + model runs are replayed from the response cache, and runs of
+            # this template whose inputs are nearly the same from its semantic tier; only misses wait
+            # for a slot from the provider's process-wide limiter
+            stream = response_cache.cached_stream(provider, template.fill(values), task_id=task_id, gate=gate,
+                                                  semantic_text=template.inputs_text(values),
+                                                  semantic_scope=prompt_templates.content_hash(template.text),
+                                                  meter=meter)
+        last_paint = 0.0
+        for _delta in stream:
+            # Repaint at most ~20 times a second; every paint is a websocket message
+            now = time.perf_counter()
+            if now - last_paint >= 0.05:
+                output.markdown(stream.text + "▌")
+                last_paint = now
+        output.markdown(stream.text)
+        st.caption(f"{stream.provider} · {stream.model} · first token {stream.first_token_seconds or 0:.2f}s · "
+                   f"total {stream.total_seconds:.2f}s" + _cache_note(stream.cache_status, stream.similarity) + notes)
+    except (llm_backend.LLMError, llm_limiter.QueueFull, llm_limiter.QueueTimeout) as e:
+        output.empty()
+        st.error(f"❌ Could not run prompt: {e}")
+    finally:
+        if stream is not None:
+            stream.close()
+
+def _cache_note(cache_status, similarity=None):
+    if cache_status == "semantic":
+        # Fan-out results from older runs may carry no score
+        score = f", {similarity:.0%}" if similarity is not None else ""
+        return f" · cached (similar inputs{score})"
+    return " · cached" if cache_status == "hit" else ""
+
+def _compare_providers_panel(task_id, template, values, meter=None):
+    """Send the filled prompt to several providers at once and stream the answers side by side"""
+    providers = llm_backend.available_providers()
+    if len(providers) < 2:
+        return
+    with st.expander("⚖️ Compare providers"):
+        chosen = st.multiselect("Providers", providers, default=providers[:3], key=f"compare_{task_id}")
+        if st.button("Run on all", key=f"compare_run_{task_id}") and chosen:
+            user = _current_user_key()
+            columns = dict(zip(chosen, st.columns(len(chosen))))
+            boxes, texts, last_paint = {}, {}, {}
+            for name, column in columns.items():
+                column.markdown(f"**{name}**")
+                boxes[name] = column.empty()
+                texts[name] = []
+                last_paint[name] = 0.0
+
+            def _on_event(name, kind, payload):
+                if kind == "delta":
+                    texts[name].append(payload)
+                    now = time.perf_counter()
+                    if now - last_paint[name] >= 0.1:
+                        boxes[name].markdown("".join(texts[name]) + "▌")
+                        last_paint[name] = now
+                elif kind == "error":
+                    boxes[name].error(f"❌ {payload.error}")
+                else:
+                    boxes[name].markdown(payload.text)
+                    columns[name].caption(
+                        f"first token {payload.first_token_seconds or 0:.2f}s · total {payload.total_seconds:.2f}s · "
+                        f"{payload.output_tokens:,} tokens" + _cache_note(payload.cache_status, payload.similarity)
+                    )
+
+            fanout.run_fanout(
+                template.fill(values), chosen, task_id=task_id, on_event=_on_event,
+                semantic_text=template.inputs_text(values),
+                semantic_scope=prompt_templates.content_hash(template.text), meter=meter,
+                gate=lambda provider: (lambda: llm_limiter.get_limiter(provider.name, provider.limits).slot(user)),
+            )
+        summary = fanout.comparison_summary(task_id)
+        if not summary.empty:
+            st.caption("Past comparisons for this task (live calls)")
+            st.dataframe(summary, hide_index=True, use_container_width=True)
+
+def _placeholder_input(name, config_field, key):
+    """Input for one prompt placeholder, typed by the task's config when it describes the field"""
+    if config_field is None:
+        return st.text_input(name, key=key)
+    label = config_field.display_label
+    if config_field.type == "Dropdown":
+        return st.selectbox(label, options=[""] + list(config_field.choices), key=key,
+                            help=config_field.placeholder or None)
+    if config_field.type == "TextArea":
+        return st.text_area(label, key=key, placeholder=config_field.placeholder)
+    if config_field.type == "Date":
+        return st.date_input(label, key=key).strftime("%B %d, %Y")
+    if config_field.type == "Toggle":
+        return "Yes" if st.checkbox(label, key=key) else "No"
+    return st.text_input(label, key=key, placeholder=config_field.placeholder)
+
 def show_task_page():
     """Dedicated task details page with actions (opened from the grid)."""
     try:
@@ -3356,6 +3592,48 @@ def show_task_page():
         st.markdown(f"**Due date:** {row.get('due_date','')}")
     st.markdown(f"**Tags:** {row.get('tags','')}")
 
+    # Prompt: loaded only on this page; compiled once per task/content, so typing into the
+    # fields only re-joins segments
+    prompt_text = catalog_db.load_task_prompts(row.get('task_id'))['prompt_default']
+    if isinstance(prompt_text, str) and prompt_text.strip():
+        template = prompt_templates.compile_template(prompt_text, task_id=row.get('task_id'),
+                                                     digest=row.get('prompt_default_hash'))
+        values = {}
+        transcripts = {}
+        # Field list comes from the import-time index; the template is only parsed when it is missing
+        fields = [p["display_name"] for p in catalog_db.load_task_placeholders(row.get('task_id'), variant="default")]
+        fields = fields or template.placeholders
+        # Parsed config is cached per task and catalog generation, so reruns do not decode JSON
+        config = task_config.get_task_config(row.get('task_id'), row.get('config_json'),
+                                             version=catalog_db.current_generation())
+        if fields:
+            with st.expander(f"Fill in {len(fields)} field(s)", expanded=True):
+                for name in fields:
+                    key = prompt_templates.canonical_name(name)
+                    values[name] = _placeholder_input(name, config.field_for(key), f"ph_{row.get('task_id')}_{key}")
+                    if "transcript" in key:
+                        transcript = _transcript_upload(name, f"tr_{row.get('task_id')}_{key}")
+                        if transcript is not None:
+                            transcripts[name] = transcript
+                            values[name] = transcript.label
+        st.markdown("**Prompt**")
+        filled = template.fill(values)
+        st.code(filled, language=None)
+        # Every execution is metered by who ran it and the task's division and category
+        meter = {"user": _current_user_key(), "division": row.get('division'), "category": row.get('category')}
+        _run_prompt_panel(row.get('task_id'), template, values, transcripts, meter=meter)
+        if not transcripts:
+            _compare_providers_panel(row.get('task_id'), template, values, meter=meter)
+
+    # Similar tasks: precomputed by related_tasks.py, a single indexed lookup here
+    related = catalog_db.load_related_tasks(row.get('task_id'))
+    if not related.empty:
+        st.markdown("**Similar tasks**")
+        st.markdown("\n".join(
+            f"- [{r.title}](?{urlencode(dict(back_params, page='task', task=r.task_id))}) · {r.category}"
+            for r in related.itertuples()
+        ))
+
     # Actions
     act1, act2, act3 = st.columns([1,1,2])
     with act1:
@@ -3397,7 +3675,7 @@ def show_edit_task_page():
     except Exception:
         _tid = None
     task_id = _tid
-    task_details = load_tasks(task_id=task_id) if task_id else pd.DataFrame()
+    task_details = load_tasks(task_id=task_id, projection="edit") if task_id else pd.DataFrame()
 
     if task_details.empty:
         st.error("Task not found")
@@ -3452,6 +3730,69 @@ def show_edit_task_page():
                 finally:
                     conn.close()
 
+def show_admin_page():
+    """Operational view (?page=admin, admins only, see _is_admin): LLM usage, cache hit rates, limiter load, provider health"""
+    st.markdown('<div class="main-header"><div class="header-logo"><div class="header-logo-icon"></div> <span>Admin</span></div></div>', unsafe_allow_html=True)
+
+    st.markdown("### LLM usage")
+    by = st.selectbox("Group by", llm_metering.DIMENSIONS, index=1, key="usage_by",
+                      format_func=lambda d: d.replace("_", " ").title())
+    days = st.selectbox("Period", [1, 7, 30, 90], index=2, key="usage_days", format_func=lambda d: f"Last {d} days")
+    usage = llm_metering.usage_report(by=by, days=days)
+    if usage.empty:
+        st.info("No metered prompt runs in this period.")
+    else:
+        cols = st.columns(3)
+        cols[0].metric("Runs", f"{int(usage['runs'].sum()):,}")
+        cols[1].metric("Live tokens", f"{int(usage['total_tokens'].sum()):,}")
+        cols[2].metric("Cached runs", f"{int(usage['cached_runs'].sum()):,}")
+        st.dataframe(usage, hide_index=True, use_container_width=True)
+    st.caption(f"Metrics writer: {llm_metering.get_writer().snapshot()}")
+
+    st.markdown("### Response cache")
+    try:
+        stats, size = response_cache.hit_rates()
+    except Exception as e:
+        st.error(f"❌ Could not read the response cache: {e}")
+        return
+    hits, misses = int(stats["hits"].sum()), int(stats["misses"].sum())
+    cols = st.columns(3)
+    cols[0].metric("Hit rate", f"{hits / (hits + misses):.0%}" if hits + misses else "–")
+    cols[1].metric("Lookups", f"{hits + misses:,}")
+    cols[2].metric("Stored", f"{size['entries']:,} answers · {size['bytes'] / 1e6:.1f} MB")
+    if stats.empty:
+        st.info("No prompts have been run yet.")
+    else:
+        st.dataframe(stats, hide_index=True, use_container_width=True)
+    semantic = response_cache.semantic_hit_rates()
+    if not semantic.empty:
+        lookups, semantic_hits = int(semantic["lookups"].sum()), int(semantic["hits"].sum())
+        st.caption(f"Semantic tier: {semantic_hits:,} of {lookups:,} exact misses answered from similar inputs · "
+                   f"mean lookup {(semantic['avg_lookup_ms'] * semantic['lookups']).sum() / lookups:.1f} ms")
+        st.dataframe(semantic, hide_index=True, use_container_width=True)
+    if st.button("Clear response cache"):
+        response_cache.clear()
+        st.rerun()
+
+    st.markdown("### LLM limiter")
+    limiters = llm_limiter.snapshots()
+    if limiters:
+        st.dataframe(pd.DataFrame.from_dict(limiters, orient="index").rename_axis("provider").reset_index(),
+                     hide_index=True, use_container_width=True)
+    else:
+        st.info("No provider has been called in this server process yet.")
+
+    st.markdown("### Provider health")
+    health = llm_backend.health_snapshots()
+    if health:
+        health = pd.DataFrame.from_dict(health, orient="index").rename_axis("provider").reset_index()
+        unhealthy = health.loc[health["state"] != "closed", "provider"].tolist()
+        if unhealthy:
+            st.warning(f"⚠️ Circuit open or probing for: {', '.join(unhealthy)}; their calls fail fast until they recover.")
+        st.dataframe(health, hide_index=True, use_container_width=True)
+    else:
+        st.info("No LLM provider is configured.")
+
 # Navigation logic: show the requested page
 if st.session_state.current_page == "title":
     show_title_page()
@@ -3467,6 +3808,8 @@ elif st.session_state.current_page == "task":
     show_task_page()
 elif st.session_state.current_page == "edit_task":
     show_edit_task_page()
+elif st.session_state.current_page == "admin" and _is_admin():
+    show_admin_page()
 
 
 
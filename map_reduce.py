@@ -0,0 +1,224 @@
+"""
+Long-Input Map-Reduce
+Tasks such as Meeting Minutes (a Teams transcript) or Policy Summary (a full
+directive) take inputs that can exceed a model's context window. When the
+filled prompt would not fit, the long field is:
+
+1. split into segments at speaker turns and sentence ends;
+2. packed into chunks of at most a token budget, with content-defined cut
+   points so an edit early in the input does not shift every later chunk;
+3. mapped: the task prompt is run once per chunk as chunks are read, in
+   parallel up to `parallelism` calls, each through the response cache and the provider's
+   limiter, so re-running after a small edit only re-processes changed chunks;
+4. reduced: partial results are combined in rounds, each reduce prompt
+   batching as many partials as fit the same budget, until one batch is
+   left; that final prompt is returned as a stream so the page shows the
+   answer as it arrives.
+
+A provider's context window comes from its "limits": {"context_tokens": N}
+setting (default DEFAULT_CONTEXT_TOKENS).
+"""
+
+import re
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import response_cache
+from llm_backend import estimate_tokens
+from prompt_templates import canonical_name
+
+DEFAULT_CONTEXT_TOKENS = 8000
+# Share of the context window kept free for the model's answer
+OUTPUT_RESERVE = 0.25
+DEFAULT_PARALLELISM = 4
+# On average one segment boundary in CUT_EVERY is a cut point once a chunk is half full
+CUT_EVERY = 8
+
+# No part numbers here: the chunk prompt must not change when a chunk elsewhere is added or removed
+MAP_INSTRUCTION = (
+    "The {field} below is one part of a longer input. Do the task for this part only and keep "
+    "every detail that matters; the results for all parts will be combined afterwards.\n\n"
+)
+REDUCE_INSTRUCTION = (
+    "The {field} was too long to process at once, so it was split into {total} parts and the task "
+    "was done for each part separately. Combine the partial results below into one complete, "
+    "consistent answer to the task, removing repetition.\n\n"
+)
+
+# A speaker turn: "Name:" at the start of a line, a VTT voice tag, or a "[00:12:03] Name" stamp
+_TURN = re.compile(r"\n(?=\s*(?:<v\s|\[?\d{1,2}:\d{2}(?::\d{2})?\]?\s|[A-Z][\w .'-]{0,40}:\s))")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+def split_segments(source):
+    """
+    Speaker turns, further split into sentences when a turn is long.
+
+    source is the text, or an iterable of turns (e.g. a stored Transcript) that
+    is consumed lazily.
+    """
+    turns = _TURN.split(source.replace("\r\n", "\n")) if isinstance(source, str) else source
+    for turn in turns:
+        if not turn.strip():
+            continue
+        if estimate_tokens(turn) <= 200:
+            yield turn
+        else:
+            yield from (s for s in _SENTENCE.split(turn) if s.strip())
+
+def _split_oversized(segment, budget):
+    """Word-boundary pieces of a segment that alone exceeds the budget"""
+    piece, length = [], 0
+    for word in segment.split(" "):
+        piece.append(word)
+        length += len(word) + 1
+        if length // 4 >= budget:
+            yield " ".join(piece)
+            piece, length = [], 0
+    if piece:
+        yield " ".join(piece)
+
+def iter_chunks(source, budget):
+    """
+    Group segments into chunks of at most budget tokens, yielded as they fill.
+
+    Past half the budget a chunk also ends after any segment whose crc32 hits the
+    cut condition, so chunk boundaries depend on content, not on position.
+    """
+    current, tokens = [], 0
+    for segment in split_segments(source):
+        size = estimate_tokens(segment)
+        pieces = list(_split_oversized(segment, budget)) if size > budget else [segment]
+        for piece in pieces:
+            # +1: the joining newline and per-piece rounding in the estimate
+            size = estimate_tokens(piece) + 1
+            if current and tokens + size > budget:
+                yield "\n".join(current)
+                current, tokens = [], 0
+            current.append(piece)
+            tokens += size
+            if tokens >= budget // 2 and zlib.crc32(piece.encode("utf-8")) % CUT_EVERY == 0:
+                yield "\n".join(current)
+                current, tokens = [], 0
+    if current:
+        yield "\n".join(current)
+
+def pack_chunks(source, budget):
+    return list(iter_chunks(source, budget))
+
+def context_tokens(provider):
+    return int(provider.limits.get("context_tokens", DEFAULT_CONTEXT_TOKENS))
+
+def input_budget(provider):
+    """Tokens a prompt may use on this provider, leaving room for the answer"""
+    return int(context_tokens(provider) * (1 - OUTPUT_RESERVE))
+
+def long_field(template, values):
+    """(display name, value) of the longest filled placeholder, or (None, "")"""
+    lookup = {canonical_name(k): v for k, v in values.items()}
+    filled = [(name, str(lookup.get(canonical_name(name)) or "")) for name in template.placeholders]
+    return max(filled, key=lambda item: len(item[1]), default=(None, ""))
+
+def needs_map_reduce(provider, template, values, extra_tokens=0):
+    """extra_tokens counts input that is not in values (e.g. a stored transcript)"""
+    return estimate_tokens(template.fill(values)) + extra_tokens > input_budget(provider)
+
+def _reduce_batches(partials, budget):
+    """
+    Consecutive groups of partials whose token estimates sum to at most budget.
+
+    A group takes at least two partials even when they exceed the budget together, so
+    every round shrinks the list; a partial left over at the end is its own group and
+    passes to the next round unchanged.
+    """
+    batches, current, tokens = [], [], 0
+    for partial in partials:
+        size = estimate_tokens(partial) + 10
+        if len(current) >= 2 and tokens + size > budget:
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(partial)
+        tokens += size
+    if current:
+        batches.append(current)
+    return batches
+
+def _reduce_prompt(template, values, field, partials):
+    joined = "\n\n".join(f"--- Part {i + 1} of {len(partials)} ---\n{p}" for i, p in enumerate(partials))
+    return REDUCE_INSTRUCTION.format(field=field, total=len(partials)) + template.fill({**values, field: joined})
+
+def _run_one(provider, prompt, task_id, gate, meter):
+    stream = response_cache.cached_stream(provider, prompt, task_id=task_id, gate=gate, meter=meter)
+    try:
+        for _delta in stream:
+            pass
+    finally:
+        stream.close()
+    return stream.text, stream.cache_status
+
+def map_reduce_stream(provider, template, values, task_id=None, gate=None, reduce_gate=None,
+                      parallelism=DEFAULT_PARALLELISM, on_progress=None, long_input=None, meter=None):
+    """
+    Run a prompt whose longest field is too large for one call.
+
+    long_input=(field, iterable of turns) streams that field from elsewhere (e.g. a
+    Transcript on disk) instead of taking the longest value; chunks are submitted
+    as they are read, with at most 2 * parallelism in flight. gate is entered by
+    the chunk worker threads, so it must not touch the page; reduce_gate (default:
+    gate) is entered by the calling thread. Returns (reduce stream, stats).
+    on_progress(done) is called from the calling thread as chunk results arrive.
+    meter labels every chunk and the reduce call for llm_metering.
+    """
+    field, source = long_input if long_input else long_field(template, values)
+    if field is None:
+        # No placeholder to split: the prompt is long on its own, so send it as it is and let the
+        # provider report an overflow
+        prompt = template.fill(values)
+        stream = response_cache.cached_stream(provider, prompt, task_id=task_id, gate=reduce_gate or gate,
+                                              meter=meter)
+        return stream, {"field": None, "chunks": 1, "cached_chunks": 0, "input_tokens": estimate_tokens(prompt),
+                        "reduce_rounds": 0}
+    overhead = estimate_tokens(template.fill({**values, field: ""})) + estimate_tokens(MAP_INSTRUCTION) + 20
+    budget = max(200, input_budget(provider) - overhead)
+    instruction = MAP_INSTRUCTION.format(field=field)
+    results = []
+    cached = 0
+    input_tokens = 0
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as pool:
+        pending = deque()
+
+        def _collect():
+            nonlocal cached
+            text, status = pending.popleft().result()
+            results.append(text)
+            cached += status in response_cache.CACHED_STATUSES
+            if on_progress is not None:
+                on_progress(len(results))
+
+        for chunk in iter_chunks(source, budget):
+            input_tokens += estimate_tokens(chunk)
+            prompt = instruction + template.fill({**values, field: chunk})
+            pending.append(pool.submit(_run_one, provider, prompt, task_id, gate, meter))
+            if len(pending) >= parallelism * 2:
+                _collect()
+        while pending:
+            _collect()
+
+    total = len(results)
+    # Reduce in rounds until the remaining partials fit one reduce prompt
+    reduce_budget = max(200, input_budget(provider) - estimate_tokens(template.fill({**values, field: ""}))
+                        - estimate_tokens(REDUCE_INSTRUCTION) - 20)
+    rounds = 0
+    batches = _reduce_batches(results, reduce_budget)
+    while len(batches) > 1:
+        rounds += 1
+        with ThreadPoolExecutor(max_workers=max(1, parallelism)) as pool:
+            futures = [pool.submit(_run_one, provider, _reduce_prompt(template, values, field, batch), task_id,
+                                   gate, meter) if len(batch) > 1 else batch[0] for batch in batches]
+            results = [future if isinstance(future, str) else future.result()[0] for future in futures]
+        batches = _reduce_batches(results, reduce_budget)
+    reduce_prompt = _reduce_prompt(template, values, field, batches[0] if batches else [])
+    stream = response_cache.cached_stream(provider, reduce_prompt, task_id=task_id, gate=reduce_gate or gate,
+                                          meter=meter)
+    return stream, {"field": field, "chunks": total, "cached_chunks": cached, "input_tokens": input_tokens,
+                    "reduce_rounds": rounds + 1}
@@ -0,0 +1,264 @@
+"""
+Mock LLM Server
+A local, dependency-free stand-in for an OpenAI-compatible provider, for load
+testing and regression-testing the execution backend, response cache and
+limiters without network access or API keys.
+
+Implements:
+    POST /v1/chat/completions   (stream true -> SSE chunks + usage, false -> one JSON body)
+    GET  /v1/models
+
+Behaviour is configurable: time to first token (fixed, uniform or lognormal
+around --first-token-ms), a token rate, answer length, a share of HTTP 500
+errors, and 429 rate-limit responses with Retry-After, either from a real
+requests-per-minute bucket (--rpm) or at random (--rate-limit-rate).
+
+CLI:
+    python mock_llm_server.py --port 8400 --first-token-ms 300 --tokens-per-second 40 --rpm 120
+    AI_ASSISTANT_LLM_BASE_URL=http://127.0.0.1:8400/v1 streamlit run main.py
+
+Fixture:
+    with mock_llm_server.running_server(MockConfig(first_token_ms=50)) as server:
+        provider = llm_backend.Provider("mock", server.base_url, "mock-1")
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from dataclasses import dataclass, asdict
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WORDS = ("the committee reviewed the budget and agreed to schedule a follow up meeting with facilities "
+         "staff to confirm the action items owners and due dates before the next quarterly review").split()
+
+@dataclass
+class MockConfig:
+    first_token_ms: float = 200.0
+    latency: str = "lognormal"       # fixed | uniform | lognormal
+    jitter: float = 0.4              # lognormal sigma, or +/- fraction for uniform
+    tokens_per_second: float = 50.0  # 0 = send all tokens at once
+    response_tokens: int = 60
+    error_rate: float = 0.0          # share of requests answered with HTTP 500
+    rate_limit_rate: float = 0.0     # share of requests answered with HTTP 429 at random
+    rpm: float = 0.0                 # requests per minute before 429s (0 = unlimited)
+    retry_after: float = 1.0
+    seed: int = None
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0}
+
+    def add(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config=None):
+        super().__init__(address, _Handler)
+        self.config = config or MockConfig()
+        self.stats = _Stats()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._bucket_lock = threading.Lock()
+        self._tokens = self.config.rpm
+        self._updated = time.monotonic()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is normal, not worth a traceback
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+    def random(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def first_token_delay(self):
+        c = self.config
+        base = c.first_token_ms / 1000
+        with self._rng_lock:
+            if c.latency == "fixed":
+                return base
+            if c.latency == "uniform":
+                return max(0.0, base * (1 + self._rng.uniform(-c.jitter, c.jitter)))
+            return base * self._rng.lognormvariate(0, c.jitter)
+
+    def take_rate_token(self):
+        """False when the requests-per-minute bucket is empty"""
+        if not self.config.rpm:
+            return True
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._tokens = min(self.config.rpm, self._tokens + (now - self._updated) * self.config.rpm / 60)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients reuse connections
+    server_version = "MockLLM/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._json(200, {"object": "list", "data": [{"id": "mock-1", "object": "model"}]})
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._json(400, {"error": {"message": "invalid JSON"}})
+            return
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        server.stats.add("requests")
+        config = server.config
+        if not server.take_rate_token() or server.random() < config.rate_limit_rate:
+            server.stats.add("rate_limited")
+            self._json(429, {"error": {"message": "rate limit exceeded", "type": "rate_limit"}},
+                       {"Retry-After": f"{config.retry_after:g}"})
+            return
+        if server.random() < config.error_rate:
+            server.stats.add("errors")
+            self._json(500, {"error": {"message": "injected server error", "type": "server_error"}})
+            return
+
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        tokens = self._answer_tokens(prompt, int(body.get("max_tokens") or config.response_tokens))
+        usage = {"prompt_tokens": max(1, len(prompt) // 4), "completion_tokens": len(tokens),
+                 "total_tokens": max(1, len(prompt) // 4) + len(tokens)}
+        model = body.get("model") or "mock-1"
+        time.sleep(server.first_token_delay())
+        if body.get("stream"):
+            server.stats.add("streams")
+            self._stream(model, tokens, usage, (body.get("stream_options") or {}).get("include_usage"))
+        else:
+            self._sleep_tokens(len(tokens))
+            self._json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+    def _answer_tokens(self, prompt, count):
+        echo = prompt.split()[:8]
+        words = ["Mock", "answer", "to:"] + echo + ["\n"]
+        while len(words) < count:
+            words.append(WORDS[len(words) % len(WORDS)])
+        return [w if i == 0 else " " + w for i, w in enumerate(words[:count])]
+
+    def _sleep_tokens(self, n):
+        rate = self.server.config.tokens_per_second
+        if rate > 0:
+            time.sleep(n / rate)
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _event(self, payload):
+        self._chunk(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+
+    def _stream(self, model, tokens, usage, include_usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        rate = self.server.config.tokens_per_second
+        base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model}
+        try:
+            for i, token in enumerate(tokens):
+                if i and rate > 0:
+                    time.sleep(1 / rate)
+                self._event({**base, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+            self._event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if include_usage:
+                self._event({**base, "choices": [], "usage": usage})
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up mid-stream (deadline, closed page); nothing to clean up
+            self.close_connection = True
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """Start a MockLLMServer on a background thread; port 0 picks a free port"""
+    server = MockLLMServer((host, port), config)
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server
+
+@contextmanager
+def running_server(config=None, host="127.0.0.1", port=0):
+    """Fixture: a running mock server for the duration of the with block"""
+    server = start_server(config, host, port)
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def main(argv=None):
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8400)
+    parser.add_argument("--first-token-ms", type=float, default=defaults.first_token_ms)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default=defaults.latency)
+    parser.add_argument("--jitter", type=float, default=defaults.jitter)
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--response-tokens", type=int, default=defaults.response_tokens)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with HTTP 429")
+    parser.add_argument("--rpm", type=float, default=0.0, help="requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    config = MockConfig(**{k: v for k, v in vars(args).items() if k not in ("host", "port")})
+    server = MockLLMServer((args.host, args.port), config)
+    print(f"🤖 Mock LLM server on {server.base_url}")
+    print(f"   {json.dumps(asdict(config))}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n📊 {server.stats.snapshot()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
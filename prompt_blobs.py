@@ -0,0 +1,199 @@
+"""
+Content-Addressed Prompt Storage
+Prompt bodies live once in the prompt_blobs table, keyed by the SHA-256 of
+their UTF-8 text; bodies above COMPRESS_THRESHOLD bytes are stored
+zlib-compressed when that is smaller. Catalog rows keep only the hash
+(tasks.prompt_default_hash / prompt_v1_hash / prompt_v2_hash and
+user_tasks.prompt_text_hash), so identical prompts across variants and tasks
+are stored once and grid queries never read prompt text.
+
+The importer converts each parsed frame with frame_to_blob_refs() before
+writing it, so prompt text never lands in the catalog rows. For a database
+imported before this existed, run:  python prompt_blobs.py
+"""
+
+import os
+import zlib
+import sqlite3
+import hashlib
+
+import pandas as pd
+
+COMPRESS_THRESHOLD = 1024
+COMPRESS_LEVEL = 6
+
+# Prompt text columns per table; each gets a "<column>_hash" reference column
+PROMPT_COLUMNS = {
+    "tasks": ["prompt_default", "prompt_v1", "prompt_v2"],
+    "user_tasks": ["prompt_text"],
+}
+
+def prompt_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def encode_blob(text, threshold=COMPRESS_THRESHOLD):
+    """(body bytes, compressed flag) for a prompt"""
+    raw = text.encode("utf-8")
+    if len(raw) > threshold:
+        packed = zlib.compress(raw, COMPRESS_LEVEL)
+        if len(packed) < len(raw):
+            return packed, 1
+    return raw, 0
+
+def decode_blob(body, compressed):
+    return (zlib.decompress(body) if compressed else bytes(body)).decode("utf-8")
+
+def ensure_blob_schema(conn):
+    """Create prompt_blobs and add the *_hash reference columns to tables that lack them"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_blobs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,        -- UTF-8 bytes before compression
+            compressed INTEGER NOT NULL,  -- 1 = zlib
+            body BLOB NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    for table, columns in PROMPT_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if not existing:
+            continue
+        for column in columns:
+            if f"{column}_hash" not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}_hash TEXT")
+
+def move_prompts_to_blobs(conn, threshold=COMPRESS_THRESHOLD):
+    """
+    Move any prompt text still stored inline into prompt_blobs and point the row at its hash.
+
+    Only rows whose text columns are non-NULL are touched, so an incremental import only
+    pays for the rows it rewrote. Empty prompts get a NULL hash. Does not commit.
+    Returns the number of new blobs stored.
+    """
+    ensure_blob_schema(conn)
+    known = set()
+    new_blobs = 0
+    for table, columns in PROMPT_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if not existing:
+            continue
+        for column in columns:
+            if column not in existing:
+                continue
+            updates = []
+            blobs = []
+            for rowid, text in conn.execute(f"SELECT rowid, {column} FROM {table} WHERE {column} IS NOT NULL"):
+                text = str(text)
+                if not text:
+                    updates.append((None, rowid))
+                    continue
+                digest = prompt_hash(text)
+                if digest not in known:
+                    known.add(digest)
+                    body, compressed = encode_blob(text, threshold)
+                    blobs.append((digest, len(text.encode("utf-8")), compressed, body))
+                updates.append((digest, rowid))
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO prompt_blobs (hash, size, compressed, body) VALUES (?, ?, ?, ?)", blobs
+            )
+            new_blobs += conn.total_changes - before
+            conn.executemany(f"UPDATE {table} SET {column}_hash = ?, {column} = NULL WHERE rowid = ?", updates)
+    return new_blobs
+
+def frame_to_blob_refs(conn, table, df, threshold=COMPRESS_THRESHOLD):
+    """
+    Store a normalized frame's prompt columns as blobs and return the frame with
+    <column>_hash references and the text columns set to None, ready to write.
+    """
+    columns = [c for c in PROMPT_COLUMNS.get(table, []) if c in df.columns]
+    if not columns:
+        return df
+    ensure_blob_schema(conn)
+    df = df.copy()
+    blobs = {}
+    for column in columns:
+        hashes = []
+        for text in df[column].tolist():
+            if not isinstance(text, str) or not text:
+                hashes.append(None)
+                continue
+            digest = prompt_hash(text)
+            if digest not in blobs:
+                blobs[digest] = text
+            hashes.append(digest)
+        df[f"{column}_hash"] = hashes
+        df[column] = None
+    stored = {row[0] for row in conn.execute("SELECT hash FROM prompt_blobs")}
+    rows = []
+    for digest, text in blobs.items():
+        if digest in stored:
+            continue
+        body, compressed = encode_blob(text, threshold)
+        rows.append((digest, len(text.encode("utf-8")), compressed, body))
+    conn.executemany("INSERT OR IGNORE INTO prompt_blobs (hash, size, compressed, body) VALUES (?, ?, ?, ?)", rows)
+    return df
+
+def collect_garbage(conn):
+    """Delete blobs no row references any more. Does not commit; returns the number removed."""
+    references = " UNION ".join(
+        f"SELECT {column}_hash FROM {table} WHERE {column}_hash IS NOT NULL"
+        for table, columns in PROMPT_COLUMNS.items() for column in columns
+    )
+    cur = conn.execute(f"DELETE FROM prompt_blobs WHERE hash NOT IN ({references})")
+    return cur.rowcount
+
+def load_blobs(conn, hashes):
+    """{hash: prompt text} for the given hashes (missing hashes are left out)"""
+    wanted = [h for h in dict.fromkeys(hashes) if isinstance(h, str) and h]
+    texts = {}
+    for start in range(0, len(wanted), 500):
+        chunk = wanted[start:start + 500]
+        rows = conn.execute(
+            f"SELECT hash, body, compressed FROM prompt_blobs WHERE hash IN ({', '.join('?' for _ in chunk)})", chunk
+        )
+        texts.update({digest: decode_blob(body, compressed) for digest, body, compressed in rows})
+    return texts
+
+def attach_prompts(df, conn, table="tasks"):
+    """Fill a frame's prompt text columns from its *_hash columns (rows without a hash get '')"""
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        return df
+    hash_columns = [f"{c}_hash" for c in PROMPT_COLUMNS[table] if f"{c}_hash" in df.columns]
+    if not hash_columns:
+        return df
+    texts = load_blobs(conn, [h for c in hash_columns for h in df[c].tolist()])
+    df = df.copy()
+    for column in PROMPT_COLUMNS[table]:
+        if f"{column}_hash" not in df.columns:
+            continue
+        resolved = df[f"{column}_hash"].map(lambda h: texts.get(h, ""))
+        if column in df.columns:
+            # Rows not yet moved into blobs still carry their text inline
+            resolved = df[column].where(df[column].notna(), resolved)
+        df[column] = resolved
+    return df
+
+def storage_report(conn):
+    """(blob count, uncompressed bytes, stored bytes)"""
+    count, size, stored = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(body)), 0) FROM prompt_blobs"
+    ).fetchone()
+    return count, size, stored
+
+if __name__ == "__main__":
+    # Migration for databases that still store prompt text inline
+    import catalog_db
+    db_path = catalog_db.DB_PATH
+    before = os.path.getsize(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        moved = move_prompts_to_blobs(conn)
+        removed = collect_garbage(conn)
+        conn.commit()
+        count, size, stored = storage_report(conn)
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    print(f"✅ Stored {moved} new prompt blobs, removed {removed} unreferenced")
+    print(f"   {count} blobs: {size / 1024:.1f} KB of prompt text stored in {stored / 1024:.1f} KB")
+    print(f"   {db_path}: {before / 1024:.1f} KB -> {os.path.getsize(db_path) / 1024:.1f} KB")
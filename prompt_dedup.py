@@ -0,0 +1,184 @@
+"""
+Near-Duplicate Prompt Detection
+Import-time stage that finds clusters of near-identical prompts across the
+Tasks export (prompt_default) and user_tasks (prompt_text) without comparing
+every pair:
+
+1. each prompt is reduced to a set of hashed word 3-shingles;
+2. a 128-value MinHash signature estimates Jaccard similarity between sets;
+3. LSH banding (16 bands x 8 rows) buckets signatures so only prompts that
+   share a band become candidate pairs, which are kept when their estimated
+   similarity reaches THRESHOLD;
+4. kept pairs are merged with union-find into clusters.
+
+Every row in a cluster gets the same duplicate_group number (NULL for unique
+prompts), which the grid collapses on. A JSON report of the clusters is
+written next to the database.
+"""
+
+import os
+import re
+import json
+import hashlib
+import zlib
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+THRESHOLD = 0.8
+BATCH_DOCS = 256
+
+_rng = np.random.RandomState(1)
+# Multiply-shift hashing: (a * x + b) mod 2**64, top 32 bits; a must be odd
+_A = _rng.randint(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.randint(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+_EMPTY = np.iinfo(np.uint32).max
+
+_WORD = re.compile(r"\w+")
+_word_hashes = {}
+
+def _word_ids(text):
+    ids = []
+    for word in _WORD.findall(text.lower()):
+        h = _word_hashes.get(word)
+        if h is None:
+            # crc32 is stable across processes, unlike hash()
+            h = _word_hashes[word] = zlib.crc32(word.encode("utf-8"))
+        ids.append(h)
+    return np.array(ids, dtype=np.uint64)
+
+def shingles(text, size=SHINGLE_WORDS):
+    """Hashed word n-gram set of a prompt, as a uint64 array"""
+    ids = _word_ids(text)
+    if len(ids) == 0:
+        return ids
+    size = min(size, len(ids))
+    grams = np.zeros(len(ids) - size + 1, dtype=np.uint64)
+    for offset in range(size):
+        # Polynomial combination of the word hashes; wraps mod 2**64
+        grams = grams * np.uint64(1000003) + ids[offset:offset + len(grams)]
+    return np.unique(grams)
+
+def minhash_signatures(texts):
+    """[n x NUM_PERM] uint32 MinHash signatures; empty prompts get all-max rows"""
+    signatures = np.full((len(texts), NUM_PERM), _EMPTY, dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for start in range(0, len(texts), BATCH_DOCS):
+            sets = [shingles(t) if isinstance(t, str) else np.empty(0, np.uint64)
+                    for t in texts[start:start + BATCH_DOCS]]
+            sizes = np.array([len(s) for s in sets])
+            nonempty = np.nonzero(sizes)[0]
+            if not len(nonempty):
+                continue
+            values = np.concatenate([sets[i] for i in nonempty])
+            # One hash per permutation and shingle, then the minimum per document
+            hashed = ((_A[:, None] * values[None, :] + _B[:, None]) >> _SHIFT).astype(np.uint32)
+            offsets = np.concatenate(([0], np.cumsum(sizes[nonempty])[:-1]))
+            signatures[start + nonempty] = np.minimum.reduceat(hashed, offsets, axis=1).T
+    return signatures
+
+def candidate_pairs(signatures):
+    """Pairs of rows that share at least one LSH band"""
+    pairs = set()
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        block = signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        for row, key in enumerate(map(bytes, block)):
+            buckets[key].append(row)
+        for rows in buckets.values():
+            if len(rows) < 2 or signatures[rows[0], 0] == _EMPTY:
+                continue
+            for i in range(len(rows)):
+                for j in range(i + 1, len(rows)):
+                    pairs.add((rows[i], rows[j]))
+    return pairs
+
+def find_clusters(texts, threshold=THRESHOLD):
+    """Clusters (lists of row indexes, ≥ 2 members) of near-duplicate texts, plus pair similarities"""
+    signatures = minhash_signatures(texts)
+    parent = list(range(len(texts)))
+
+    def _find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    similarities = {}
+    for i, j in candidate_pairs(signatures):
+        similarity = float(np.mean(signatures[i] == signatures[j]))
+        if similarity >= threshold:
+            similarities[(i, j)] = similarity
+            parent[_find(i)] = _find(j)
+
+    members = defaultdict(list)
+    for row in range(len(texts)):
+        members[_find(row)].append(row)
+    clusters = sorted((rows for rows in members.values() if len(rows) > 1), key=lambda rows: rows[0])
+    return clusters, similarities
+
+def group_number(member_keys):
+    """Stable positive 53-bit group number from a cluster's smallest member key"""
+    digest = hashlib.sha256(min(member_keys).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & ((1 << 53) - 1)
+
+def assign_duplicate_groups(frames, threshold=THRESHOLD):
+    """
+    Add a duplicate_group column to the tasks and user_tasks frames; returns the report dict.
+
+    A group's number is derived from its smallest member ("table:id"), so it does not
+    change when other clusters appear, disappear or reorder.
+    """
+    sources = [("tasks", "prompt_default", "task_id"), ("user_tasks", "prompt_text", "title")]
+    items = []
+    texts = []
+    for table, column, label_column in sources:
+        df = frames.get(table)
+        if df is None or column not in df.columns:
+            continue
+        for position, (text, label) in enumerate(zip(df[column].tolist(), df[label_column].tolist())):
+            items.append((table, position, str(label)))
+            texts.append(text)
+
+    clusters, similarities = find_clusters(texts, threshold)
+    cluster_of = {row: c for c, rows in enumerate(clusters) for row in rows}
+    pair_scores = defaultdict(list)
+    for (i, j), similarity in similarities.items():
+        # Union-find puts both ends of every accepted pair in the same cluster
+        pair_scores[cluster_of[i]].append(similarity)
+    groups = {table: [None] * len(frames[table]) for table, _c, _l in sources if table in frames}
+    report = {"threshold": threshold, "prompts": len(texts), "clusters": []}
+    for c, rows in enumerate(clusters):
+        number = group_number(f"{items[r][0]}:{items[r][2]}" for r in rows)
+        for row in rows:
+            table, position, _label = items[row]
+            groups[table][position] = number
+        scores = pair_scores[c]
+        report["clusters"].append({
+            "group": number,
+            "members": [{"table": items[r][0], "id": items[r][2]} for r in rows],
+            "min_similarity": round(min(scores), 3) if scores else None,
+        })
+    for table, values in groups.items():
+        frames[table] = frames[table].assign(duplicate_group=pd.array(values, dtype="Int64"))
+    report["duplicate_rows"] = sum(len(rows) for rows in clusters)
+    return report
+
+def ensure_duplicate_columns(conn):
+    """Add duplicate_group to tables that lack it"""
+    for table in ("tasks", "user_tasks"):
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if existing and "duplicate_group" not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN duplicate_group INTEGER")
+
+def write_report(report, path):
+    """Write the report atomically, so readers never see a half-written file"""
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,188 @@
+"""
+Prompt Template Engine
+Task prompts mark the fields a user fills in with <<Placeholder>> markers
+(e.g. <<Committee Name>>, <<Paste Meeting Transcript Here>>). A prompt is
+compiled once into literal segments and placeholder slots; filling it copies
+the short segment list, drops the values into their slots and does a single
+join, so the cost of a fill does not depend on the size of the prompt text.
+
+Compiled templates are cached per process, keyed by task_id and the SHA-256
+of the prompt text, with LRU eviction. Hashing is the only per-lookup cost
+that grows with the prompt, so callers that already hold the digest pass it in.
+"""
+
+import re
+import hashlib
+from collections import OrderedDict
+
+import prompt_blobs
+
+PLACEHOLDER_RE = re.compile(r"<<\s*([^<>]*?)\s*>>")
+CACHE_SIZE = 512
+
+def canonical_name(raw):
+    """Key used to match placeholders: case-insensitive, '_' as space, whitespace collapsed"""
+    return " ".join(raw.replace("_", " ").split()).lower()
+
+class CompiledTemplate:
+    """A prompt split into literal segments and placeholder slots"""
+
+    __slots__ = ("text", "parts", "slots", "names")
+
+    def __init__(self, text):
+        self.text = text
+        parts = []
+        slots = []
+        names = OrderedDict()
+        pos = 0
+        for match in PLACEHOLDER_RE.finditer(text):
+            name = match.group(1)
+            if not name:
+                continue
+            parts.append(text[pos:match.start()])
+            key = canonical_name(name)
+            # Unfilled placeholders render as their original marker
+            slots.append((len(parts), key))
+            parts.append(match.group(0))
+            names.setdefault(key, name)
+            pos = match.end()
+        parts.append(text[pos:])
+        self.parts = tuple(parts)
+        self.slots = tuple(slots)
+        # {canonical name: display name} in first-seen order
+        self.names = names
+
+    @property
+    def placeholders(self):
+        """Display names of the distinct placeholders, in first-seen order"""
+        return list(self.names.values())
+
+    def fill(self, values):
+        """Substitute {name: value} (matched by canonical name); missing names keep their marker"""
+        if not self.slots:
+            return self.text
+        lookup = {canonical_name(k): v for k, v in values.items() if isinstance(k, str) and v not in (None, "")}
+        parts = list(self.parts)
+        for index, key in self.slots:
+            value = lookup.get(key)
+            if value is not None:
+                parts[index] = str(value)
+        return "".join(parts)
+
+    def inputs_text(self, values):
+        """The filled values as "name: value" lines in placeholder order: what varies between runs"""
+        lookup = {canonical_name(k): v for k, v in values.items() if isinstance(k, str) and v not in (None, "")}
+        return "\n".join(f"{name}: {lookup[key]}" for key, name in self.names.items() if key in lookup)
+
+    def missing(self, values):
+        """Display names that values does not fill"""
+        filled = {canonical_name(k) for k, v in values.items() if isinstance(k, str) and v not in (None, "")}
+        return [name for key, name in self.names.items() if key not in filled]
+
+_cache = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def compile_template(text, task_id=None, digest=None, cache_size=CACHE_SIZE):
+    """
+    Compiled template for a prompt, from the LRU cache when the same task/content was seen.
+
+    Pass the prompt's SHA-256 as digest when it is already known to skip hashing the text.
+    """
+    text = text or ""
+    key = (task_id, digest if isinstance(digest, str) and digest else content_hash(text))
+    template = _cache.get(key)
+    if template is not None:
+        _cache.move_to_end(key)
+        _stats["hits"] += 1
+        return template
+    _stats["misses"] += 1
+    template = CompiledTemplate(text)
+    _cache[key] = template
+    while len(_cache) > cache_size:
+        _cache.popitem(last=False)
+    return template
+
+def cache_info():
+    return {"size": len(_cache), "hits": _stats["hits"], "misses": _stats["misses"]}
+
+def clear_cache():
+    _cache.clear()
+    _stats["hits"] = _stats["misses"] = 0
+
+# --- Placeholder index (task_placeholders table) ---
+
+# Prompt columns of the tasks table, in the order placeholders are first seen
+PROMPT_VARIANTS = [("default", "prompt_default"), ("v1", "prompt_v1"), ("v2", "prompt_v2")]
+
+def extract_placeholders(prompts):
+    """
+    Distinct placeholders across prompt variants, in first-seen order.
+
+    prompts is a list of (variant, text). Returns [(canonical name, display name, [variants])].
+    """
+    found = OrderedDict()
+    for variant, text in prompts:
+        if not isinstance(text, str) or "<<" not in text:
+            continue
+        for name in PLACEHOLDER_RE.findall(text):
+            if not name:
+                continue
+            entry = found.setdefault(canonical_name(name), (name, []))
+            if variant not in entry[1]:
+                entry[1].append(variant)
+    return [(key, name, variants) for key, (name, variants) in found.items()]
+
+def ensure_placeholder_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_placeholders (
+            task_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL,          -- canonical_name()
+            display_name TEXT NOT NULL,  -- as first written in the prompt
+            variants TEXT NOT NULL,      -- comma-separated: default,v1,v2
+            PRIMARY KEY (task_id, name)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_task_placeholders_name ON task_placeholders (name, task_id)")
+
+def rebuild_placeholder_index(conn):
+    """Re-extract the placeholders of every task into task_placeholders. Does not commit."""
+    ensure_placeholder_table(conn)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    # Prompts live in prompt_blobs (by hash) once moved there; inline text is read as-is
+    selected = []
+    for _variant, column in PROMPT_VARIANTS:
+        selected.append(column if column in existing else "NULL")
+        selected.append(f"{column}_hash" if f"{column}_hash" in existing else "NULL")
+    rows = conn.execute(f"SELECT task_id, {', '.join(selected)} FROM tasks").fetchall()
+    texts = prompt_blobs.load_blobs(conn, [h for row in rows for h in row[2::2]])
+
+    index_rows = []
+    for task_id, *values in rows:
+        prompts = [
+            (variant, text if text is not None else texts.get(digest))
+            for (variant, _column), text, digest in zip(PROMPT_VARIANTS, values[0::2], values[1::2])
+        ]
+        for position, (key, name, variants) in enumerate(extract_placeholders(prompts)):
+            index_rows.append((task_id, position, key, name, ",".join(variants)))
+    conn.execute("DELETE FROM task_placeholders")
+    conn.executemany(
+        "INSERT OR REPLACE INTO task_placeholders (task_id, position, name, display_name, variants) VALUES (?, ?, ?, ?, ?)",
+        index_rows
+    )
+    return len(index_rows)
+
+if __name__ == "__main__":
+    # Migration for databases imported before the index existed
+    import sqlite3
+    import catalog_db
+    conn = sqlite3.connect(catalog_db.DB_PATH)
+    try:
+        count = rebuild_placeholder_index(conn)
+        conn.commit()
+        print(f"✅ Indexed {count} task placeholders in {catalog_db.DB_PATH}")
+    finally:
+        conn.close()
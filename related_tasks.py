@@ -0,0 +1,173 @@
+"""
+Related Tasks
+Offline step that finds each task's most similar tasks and stores them in the
+related_tasks table, so the task page and the details modal show "Similar
+tasks" with one indexed lookup and no similarity work at request time.
+
+Each task's title, description and default prompt are tokenized, hashed into
+a fixed number of features and weighted by TF-IDF, then L2-normalized; the
+top-k cosine neighbours are computed block by block. With SciPy installed the
+vectors are sparse (2**18 features); without it a dense NumPy matrix with
+2**10 features is used, which collides more but needs no extra package.
+
+The importer rebuilds the table when tasks change; to rebuild by hand:
+    python related_tasks.py [--k 5]
+"""
+
+import re
+import sys
+import zlib
+import sqlite3
+import argparse
+
+import numpy as np
+
+import catalog_db
+import prompt_blobs
+
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    sparse = None
+
+TOP_K = 5
+SPARSE_FEATURES = 2 ** 18
+DENSE_FEATURES = 2 ** 10
+BLOCK_ROWS = 512
+MIN_SCORE = 0.05
+# Terms in more than this share of tasks carry no signal
+MAX_DOC_FREQ = 0.5
+
+_TOKEN = re.compile(r"[a-z0-9]{2,}")
+STOP_WORDS = frozenset(
+    "the and for with that this from you your are will into using use should each any all "
+    "not but can have has was were been its their they them what when where which who how "
+    "please provide include following based about than then also only more most other such".split()
+)
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOP_WORDS]
+
+def _feature(token, n_features):
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(token.encode("utf-8")) % n_features
+
+def build_vectors(texts, n_features):
+    """
+    L2-normalized TF-IDF rows for texts as (indptr, indices, data) CSR arrays.
+
+    Term frequency is 1 + log(count); idf is log((1 + n) / (1 + df)) + 1.
+    """
+    indptr = [0]
+    indices = []
+    counts = []
+    for text in texts:
+        row = {}
+        for token in tokenize(text):
+            feature = _feature(token, n_features)
+            row[feature] = row.get(feature, 0) + 1
+        indices.extend(row.keys())
+        counts.extend(row.values())
+        indptr.append(len(indices))
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+    data = 1.0 + np.log(np.asarray(counts, dtype=np.float32))
+
+    n_docs = len(texts)
+    doc_freq = np.bincount(indices, minlength=n_features)
+    idf = (np.log((1 + n_docs) / (1 + doc_freq)) + 1).astype(np.float32)
+    if n_docs >= 10:
+        idf[doc_freq > n_docs * MAX_DOC_FREQ] = 0
+    data = data * idf[indices]
+
+    row_ids = np.repeat(np.arange(n_docs), np.diff(indptr))
+    norms = np.sqrt(np.bincount(row_ids, weights=data * data, minlength=n_docs)).astype(np.float32)
+    norms[norms == 0] = 1
+    data = (data / norms[row_ids]).astype(np.float32)
+    return indptr, indices, data
+
+def _matrix(texts):
+    if sparse is not None:
+        indptr, indices, data = build_vectors(texts, SPARSE_FEATURES)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(texts), SPARSE_FEATURES))
+    indptr, indices, data = build_vectors(texts, DENSE_FEATURES)
+    matrix = np.zeros((len(texts), DENSE_FEATURES), dtype=np.float32)
+    row_ids = np.repeat(np.arange(len(texts)), np.diff(indptr))
+    matrix[row_ids, indices] = data
+    return matrix
+
+def top_k_neighbours(texts, k=TOP_K, min_score=MIN_SCORE, block_rows=BLOCK_ROWS):
+    """Yield (row, [(neighbour row, score), ...]) with at most k neighbours per row, best first"""
+    n = len(texts)
+    if n < 2:
+        return
+    matrix = _matrix(texts)
+    transposed = matrix.T.tocsr() if sparse is not None else matrix.T
+    k = min(k, n - 1)
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        sims = matrix[start:stop] @ transposed
+        sims = sims.toarray() if sparse is not None else np.asarray(sims)
+        sims[np.arange(stop - start), np.arange(start, stop)] = -1
+        best = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        for offset, candidates in enumerate(best):
+            scores = sims[offset, candidates]
+            order = np.argsort(-scores)
+            yield start + offset, [
+                (int(candidates[i]), float(scores[i])) for i in order if scores[i] >= min_score
+            ]
+
+def ensure_related_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS related_tasks (
+            task_id TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            related_task_id TEXT NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (task_id, rank)
+        ) WITHOUT ROWID
+    ''')
+
+def build_related_tasks(db_path=None, k=TOP_K):
+    """Recompute the top-k neighbours of every active task into related_tasks; returns rows written"""
+    conn = sqlite3.connect(db_path or catalog_db.DB_PATH, isolation_level=None)
+    try:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+        prompt = "prompt_default_hash" if "prompt_default_hash" in existing else "NULL"
+        rows = conn.execute(
+            f"SELECT task_id, title, task_description, prompt_default, {prompt} FROM tasks WHERE is_active = 1"
+        ).fetchall()
+        prompts = prompt_blobs.load_blobs(conn, [r[4] for r in rows])
+        task_ids = [r[0] for r in rows]
+        texts = [
+            " ".join(part for part in (title, title, description, inline or prompts.get(digest, "")) if part)
+            for _tid, title, description, inline, digest in rows
+        ]
+
+        ensure_related_table(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM related_tasks")
+        written = 0
+        for row, neighbours in top_k_neighbours(texts, k):
+            conn.executemany(
+                "INSERT INTO related_tasks (task_id, rank, related_task_id, score) VALUES (?, ?, ?, ?)",
+                [(task_ids[row], rank, task_ids[other], round(score, 4))
+                 for rank, (other, score) in enumerate(neighbours)]
+            )
+            written += len(neighbours)
+        conn.execute("COMMIT")
+        return written
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute similar tasks for the task pages")
+    parser.add_argument("--k", type=int, default=TOP_K, help="neighbours per task")
+    args = parser.parse_args(argv)
+    backend = "scipy sparse" if sparse is not None else "numpy dense"
+    written = build_related_tasks(k=args.k)
+    print(f"✅ Stored {written} related-task links ({backend})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
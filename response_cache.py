@@ -0,0 +1,376 @@
+"""
+LLM Response Cache
+Exact-match cache for executed prompts. The key is the SHA-256 of the
+rendered prompt, provider, model and request parameters, so two users running
+the same template with the same inputs get the stored answer without paying
+LLM latency or cost.
+
+Entries live in their own SQLite file (response_cache.db next to the catalog,
+so catalog imports and swaps never touch it) with a TTL and a total-size
+budget: when the stored answers exceed MAX_BYTES the least recently used are
+evicted. Hits and misses are counted per day and provider for the admin page.
+
+    stream = response_cache.cached_stream(provider, prompt, task_id="1016")
+    for delta in stream:      # live tokens on a miss, replayed chunks on a hit
+        ...
+    stream.cache_status       # "hit", "semantic", "miss" or "rejected"
+
+gate, when given, is called only on a miss and must return a context manager
+(e.g. an llm_limiter slot); it is held until the live stream ends, so cache
+hits never wait in the limiter queue.
+
+With semantic_text (and a task_id) an exact miss is also looked up in the
+semantic tier (semantic_cache): the closest earlier answer for the same task,
+template, provider, model and numbers in the inputs is replayed when its
+inputs are at least semantic_threshold similar, with cache_status "semantic".
+
+With meter={"user": ..., "division": ..., "category": ...} the finished or
+failed execution is recorded by llm_metering (tokens, latency, cache status),
+including calls the gate or the circuit breaker refused (cache_status
+"rejected").
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+from datetime import date
+
+import pandas as pd
+
+import catalog_db
+import llm_backend
+import llm_limiter
+import llm_metering
+import semantic_cache
+
+CACHE_PATH = os.environ.get(
+    "AI_ASSISTANT_RESPONSE_CACHE",
+    os.path.join(os.path.dirname(catalog_db.DB_PATH) or ".", "response_cache.db"),
+)
+TTL_SECONDS = 7 * 24 * 3600
+MAX_BYTES = 64 * 1024 * 1024
+# Replayed hits are yielded in pieces of about this many characters, so pages render them the same way
+REPLAY_CHUNK = 64
+# cache_status values of answers that did not come from the provider
+CACHED_STATUSES = llm_metering.CACHED_STATUSES
+# Refusals before the provider was called: limiter queue full or timed out, circuit open
+REJECTIONS = (llm_limiter.QueueFull, llm_limiter.QueueTimeout, llm_backend.CircuitOpen)
+
+_schema_ready = set()
+
+def cache_key(prompt, provider, model, params=None):
+    """Stable key for one request; params are serialized with sorted keys"""
+    payload = json.dumps([prompt, provider, model, params or {}], sort_keys=True, ensure_ascii=False,
+                         separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _connect(path=None):
+    path = path or CACHE_PATH
+    conn = sqlite3.connect(path, timeout=10)
+    if path not in _schema_ready:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                model TEXT,
+                task_id TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                usage TEXT,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used_at)")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_stats (
+                day TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, provider)
+            ) WITHOUT ROWID
+        ''')
+        semantic_cache.ensure_schema(conn)
+        conn.commit()
+        _schema_ready.add(path)
+    return conn
+
+def _count(conn, provider, hit):
+    column = "hits" if hit else "misses"
+    conn.execute(
+        f"INSERT INTO cache_stats (day, provider, {column}) VALUES (?, ?, 1) "
+        f"ON CONFLICT (day, provider) DO UPDATE SET {column} = {column} + 1",
+        (date.today().isoformat(), provider),
+    )
+
+def get(key, provider, path=None, now=None):
+    """Stored (response, usage) for key or None; counts the hit or miss"""
+    now = now or time.time()
+    conn = _connect(path)
+    try:
+        row = conn.execute(
+            "SELECT response, usage FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is not None:
+            conn.execute("UPDATE responses SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        _count(conn, provider, row is not None)
+        conn.commit()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return row[0], json.loads(row[1]) if row[1] else None
+
+def get_similar(scope, vector, provider, threshold=semantic_cache.THRESHOLD, path=None, now=None):
+    """
+    Semantic tier lookup: (response, usage, similarity) of the closest answer in scope, or None.
+
+    Counts the lookup and its latency in semantic_stats.
+    """
+    started = time.perf_counter()
+    now = now or time.time()
+    conn = _connect(path)
+    row = None
+    try:
+        key, similarity = semantic_cache.nearest(conn, path or CACHE_PATH, scope, vector)
+        if key is not None and similarity >= threshold:
+            row = conn.execute(
+                "SELECT response, usage FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                semantic_cache.discard(path or CACHE_PATH, scope, key)
+            else:
+                conn.execute("UPDATE responses SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        semantic_cache.record_lookup(conn, provider, row is not None, time.perf_counter() - started)
+        conn.commit()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return row[0], json.loads(row[1]) if row[1] else None, similarity
+
+def put(key, provider, model, response, task_id=None, usage=None, ttl=TTL_SECONDS, max_bytes=MAX_BYTES,
+        path=None, now=None, semantic=None):
+    """
+    Store a completed response, then evict expired and least recently used entries over budget.
+
+    semantic=(scope, vector) also indexes the answer in the semantic tier.
+    """
+    now = now or time.time()
+    conn = _connect(path)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, provider, model, task_id, response, size, usage, "
+            "created_at, last_used_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, provider, model, None if task_id is None else str(task_id), response,
+             len(response.encode("utf-8")), json.dumps(usage) if usage else None, now, now, now + ttl),
+        )
+        if semantic is not None:
+            semantic_cache.add(conn, path or CACHE_PATH, semantic[0], key, semantic[1], now=now)
+        evict(conn, max_bytes, now)
+        conn.commit()
+    finally:
+        conn.close()
+
+def evict(conn, max_bytes=MAX_BYTES, now=None):
+    """Drop expired entries, then the least recently used until the total size fits. Does not commit."""
+    expired = conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now or time.time(),)).rowcount
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= max_bytes:
+        if expired:
+            semantic_cache.prune(conn)
+        return 0
+    removed = []
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used_at"):
+        if total <= max_bytes:
+            break
+        removed.append((key,))
+        total -= size
+    conn.executemany("DELETE FROM responses WHERE key = ?", removed)
+    semantic_cache.prune(conn)
+    return len(removed)
+
+def clear(path=None):
+    conn = _connect(path)
+    try:
+        conn.execute("DELETE FROM responses")
+        conn.execute("DELETE FROM semantic_entries")
+        conn.commit()
+    finally:
+        conn.close()
+    semantic_cache.forget(path or CACHE_PATH)
+
+def hit_rates(days=14, path=None):
+    """Daily hits, misses and hit rate per provider for the admin page"""
+    conn = _connect(path)
+    try:
+        df = pd.read_sql_query(
+            "SELECT day, provider, hits, misses FROM cache_stats ORDER BY day DESC, provider LIMIT ?",
+            conn, params=[days * 20],
+        )
+        size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    finally:
+        conn.close()
+    df = df[df["day"].isin(sorted(df["day"].unique(), reverse=True)[:days])]
+    lookups = df["hits"] + df["misses"]
+    df["hit_rate"] = (df["hits"] / lookups.where(lookups > 0)).fillna(0).round(3)
+    return df, {"entries": size[0], "bytes": size[1]}
+
+def semantic_hit_rates(days=14, path=None):
+    """Daily semantic tier lookups, hit rate and mean lookup latency per provider"""
+    conn = _connect(path)
+    try:
+        return semantic_cache.lookup_stats(conn, days)
+    finally:
+        conn.close()
+
+# --- Streaming wrapper ---
+
+_REPLAY = re.compile(r"\S+\s*|\s+")
+
+def replay_chunks(text, size=REPLAY_CHUNK):
+    """Split stored text into word-aligned pieces of about size characters"""
+    piece = []
+    length = 0
+    for word in _REPLAY.findall(text):
+        piece.append(word)
+        length += len(word)
+        if length >= size:
+            yield "".join(piece)
+            piece, length = [], 0
+    if piece:
+        yield "".join(piece)
+
+class CachedStream:
+    """
+    ChatStream-compatible iterator that serves a cached answer or records a live one.
+
+    A live answer is stored only after the stream finished normally, so an aborted
+    or failed run never poisons the cache.
+    """
+
+    def __init__(self, provider, prompt, task_id=None, model=None, ttl=TTL_SECONDS, path=None, gate=None,
+                 semantic_text=None, semantic_scope=None, semantic_threshold=semantic_cache.THRESHOLD, meter=None,
+                 **params):
+        self.provider = provider.name
+        self.model = model or provider.model
+        self.key = cache_key(prompt, self.provider, self.model, params)
+        self.task_id = task_id
+        self._ttl = ttl
+        self._path = path
+        self.started = time.perf_counter()
+        self._gate = None
+        self._live = None
+        # Seconds spent waiting for the gate (limiter queue) before the provider was called
+        self.queue_seconds = 0.0
+        # Similarity of the replayed answer's inputs (semantic hits only)
+        self.similarity = None
+        self._semantic = None
+        self._cached_text, self.usage = None, None
+        self.first_token_seconds = None
+        self.total_seconds = None
+        self.finish_reason = None
+        self.parts = []
+        self._meter = meter
+        self._prompt = prompt if meter is not None else None
+        cached = get(self.key, self.provider, path=path)
+        if cached is not None:
+            self.cache_status = "hit"
+            self._cached_text, self.usage = cached
+        elif semantic_text is not None and task_id is not None and semantic_threshold:
+            scope = semantic_cache.scope_key(task_id, self.provider, self.model, params, semantic_scope,
+                                             semantic_text)
+            self._semantic = (scope, semantic_cache.embed(semantic_text))
+            cached = get_similar(scope, self._semantic[1], self.provider, semantic_threshold, path=path)
+            if cached is not None:
+                self.cache_status = "semantic"
+                self._cached_text, self.usage, self.similarity = cached
+        self.lookup_seconds = time.perf_counter() - self.started
+        if self._cached_text is None:
+            self.cache_status = "miss"
+            try:
+                if gate is not None:
+                    entered = gate()
+                    entered.__enter__()
+                    self._gate = entered
+                    self.queue_seconds = time.perf_counter() - self.started - self.lookup_seconds
+                self._live = provider.chat_stream(prompt, model=model, **params)
+            except BaseException as e:
+                if isinstance(e, REJECTIONS):
+                    self.cache_status = "rejected"
+                self.close()
+                self.total_seconds = time.perf_counter() - self.started
+                self._record(e)
+                raise
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def __iter__(self):
+        if self._live is None:
+            for piece in replay_chunks(self._cached_text):
+                if self.first_token_seconds is None:
+                    self.first_token_seconds = time.perf_counter() - self.started
+                self.parts.append(piece)
+                yield piece
+            self.total_seconds = time.perf_counter() - self.started
+            self.finish_reason = "stop"
+            self._record()
+            return
+        try:
+            for delta in self._live:
+                self.parts.append(delta)
+                yield delta
+        except BaseException as e:
+            self._finish_live()
+            self._record(e)
+            raise
+        finally:
+            self.close()
+        self._finish_live()
+        if self.finish_reason in (None, "stop"):
+            put(self.key, self.provider, self.model, self.text, task_id=self.task_id, usage=self.usage,
+                ttl=self._ttl, path=self._path, semantic=self._semantic)
+        self._record()
+
+    def _finish_live(self):
+        self.first_token_seconds = self._live.first_token_seconds
+        self.total_seconds = self._live.total_seconds
+        self.usage = self._live.usage
+        self.finish_reason = self._live.finish_reason
+
+    def _record(self, error=None):
+        """Hand the execution to llm_metering once (only when a meter was given)"""
+        meter, self._meter = self._meter, None
+        if meter is None:
+            return
+        if isinstance(error, GeneratorExit):
+            message = "aborted"
+        elif error is not None:
+            message = str(error) or type(error).__name__
+        else:
+            message = None
+        llm_metering.record(self, self._prompt, meter, error=message)
+
+    def close(self):
+        """Release the gate and the HTTP response (safe to call more than once)"""
+        if self._live is not None:
+            self._live.close()
+        gate, self._gate = self._gate, None
+        if gate is not None:
+            gate.__exit__(None, None, None)
+
+def cached_stream(provider, prompt, task_id=None, model=None, gate=None, semantic_text=None, semantic_scope=None,
+                  meter=None, **params):
+    """Stream an answer through the cache: replay on a hit, call the provider and store on a miss"""
+    return CachedStream(provider, prompt, task_id=task_id, model=model, gate=gate, semantic_text=semantic_text,
+                        semantic_scope=semantic_scope, meter=meter, **params)
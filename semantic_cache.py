@@ -0,0 +1,243 @@
+"""
+Semantic Response Cache Tier
+Second tier behind the exact-match response cache: prompts whose inputs differ
+only in whitespace, case, punctuation or a few words reuse the stored answer
+of the closest earlier run. Numbers (dates, amounts, claim numbers) are never
+fuzzy: their sequence is part of the scope, so an answer is only reused for
+inputs with exactly the same numbers.
+
+Text is embedded locally with a hashed character n-gram vectorizer (no model,
+NumPy only): after normalizing (lowercase, whitespace collapsed) every 3- and
+5-gram is hashed into one of DIM signed buckets and the vector is
+L2-normalized, so a dot product is the cosine similarity.
+
+Vectors are stored in the semantic_entries table of response_cache.db, keyed
+by the exact-cache key whose answer they point to, and grouped by scope: a
+hash of task_id, provider, model, parameters, the caller's scope hint (the
+template digest) and the numbers in the text. A lookup only ever compares
+against one scope, so an answer can never leak across tasks or templates.
+Up to MAX_SCOPES scopes per process are kept as NumPy matrices (least
+recently used dropped first) and searched with one matrix-vector product; a
+scope is reloaded when the cache file changed and its rows differ from what
+was loaded (e.g. another process stored or evicted answers).
+
+response_cache owns the connections; every function here takes an open one.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from datetime import date
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DIM = 1024
+NGRAMS = (3, 5)
+THRESHOLD = float(os.environ.get("AI_ASSISTANT_SEMANTIC_THRESHOLD", "0.95"))
+# Newest entries per scope kept in memory, and scopes kept per process
+MAX_SCOPE_ENTRIES = 2000
+MAX_SCOPES = 64
+
+_PRIME = np.uint64(1000003)
+_MULT = np.uint64(0x9E3779B97F4A7C15)
+_SHIFT = np.uint64(64 - (DIM.bit_length() - 1) - 1)
+
+_NUMBER = re.compile(r"\d+")
+
+def normalize(text):
+    """Lowercase, whitespace collapsed"""
+    return " ".join((text or "").lower().split())
+
+def numbers(text):
+    """The digit runs of text in order; inputs must agree on these exactly to share an answer"""
+    return _NUMBER.findall(text or "")
+
+def embed(text):
+    """Unit-length float32 vector of the hashed character n-grams of text (zeros for empty text)"""
+    data = np.frombuffer(normalize(text).encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    vector = np.zeros(DIM, dtype=np.float64)
+    for n in NGRAMS:
+        count = len(data) - n + 1
+        if count <= 0:
+            continue
+        grams = np.zeros(count, dtype=np.uint64)
+        for i in range(n):
+            grams = grams * _PRIME + data[i:i + count]
+        # Top bits of a multiplicative hash: bucket index plus one sign bit
+        hashed = (grams * _MULT) >> _SHIFT
+        signs = np.where(hashed & np.uint64(1), 1.0, -1.0)
+        vector += np.bincount((hashed >> np.uint64(1)).astype(np.intp), weights=signs, minlength=DIM)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).astype(np.float32)
+
+def scope_key(task_id, provider, model, params=None, hint=None, text=None):
+    """Scope of a lookup; with text, its numbers are part of the scope"""
+    payload = json.dumps([str(task_id), provider, model, params or {}, hint, numbers(text)], sort_keys=True,
+                         separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def ensure_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS semantic_entries (
+            key TEXT PRIMARY KEY,
+            scope TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_semantic_scope ON semantic_entries (scope, created_at)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS semantic_stats (
+            day TEXT NOT NULL,
+            provider TEXT NOT NULL,
+            lookups INTEGER NOT NULL DEFAULT 0,
+            hits INTEGER NOT NULL DEFAULT 0,
+            lookup_seconds REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, provider)
+        ) WITHOUT ROWID
+    ''')
+
+class _ScopeIndex:
+    """Keys and vectors of one scope; the matrix grows by doubling"""
+
+    def __init__(self, keys, vectors, version=None, stamp=None):
+        self.keys = list(keys)
+        # (row count, newest created_at) of the scope in SQLite, and the cache file stamp, at load
+        self.version = version
+        self.stamp = stamp
+        self.matrix = np.zeros((max(16, len(self.keys) * 2), DIM), dtype=np.float32)
+        if self.keys:
+            self.matrix[:len(self.keys)] = vectors
+
+    def nearest(self, vector):
+        """(key, similarity) of the most similar entry, or (None, 0.0)"""
+        if not self.keys:
+            return None, 0.0
+        scores = self.matrix[:len(self.keys)] @ vector
+        best = int(np.argmax(scores))
+        return self.keys[best], float(scores[best])
+
+    def add(self, key, vector):
+        if key in self.keys:
+            self.matrix[self.keys.index(key)] = vector
+            return
+        if len(self.keys) == len(self.matrix):
+            grown = np.zeros((len(self.matrix) * 2, DIM), dtype=np.float32)
+            grown[:len(self.keys)] = self.matrix[:len(self.keys)]
+            self.matrix = grown
+        self.matrix[len(self.keys)] = vector
+        self.keys.append(key)
+
+    def discard(self, key):
+        if key in self.keys:
+            i = self.keys.index(key)
+            last = len(self.keys) - 1
+            self.matrix[i] = self.matrix[last]
+            self.keys[i] = self.keys[last]
+            self.keys.pop()
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+def _file_stamp(path):
+    """Modification times and sizes of the cache file and its WAL"""
+    stamp = []
+    for name in (path, path + "-wal"):
+        try:
+            st = os.stat(name)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+def _scope_version(conn, scope):
+    return tuple(conn.execute(
+        "SELECT COUNT(*), MAX(created_at) FROM semantic_entries WHERE scope = ?", (scope,)
+    ).fetchone())
+
+def _scope_index(conn, path, scope):
+    """In-memory index of a scope, (re)loaded from SQLite when missing or stale. Caller holds _lock."""
+    key = (path, scope)
+    stamp = _file_stamp(path)
+    index = _indexes.get(key)
+    if index is not None:
+        _indexes.move_to_end(key)
+        if index.stamp != stamp:
+            # The file changed: reload only when this scope's rows did (our own writes keep it current)
+            if _scope_version(conn, scope) == index.version:
+                index.stamp = stamp
+            else:
+                index = None
+    if index is None:
+        rows = conn.execute(
+            "SELECT key, vector FROM semantic_entries WHERE scope = ? ORDER BY created_at DESC LIMIT ?",
+            (scope, MAX_SCOPE_ENTRIES),
+        ).fetchall()
+        vectors = np.array([np.frombuffer(v, dtype=np.float32) for _k, v in rows], dtype=np.float32)
+        index = _ScopeIndex([k for k, _v in rows], vectors.reshape(len(rows), DIM),
+                            version=_scope_version(conn, scope), stamp=stamp)
+        _indexes[key] = index
+        while len(_indexes) > MAX_SCOPES:
+            _indexes.popitem(last=False)
+    return index
+
+def nearest(conn, path, scope, vector):
+    """(key, similarity) of the closest stored entry in scope, or (None, 0.0)"""
+    with _lock:
+        return _scope_index(conn, path, scope).nearest(vector)
+
+def add(conn, path, scope, key, vector, now=None):
+    """Store the vector for an exact-cache key. Does not commit."""
+    conn.execute(
+        "INSERT OR REPLACE INTO semantic_entries (key, scope, vector, created_at) VALUES (?, ?, ?, ?)",
+        (key, scope, np.asarray(vector, dtype=np.float32).tobytes(), now or time.time()),
+    )
+    with _lock:
+        index = _scope_index(conn, path, scope)
+        index.add(key, vector)
+        index.version = _scope_version(conn, scope)
+
+def discard(path, scope, key):
+    """Forget an entry whose answer is gone from the exact cache"""
+    with _lock:
+        index = _indexes.get((path, scope))
+        if index is not None:
+            index.discard(key)
+
+def prune(conn):
+    """Drop vectors whose answers were evicted or expired. Does not commit."""
+    return conn.execute(
+        "DELETE FROM semantic_entries WHERE key NOT IN (SELECT key FROM responses)"
+    ).rowcount
+
+def forget(path=None):
+    """Drop the in-memory indexes (all, or those of one cache file)"""
+    with _lock:
+        for key in [k for k in _indexes if path is None or k[0] == path]:
+            del _indexes[key]
+
+def record_lookup(conn, provider, hit, seconds):
+    conn.execute(
+        "INSERT INTO semantic_stats (day, provider, lookups, hits, lookup_seconds) VALUES (?, ?, 1, ?, ?) "
+        "ON CONFLICT (day, provider) DO UPDATE SET lookups = lookups + 1, hits = hits + excluded.hits, "
+        "lookup_seconds = lookup_seconds + excluded.lookup_seconds",
+        (date.today().isoformat(), provider, int(hit), seconds),
+    )
+
+def lookup_stats(conn, days=14):
+    """Daily semantic lookups, hits, hit rate and mean lookup latency per provider"""
+    df = pd.read_sql_query(
+        "SELECT day, provider, lookups, hits, lookup_seconds FROM semantic_stats "
+        "ORDER BY day DESC, provider LIMIT ?",
+        conn, params=[days * 20],
+    )
+    df = df[df["day"].isin(sorted(df["day"].unique(), reverse=True)[:days])]
+    lookups = df["lookups"].where(df["lookups"] > 0)
+    df["hit_rate"] = (df["hits"] / lookups).fillna(0).round(3)
+    df["avg_lookup_ms"] = (df["lookup_seconds"] * 1000 / lookups).fillna(0).round(2)
+    return df.drop(columns=["lookup_seconds"])
@@ -0,0 +1,222 @@
+"""
+SharePoint Export Auto-Sync
+Watches ai_assistant/data/sharepoint/ and runs the incremental shadow import
+whenever new CSV exports are dropped there.
+
+Usage:
+    python sharepoint_sync.py            # run as a daemon
+    python sharepoint_sync.py --once     # sync once if the exports changed, then exit
+
+On Linux the folder is watched with inotify, so the daemon sleeps until a file
+is written. Elsewhere (or with --poll) it stats the five CSV files every few
+seconds; it never walks a directory tree. Bursts of writes are debounced, and
+exports whose content hash matches the last successful import are skipped.
+A successful import bumps the catalog generation, which makes the running app
+drop its cached catalog on the next rerun.
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import select
+import hashlib
+import argparse
+import ctypes
+import ctypes.util
+
+import import_real_data
+from import_real_data import DATA_DIRS, IMPORT_LISTS
+from catalog_db import DB_PATH
+
+WATCH_DIR = DATA_DIRS[0]
+EXPORT_FILES = [entry[1] for entry in IMPORT_LISTS]
+STATE_PATH = DB_PATH + ".sync.json"
+
+# --- Watchers ---
+
+class InotifyWatcher:
+    """Blocks on inotify events for one directory (Linux only, no extra packages)"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout):
+        """Return the names of files changed within timeout seconds (empty set if none)"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            _wd, _mask, _cookie, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "replace")
+            offset += length
+            if name in EXPORT_FILES:
+                changed.add(name)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Stats only the five export files every interval seconds"""
+
+    def __init__(self, directory, interval=10.0):
+        self.directory = directory
+        self.interval = interval
+        self.last = self._snapshot()
+
+    def _snapshot(self):
+        snapshot = {}
+        for name in EXPORT_FILES:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+                snapshot[name] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                snapshot[name] = None
+        return snapshot
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = self._snapshot()
+        changed = {name for name in EXPORT_FILES if current[name] != self.last[name]}
+        self.last = current
+        return changed
+
+    def close(self):
+        pass
+
+def make_watcher(directory, poll=False, interval=10.0):
+    """inotify when available, otherwise the polling fallback"""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify unavailable ({e}); falling back to polling every {interval:g}s")
+    return PollingWatcher(directory, interval)
+
+# --- Fingerprints ---
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state, path=STATE_PATH):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def fingerprint_exports(directory, previous=None):
+    """
+    {file: {size, mtime_ns, sha256}} for every export present.
+
+    The content hash is only recomputed when size or mtime differ from the previous
+    fingerprint, so an idle check costs five stat calls.
+    """
+    previous = previous or {}
+    fingerprints = {}
+    for name in EXPORT_FILES:
+        path = os.path.join(directory, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        old = previous.get(name)
+        if old and old.get("size") == st.st_size and old.get("mtime_ns") == st.st_mtime_ns:
+            fingerprints[name] = old
+        else:
+            fingerprints[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": _sha256_file(path)}
+    return fingerprints
+
+def sync_once(directory=WATCH_DIR, state_path=STATE_PATH, workers=None):
+    """Run the incremental shadow import if any export's content changed; returns True if imported"""
+    state = load_state(state_path)
+    fingerprints = fingerprint_exports(directory, state.get("files"))
+    changed = [
+        name for name, fp in fingerprints.items()
+        if (state.get("files") or {}).get(name, {}).get("sha256") != fp["sha256"]
+    ]
+    if not changed:
+        print("💤 Exports unchanged since the last import; skipping")
+        # Remember new mtimes so touched-but-identical files are not re-hashed
+        save_state({"files": fingerprints, "last_import": state.get("last_import")}, state_path)
+        return False
+
+    print(f"📥 Changed exports: {', '.join(sorted(changed))}")
+    summaries = import_real_data.run_shadow_import(incremental=True, workers=workers, data_dirs=[directory])
+    if summaries is None:
+        print("⚠️  Import failed; will retry on the next change")
+        return False
+    save_state({"files": fingerprints, "last_import": time.strftime("%Y-%m-%dT%H:%M:%S")}, state_path)
+    return True
+
+def run_daemon(directory=WATCH_DIR, debounce=5.0, poll=False, interval=10.0, workers=None):
+    """Watch the export folder forever, importing once each burst of writes has settled"""
+    print(f"👀 Watching {directory} (debounce {debounce:g}s)")
+    watcher = make_watcher(directory, poll=poll, interval=interval)
+    print(f"   using {type(watcher).__name__}")
+    # Catch up on anything dropped while the daemon was not running
+    sync_once(directory, workers=workers)
+    last_event = None
+    try:
+        while True:
+            timeout = debounce if last_event is not None else 3600.0
+            if watcher.wait(timeout):
+                last_event = time.monotonic()
+                continue
+            if last_event is not None and time.monotonic() - last_event >= debounce:
+                last_event = None
+                sync_once(directory, workers=workers)
+    except KeyboardInterrupt:
+        print("\n👋 Stopping watcher")
+    finally:
+        watcher.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auto-import SharePoint exports when they change")
+    parser.add_argument("--dir", default=WATCH_DIR, help="folder to watch")
+    parser.add_argument("--debounce", type=float, default=5.0, help="seconds of quiet before importing")
+    parser.add_argument("--poll", action="store_true", help="use the polling watcher even where inotify works")
+    parser.add_argument("--interval", type=float, default=10.0, help="polling interval in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes for the import")
+    parser.add_argument("--once", action="store_true", help="sync once and exit")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(DB_PATH):
+        print("❌ Database not found! Run 'python database_setup.py' first.")
+        return 1
+    if args.once:
+        sync_once(args.dir, workers=args.workers)
+        return 0
+    run_daemon(args.dir, debounce=args.debounce, poll=args.poll, interval=args.interval, workers=args.workers)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Typed Task Configuration
+tasks.config_json describes the inputs a task asks for, e.g.
+
+    {"fields": [{"name": "MeetingTime", "type": "Dropdown", "label": "Meeting Time",
+                 "placeholder": "...", "choices": ["8:00 AM", "8:30 AM"]}]}
+
+The importer validates every config once (parse_config) and stores it in a
+compact canonical form, replacing invalid configs with "{}" and reporting
+them. Pages read configs through get_task_config(), which keeps the parsed
+TaskConfig per (task_id, version) in a bounded per-process cache. JSON is
+decoded with orjson when it is installed, otherwise with the standard library.
+"""
+
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+
+from prompt_templates import canonical_name
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+FIELD_TYPES = ("Text", "TextArea", "Number", "Date", "Time", "Dropdown", "Toggle")
+CACHE_SIZE = 1024
+
+class ConfigError(ValueError):
+    """config_json that does not match the task configuration model"""
+
+@dataclass(frozen=True)
+class ConfigField:
+    name: str
+    type: str = "Text"
+    label: str = ""
+    placeholder: str = ""
+    choices: tuple = ()
+
+    @property
+    def display_label(self):
+        return self.label or self.name
+
+@dataclass(frozen=True)
+class TaskConfig:
+    fields: tuple = ()
+    # Top-level keys this model does not know yet, kept so nothing is lost on re-serialization
+    extra: dict = field(default_factory=dict)
+
+    def field_for(self, key):
+        """Field whose label or name matches a canonical placeholder key, or None"""
+        for f in self.fields:
+            if canonical_name(f.display_label) == key or canonical_name(f.name) == key:
+                return f
+        return None
+
+EMPTY_CONFIG = TaskConfig()
+
+def _parse_field(raw, index):
+    if not isinstance(raw, dict):
+        raise ConfigError(f"fields[{index}] must be an object")
+    name = raw.get("name")
+    if not isinstance(name, str) or not name.strip():
+        raise ConfigError(f"fields[{index}] needs a name")
+    field_type = raw.get("type", "Text")
+    if field_type not in FIELD_TYPES:
+        raise ConfigError(f"fields[{index}] ({name}) has unknown type {field_type!r}")
+    choices = raw.get("choices", ())
+    if not isinstance(choices, (list, tuple)) or not all(isinstance(c, (str, int, float)) for c in choices):
+        raise ConfigError(f"fields[{index}] ({name}) choices must be a list of values")
+    if field_type == "Dropdown" and not choices:
+        raise ConfigError(f"fields[{index}] ({name}) is a Dropdown without choices")
+    return ConfigField(
+        name=name.strip(),
+        type=field_type,
+        label=str(raw.get("label") or ""),
+        placeholder=str(raw.get("placeholder") or ""),
+        choices=tuple(str(c) for c in choices),
+    )
+
+def parse_config(text):
+    """Validate config_json text into a TaskConfig; empty text is the empty config"""
+    if text is None or (isinstance(text, float) and text != text) or not str(text).strip():
+        return EMPTY_CONFIG
+    try:
+        data = _loads(text)
+    except ValueError as e:
+        raise ConfigError(f"invalid JSON: {e}") from None
+    if not isinstance(data, dict):
+        raise ConfigError("config must be a JSON object")
+    raw_fields = data.get("fields", [])
+    if not isinstance(raw_fields, list):
+        raise ConfigError("fields must be a list")
+    fields = tuple(_parse_field(raw, i) for i, raw in enumerate(raw_fields))
+    names = [f.name for f in fields]
+    if len(set(names)) != len(names):
+        raise ConfigError("field names must be unique")
+    return TaskConfig(fields=fields, extra={k: v for k, v in data.items() if k != "fields"})
+
+def to_json(config):
+    """Compact canonical JSON for a TaskConfig ("{}" for the empty config)"""
+    if config == EMPTY_CONFIG:
+        return "{}"
+    data = dict(config.extra)
+    if config.fields:
+        data["fields"] = [
+            {k: (list(v) if k == "choices" else v) for k, v in asdict(f).items() if v not in ("", ())}
+            for f in config.fields
+        ]
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def canonical_json(text):
+    """(canonical JSON, error message or None) for one config; invalid configs become "{}" """
+    try:
+        return to_json(parse_config(text)), None
+    except ConfigError as e:
+        return "{}", str(e)
+
+_cache = OrderedDict()
+
+def get_task_config(task_id, config_json, version=None, cache_size=CACHE_SIZE):
+    """
+    Parsed TaskConfig for a task, cached per (task_id, version).
+
+    version should change whenever the stored config can (the catalog generation does).
+    Configs that fail validation read as the empty config.
+    """
+    key = (str(task_id), version)
+    config = _cache.get(key)
+    if config is not None:
+        _cache.move_to_end(key)
+        return config
+    try:
+        config = parse_config(config_json)
+    except ConfigError:
+        config = EMPTY_CONFIG
+    _cache[key] = config
+    while len(_cache) > cache_size:
+        _cache.popitem(last=False)
+    return config
@@ -0,0 +1,266 @@
+"""
+Transcript Ingestion
+Turns an uploaded meeting transcript (Teams .vtt, .srt, Teams .docx or plain
+.txt) into normalized speaker turns, one "Speaker: text" line per turn, with
+consecutive cues from the same speaker merged and timestamps, cue numbers and
+markup dropped.
+
+The upload is copied into a SpooledTemporaryFile in blocks and parsed line by
+line (DOCX paragraphs via iterparse), and the turns are written straight to
+ai_assistant/database/transcripts/<sha256>.txt. Session state keeps only the
+transcript id; the prompt pipeline reads turns back lazily with iter(), so a
+two-hour meeting is never held as one string per session. Transcripts not
+used for MAX_AGE_DAYS are deleted by cleanup_if_due(), which the upload
+widget runs at most once per CLEANUP_INTERVAL; reusing a transcript touches
+its files.
+
+    transcript = transcript_ingest.ingest(uploaded_file, uploaded_file.name)
+    for turn in transcript:       # streamed from disk
+        ...
+"""
+
+import io
+import os
+import re
+import json
+import time
+import zipfile
+import hashlib
+import tempfile
+from dataclasses import dataclass, asdict
+from xml.etree.ElementTree import iterparse
+
+import catalog_db
+from llm_backend import estimate_tokens
+
+TRANSCRIPT_DIR = os.path.join(os.path.dirname(catalog_db.DB_PATH) or ".", "transcripts")
+FORMATS = ("vtt", "srt", "docx", "txt")
+SPOOL_BYTES = 1024 * 1024
+READ_BLOCK = 64 * 1024
+MAX_AGE_DAYS = 7
+CLEANUP_INTERVAL = 3600
+
+_TIMING = re.compile(r"^\s*(\d{1,2}:)?\d{1,2}:\d{2}[.,]\d{1,3}\s*-->")
+_CUE_NUMBER = re.compile(r"^\s*\d+\s*$")
+_VOICE = re.compile(r"<v(?:\.[\w.-]+)?\s+([^>]+)>")
+_TAG = re.compile(r"</?[^>]+>")
+_SPEAKER = re.compile(r"^\s*([A-Z][\w .,'()-]{0,60}?)\s*:\s+(.*)$")
+# Teams DOCX: a "Jane Doe   0:03" paragraph introduces the speaker of the following paragraphs
+_DOCX_SPEAKER = re.compile(r"^\s*(.+?)\s+\d{1,2}:\d{2}(?::\d{2})?\s*$")
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+@dataclass(frozen=True)
+class Transcript:
+    transcript_id: str
+    name: str
+    path: str
+    turns: int
+    words: int
+    tokens: int
+
+    def __iter__(self):
+        """Yield the normalized turns from disk, one at a time"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield line.rstrip("\n")
+
+    def read(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    @property
+    def label(self):
+        return f"[Transcript: {self.name}, {self.turns:,} turns, {self.words:,} words]"
+
+# --- Parsing ---
+
+def spool_upload(fileobj):
+    """Copy an upload into a spooled temp file (on disk above SPOOL_BYTES), rewound"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    while True:
+        block = fileobj.read(READ_BLOCK)
+        if not block:
+            break
+        spool.write(block)
+    spool.seek(0)
+    return spool
+
+def _text_lines(spool):
+    return io.TextIOWrapper(spool, encoding="utf-8-sig", errors="replace", newline=None)
+
+def parse_cues(lines):
+    """(speaker or None, text) per VTT/SRT cue line"""
+    in_note = False
+    for line in lines:
+        line = line.strip()
+        if not line:
+            in_note = False
+            continue
+        if in_note or line.startswith("WEBVTT") or _TIMING.match(line) or _CUE_NUMBER.match(line):
+            continue
+        if line.startswith(("NOTE", "STYLE", "REGION")):
+            in_note = True
+            continue
+        voice = _VOICE.search(line)
+        text = _TAG.sub("", line).strip()
+        if voice:
+            yield voice.group(1).strip(), text
+        else:
+            yield _split_speaker(text)
+
+def _split_speaker(text):
+    match = _SPEAKER.match(text)
+    if match:
+        return match.group(1).strip(), match.group(2).strip()
+    return None, text.strip()
+
+def parse_plain(lines):
+    """(speaker or None, text) per line of a plain-text transcript"""
+    for line in lines:
+        if line.strip():
+            yield _split_speaker(line)
+
+def docx_paragraphs(spool):
+    """Paragraph texts of a .docx, read incrementally from word/document.xml"""
+    with zipfile.ZipFile(spool) as archive, archive.open("word/document.xml") as xml:
+        parts = []
+        for event, element in iterparse(xml, events=("end",)):
+            if element.tag == _W_NS + "t":
+                parts.append(element.text or "")
+            elif element.tag == _W_NS + "tab":
+                parts.append(" ")
+            elif element.tag == _W_NS + "p":
+                yield "".join(parts)
+                parts = []
+                element.clear()
+
+def parse_docx(spool):
+    speaker = None
+    for paragraph in docx_paragraphs(spool):
+        if not paragraph.strip():
+            continue
+        header = _DOCX_SPEAKER.match(paragraph)
+        if header and len(paragraph) < 80:
+            speaker = header.group(1).strip()
+            continue
+        named, text = _split_speaker(paragraph)
+        yield (named or speaker), text
+
+def normalize_turns(cues):
+    """Merge consecutive cues of the same speaker into "Speaker: text" turns"""
+    speaker, parts = None, []
+    for cue_speaker, text in cues:
+        if not text:
+            continue
+        if parts and cue_speaker is not None and cue_speaker != speaker:
+            yield _turn(speaker, parts)
+            parts = []
+        if cue_speaker is not None:
+            speaker = cue_speaker
+        parts.append(" ".join(text.split()))
+    if parts:
+        yield _turn(speaker, parts)
+
+def _turn(speaker, parts):
+    text = " ".join(parts)
+    return f"{speaker}: {text}" if speaker else text
+
+def parse_upload(spool, fmt):
+    """Normalized turns of a spooled upload"""
+    if fmt == "docx":
+        return normalize_turns(parse_docx(spool))
+    lines = _text_lines(spool)
+    if fmt in ("vtt", "srt"):
+        return normalize_turns(parse_cues(lines))
+    return normalize_turns(parse_plain(lines))
+
+# --- Storage ---
+
+def _meta_path(transcript_id):
+    return os.path.join(TRANSCRIPT_DIR, f"{transcript_id}.json")
+
+def ingest(fileobj, name):
+    """Parse an uploaded transcript and store its turns on disk; returns the Transcript"""
+    fmt = os.path.splitext(name)[1].lower().lstrip(".")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported transcript format .{fmt} (use {', '.join(FORMATS)})")
+    os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    turns = words = tokens = 0
+    spool = spool_upload(fileobj)
+    fd, tmp_path = tempfile.mkstemp(dir=TRANSCRIPT_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as out:
+            for turn in parse_upload(spool, fmt):
+                line = turn + "\n"
+                out.write(line)
+                digest.update(line.encode("utf-8"))
+                turns += 1
+                words += len(turn.split())
+                tokens += estimate_tokens(turn)
+        transcript_id = digest.hexdigest()
+        path = os.path.join(TRANSCRIPT_DIR, f"{transcript_id}.txt")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        spool.close()
+    transcript = Transcript(transcript_id, os.path.basename(name), path, turns, words, tokens)
+    with open(_meta_path(transcript_id), "w", encoding="utf-8") as f:
+        json.dump(asdict(transcript), f)
+    return transcript
+
+def load_transcript(transcript_id):
+    """Stored Transcript by id, or None when it was cleaned up"""
+    if not re.fullmatch(r"[0-9a-f]{64}", transcript_id or ""):
+        return None
+    try:
+        with open(_meta_path(transcript_id), "r", encoding="utf-8") as f:
+            transcript = Transcript(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+    if not os.path.exists(transcript.path):
+        return None
+    touch(transcript)
+    return transcript
+
+def touch(transcript):
+    """Mark a transcript as used now, so cleanup keeps it"""
+    for path in (transcript.path, _meta_path(transcript.transcript_id)):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+def cleanup(max_age_days=MAX_AGE_DAYS):
+    """Delete transcripts not touched for max_age_days; returns the number of files removed"""
+    if not os.path.isdir(TRANSCRIPT_DIR):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for entry in os.scandir(TRANSCRIPT_DIR):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+    return removed
+
+_last_cleanup = 0.0
+
+def cleanup_if_due(interval=CLEANUP_INTERVAL):
+    """Run cleanup() when this process has not run it within interval seconds; returns files removed"""
+    global _last_cleanup
+    now = time.monotonic()
+    if _last_cleanup and now - _last_cleanup < interval:
+        return 0
+    _last_cleanup = now
+    try:
+        return cleanup()
+    except OSError as e:
+        print(f"⚠️ Transcript cleanup failed: {e}")
+        return 0